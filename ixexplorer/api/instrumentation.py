@@ -0,0 +1,221 @@
+"""
+Round trip instrumentation of TclServer calls.
+
+TclClient.instrument() returns a context manager that records every command sent on the client while it is active::
+
+    with ixia.api.instrument() as report:
+        port.write()
+        IxeStreamsStats().read_stats()
+    print(report)
+
+Each command is counted in the report totals and grouped by verb (`cget`, `config`, `get`, `set`...), by Tcl command
+(`port`, `packetGroupStats`, `ixStartTransmit`...) and by the high level operation that caused it - the outermost
+ixexplorer method in the call stack (`IxePort.write`, `IxeStreamsStats.read_stats`, `IxePort.owner`...).
+
+The group ranges requested by statistics snapshots (`packetGroupStats get 1 1 1 0 63`...), also inside scripts, are
+recorded by statistics command and port.
+"""
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds, in seconds, of the latency histogram buckets, the last bucket collects everything slower.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+
+# Commands whose second word is not a verb.
+TCL_COMMANDS = {"apply", "catch", "enableEvents", "expr", "foreach", "if", "join", "list", "package", "puts", "set", "source"}
+
+_verb = re.compile(r"[a-z][A-Za-z]*$")
+# Members read as one list (see tcl_members_cget) - list [cmd cget -a] [if {[catch {cmd cget -b} v]} ...]...
+_members_cget = re.compile(r"list \[(if \{\[catch \{)?")
+# Group range of a statistics snapshot - packetGroupStats get 1 1 1 0 63.
+_stats_range = re.compile(r"\b(packetGroupStats|streamTransmitStats) get (\d+ \d+ \d+) (\d+) (\d+)")
+_package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CallStats:
+    """Counters of a group of commands."""
+
+    def __init__(self) -> None:
+        """Create zero counters."""
+        self.count = 0
+        self.round_trips = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total_time = 0.0
+        self.min_time = math.inf
+        self.max_time = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, sent: int, received: int, latency: float, round_trips: int = 1) -> None:
+        """Count one command.
+
+        :param sent: request bytes.
+        :param received: reply bytes.
+        :param latency: seconds from sending the request until its reply was received.
+        :param round_trips: number of round trips of the command, 0 for commands pipelined after the first one.
+        """
+        self.count += 1
+        self.round_trips += round_trips
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.total_time += latency
+        self.min_time = min(self.min_time, latency)
+        self.max_time = max(self.max_time, latency)
+        self.histogram[next(i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound)] += 1
+
+    @property
+    def mean_time(self) -> float:
+        """Mean round trip time of the commands, seconds."""
+        return self.total_time / self.count if self.count else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Return the upper bound of the histogram bucket that holds the percentile."""
+        rank = self.count * percent / 100
+        accumulated = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.histogram):
+            accumulated += count
+            if count and accumulated >= rank:
+                return bound
+        return 0.0
+
+    def as_dict(self) -> dict:
+        """Return the counters as JSON serializable dictionary."""
+        return OrderedDict(
+            count=self.count,
+            round_trips=self.round_trips,
+            bytes_sent=self.bytes_sent,
+            bytes_received=self.bytes_received,
+            total_time=self.total_time,
+            mean_time=self.mean_time,
+            min_time=self.min_time if self.count else 0.0,
+            max_time=self.max_time,
+            p50=self.percentile(50),
+            p99=self.percentile(99),
+            histogram=OrderedDict((str(b), c) for b, c in zip(LATENCY_BUCKETS, self.histogram) if c),
+        )
+
+
+class CallsReport:
+    """Commands recorded by one TclClient.instrument() block."""
+
+    def __init__(self) -> None:
+        """Create empty report, its start time is now."""
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.total = CallStats()
+        self.by_verb: Dict[str, CallStats] = {}
+        self.by_command: Dict[str, CallStats] = {}
+        self.by_operation: Dict[str, CallStats] = {}
+        # (first, last) group ranges requested by statistics snapshots, by `<statistics command> <port>`.
+        self.stats_ranges: Dict[str, List[Tuple[int, int]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        """Wall clock seconds of the instrumented block."""
+        return (self.end or time.time()) - self.start
+
+    def record(self, exchange: Iterable[Tuple[str, int, int]], latency: float, operation: str) -> None:
+        """Record commands sent in one round trip.
+
+        :param exchange: (command, bytes sent, bytes received) of each command.
+        :param latency: seconds of the round trip.
+        :param operation: high level operation that caused the round trip.
+        """
+        with self._lock:
+            round_trips = 1
+            for command, sent, received in exchange:
+                verb, name = command_verb(command)
+                for stats in (
+                    self.total,
+                    self.by_verb.setdefault(verb, CallStats()),
+                    self.by_command.setdefault(name, CallStats()),
+                    self.by_operation.setdefault(operation, CallStats()),
+                ):
+                    stats.add(sent, received, latency, round_trips)
+                round_trips = 0
+                for stats_command, port, first, last in _stats_range.findall(command):
+                    self.stats_ranges.setdefault(f"{stats_command} {port}", []).append((int(first), int(last)))
+
+    @property
+    def stats_groups(self) -> int:
+        """Total number of groups requested by statistics snapshots."""
+        return sum(last - first + 1 for ranges in self.stats_ranges.values() for first, last in ranges)
+
+    def as_dict(self) -> dict:
+        """Return the report as JSON serializable dictionary."""
+        return OrderedDict(
+            elapsed=self.elapsed,
+            total=self.total.as_dict(),
+            by_verb=OrderedDict((k, v.as_dict()) for k, v in _sorted(self.by_verb)),
+            by_command=OrderedDict((k, v.as_dict()) for k, v in _sorted(self.by_command)),
+            by_operation=OrderedDict((k, v.as_dict()) for k, v in _sorted(self.by_operation)),
+            stats_ranges=OrderedDict((k, list(v)) for k, v in self.stats_ranges.items()),
+        )
+
+    def __str__(self) -> str:
+        lines = [
+            f"{self.total.count} commands in {self.total.round_trips} round trips, {self.total.total_time:.3f}s of "
+            f"{self.elapsed:.3f}s, {self.total.bytes_sent} bytes sent, {self.total.bytes_received} bytes received"
+        ]
+        for title, groups in (("verb", self.by_verb), ("command", self.by_command), ("operation", self.by_operation)):
+            lines.append(f"{title:<40} {'count':>8} {'trips':>8} {'total':>9} {'mean':>9} {'p99':>9}")
+            for name, stats in _sorted(groups):
+                lines.append(
+                    f"{name:<40} {stats.count:>8} {stats.round_trips:>8} {stats.total_time:>9.4f} {stats.mean_time:>9.5f} "
+                    f"{stats.percentile(99):>9.4f}"
+                )
+        if self.stats_ranges:
+            lines.append(f"{'statistics ranges':<40} {'groups':>8}")
+            for name, ranges in self.stats_ranges.items():
+                groups = sum(last - first + 1 for first, last in ranges)
+                lines.append(f"{name:<40} {groups:>8} {' '.join(f'{first}-{last}' for first, last in ranges)}")
+        return "\n".join(lines)
+
+
+def command_verb(command: str) -> Tuple[str, str]:
+    """Return (verb, Tcl command) of command, the verb of commands without one (ixStartTransmit...) is the command."""
+    words = command.split(None, 2)
+    if not words:
+        return "", ""
+    members = _members_cget.match(command)
+    if members:
+        start = members.end()
+        return command_verb(command[start:])
+    if len(words) > 1 and words[0] not in TCL_COMMANDS and not words[0].startswith("ix") and _verb.match(words[1]):
+        return words[1], words[0]
+    return words[0], words[0]
+
+
+def caller_operation() -> str:
+    """Return the outermost ixexplorer method in the call stack, the operation called by the package user."""
+    operation = ""
+    frame = sys._getframe(1)
+    while frame:
+        if frame.f_code.co_filename.startswith(_package_dir):
+            operation = _frame_operation(frame)
+        frame = frame.f_back
+    return operation
+
+
+def _frame_operation(frame) -> str:
+    local_vars = frame.f_locals
+    name = frame.f_code.co_name
+    # Member access through TclMemberDescriptor, attribute the call to the object attribute.
+    if name in ("__get__", "__set__") and "obj" in local_vars and hasattr(local_vars.get("self"), "attrname"):
+        return f"{type(local_vars['obj']).__name__}.{local_vars['self'].attrname}"
+    if "self" in local_vars:
+        return f"{type(local_vars['self']).__name__}.{name}"
+    if "cls" in local_vars and isinstance(local_vars["cls"], type):
+        return f"{local_vars['cls'].__name__}.{name}"
+    return f"{os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]}.{name}"
+
+
+def _sorted(groups: Dict[str, CallStats]) -> List[Tuple[str, CallStats]]:
+    return sorted(groups.items(), key=lambda item: item[1].total_time, reverse=True)
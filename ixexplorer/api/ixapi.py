@@ -47,17 +47,59 @@ For example, if you like to set the port speed:
 Note that there is only one temporary storage for each command.
 """
 import logging
+import os
+import sys
+import threading
+import warnings
+from contextlib import ExitStack, contextmanager
+from enum import Enum
+from types import ModuleType
+from typing import ContextManager, Iterable, Iterator, List, Optional
 
 from trafficgenerator import TgnError
 
+from ixexplorer.api.instrumentation import CallsReport
+from ixexplorer.api.scratchpad import ScratchpadTracker
+from ixexplorer.api.tcllist import split_tcl_list, tcl_list, tcl_quote
 from ixexplorer.api.tclproto import TclError
+from ixexplorer.api.tclrecord import TclRecorder
 
 logger = logging.getLogger("tgn.ixexplorer")
 
 FLAG_RDONLY = 1
 FLAG_IGERR = 2
 
-ixe_obj_auto_set = True
+
+class IxeWriteMode(Enum):
+    """How attribute assignments reach the IxHal."""
+
+    # config and set on each assignment.
+    auto_set = "auto_set"
+    # config on each assignment, the caller calls ix_set.
+    manual = "manual"
+    # Record dirty members locally, config and set them on IxeObject.flush or IxePort.write.
+    write_back = "write_back"
+
+
+class _IxApiModule(ModuleType):
+    """The ixapi module, maps the removed ixe_obj_auto_set global to the write mode of the session api."""
+
+    @property
+    def ixe_obj_auto_set(self) -> bool:
+        warnings.warn("ixe_obj_auto_set is deprecated, use IxTclHalApi.write_mode", DeprecationWarning, stacklevel=2)
+        from ixexplorer.ixe_object import IxeObject
+
+        return IxeObject.get_auto_set()
+
+    @ixe_obj_auto_set.setter
+    def ixe_obj_auto_set(self, auto_set: bool) -> None:
+        warnings.warn("ixe_obj_auto_set is deprecated, use IxTclHalApi.write_mode", DeprecationWarning, stacklevel=2)
+        from ixexplorer.ixe_object import IxeObject
+
+        IxeObject.set_auto_set(auto_set)
+
+
+sys.modules[__name__].__class__ = _IxApiModule
 
 
 class MacStr(object):
@@ -77,6 +119,95 @@ class TclMember(object):
         self.doc = doc
 
 
+class TclMemberDescriptor:
+    """Attribute descriptor of one TclMember, created once per member when the class is created by ixe_obj_meta.
+
+    The cget/config command strings and the value converter are precomputed so attribute access only formats the value.
+    """
+
+    def __init__(self, command: str, member: TclMember) -> None:
+        """Precompute the commands and converter of member.
+
+        :param command: Tcl command of the class, e.g. `port`.
+        :param member: member of the class.
+        """
+        self.member = member
+        self.attrname = member.attrname
+        self.__doc__ = member.doc
+        self.cget = f"{command} cget -{member.name}"
+        self.config = f"{command} config -{member.name} "
+        self.convert = _member_converter(member)
+        self.read_only = bool(member.flags & FLAG_RDONLY)
+        self.ignore_errors = bool(member.flags & FLAG_IGERR)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        if self.attrname in obj._dirty:
+            obj.flush()
+        # Read only members (statistics, states...) may change any time so they are never cached.
+        cached = obj.api.cache_enabled and not self.read_only
+        if cached:
+            if self.attrname in obj._cache:
+                obj.api.cache_hits += 1
+                return obj._cache[self.attrname]
+            obj.api.cache_misses += 1
+        try:
+            obj.ix_get(self.member)
+            value = self.convert(obj.api.call(self.cget))
+        except (TclError, TgnError) as e:
+            if not self.ignore_errors:
+                raise e
+            return self.convert("-1")
+        if cached:
+            obj._cache[self.attrname] = value
+        return value
+
+    def __set__(self, obj, value) -> None:
+        if self.read_only:
+            raise AttributeError(f"can't set attribute '{self.attrname}'")
+        obj._cache.pop(self.attrname, None)
+        obj._assigned({self.attrname: value})
+        write_mode = obj.api.write_mode
+        if write_mode == IxeWriteMode.write_back:
+            obj._dirty[self.attrname] = value
+            return
+        try:
+            obj.ix_get(self.member)
+            obj.api.defer(self.config + str(self.member.type(value)), self.ignore_errors)
+        except (TclError, TgnError) as e:
+            if not self.ignore_errors:
+                raise e
+
+        if write_mode == IxeWriteMode.auto_set:
+            obj.ix_set(self.member)
+
+
+def _member_converter(member: TclMember):
+    """Return function that converts value returned by cget to the member type."""
+    if member.type == MacStr:
+        return lambda val: str(MacStr(val.strip()))
+    if member.type is bool:
+        return lambda val: bool(int(val.strip())) if val != "-1" else False
+    if member.type is str:
+        return str.strip
+    return lambda val: member.type(val.strip())
+
+
+def tcl_members_cget(descriptors: Iterable[TclMemberDescriptor]) -> str:
+    """Return Tcl expression that reads all members in one call, as a list of values.
+
+    Members flagged FLAG_IGERR are read under catch and return -1 on error, like the single member getter.
+    """
+    cgets = []
+    for descriptor in descriptors:
+        if descriptor.ignore_errors:
+            cgets.append(f"[if {{[catch {{{descriptor.cget}}} v]}} {{list -1}} else {{set v}}]")
+        else:
+            cgets.append(f"[{descriptor.cget}]")
+    return "list " + " ".join(cgets)
+
+
 class IxTclHalError(Exception):
     def __init__(self, rc):
         self.rc = rc
@@ -85,18 +216,251 @@ class IxTclHalError(Exception):
         return "%s: %s" % (self.__class__.__name__, self.rc)
 
 
+class IxTclHalBatch:
+    """Commands queued by IxTclHalApi.batch, sent to the TclServer as one script.
+
+    The script evaluates each command under catch and returns a Tcl list of {rc result} pairs, so every command keeps
+    its own error semantics and errors are raised for the Python call that queued the failing command.
+    """
+
+    script = "apply {{cmds} {set r {}; foreach c $cmds {lappend r [list [catch {uplevel #0 $c} v] $v]}; return $r}}"
+
+    def __init__(self, api: "IxTclHalApi") -> None:
+        """Create empty batch of api."""
+        self.api = api
+        self.commands = []
+
+    def queue(self, command: str, check_rc: bool = False, ignore_errors: bool = False) -> None:
+        """Queue command, remember where it was queued for the error message.
+
+        :param command: command to send.
+        :param check_rc: True - validate the result like call_rc.
+        :param ignore_errors: True - ignore TclServer errors of the command.
+        """
+        self.commands.append((command, check_rc, ignore_errors, _caller_origin()))
+
+    def flush(self, command: Optional[str] = None) -> Optional[str]:
+        """Send all queued commands, followed by command (if any), in a single round trip.
+
+        :param command: command whose result is required by the caller.
+        :return: the result of command.
+        """
+        if command is not None:
+            self.queue(command)
+        results = self._send()
+        return results[-1] if results else None
+
+    def pipeline(self, commands: List[str], check_rc: bool = False) -> List[str]:
+        """Send all queued commands, followed by commands, in a single round trip.
+
+        :param commands: commands whose results are required by the caller.
+        :param check_rc: True - validate each result of commands like call_rc.
+        :return: the results of commands.
+        """
+        for command in commands:
+            self.queue(command, check_rc=check_rc)
+        results = self._send()
+        first = len(results) - len(commands)
+        return results[first:]
+
+    def _send(self) -> List[str]:
+        if not self.commands:
+            return []
+        commands, self.commands = self.commands, []
+        script = self.script + " " + tcl_quote(tcl_list(*[c[0] for c in commands]))
+        replies = split_tcl_list(self.api._tcl_handler.call(script.replace("%", "%%")))
+        first_error = None
+        results = []
+        for (command, check_rc, ignore_errors, origin), reply in zip(commands, replies):
+            rc, result = split_tcl_list(reply)
+            results.append(result)
+            try:
+                if rc != "0":
+                    raise TclError(result)
+                if check_rc:
+                    self.api._check_rc(result, command)
+            except (TclError, IxTclHalError) as error:
+                if ignore_errors or first_error:
+                    continue
+                logger.error(f"Batched command '{command}' queued at {origin} failed - {error}")
+                error.command = command
+                error.origin = origin
+                first_error = error
+        if first_error:
+            raise first_error
+        return results
+
+
+class IxTclHalConnection:
+    """TclServer connection of IxTclHalApi with the state that is per connection - scratchpad and batch."""
+
+    def __init__(self, tcl_handler) -> None:
+        """Create connection state of tcl_handler (TclClient)."""
+        self.tcl_handler = tcl_handler
+        self.tracker = ScratchpadTracker()
+        self.batch: Optional[IxTclHalBatch] = None
+        # Held by the thread that is bound to the connection, see IxTclHalApi.bind.
+        self.lock = threading.RLock()
+
+
 class IxTclHalApi:
     def __init__(self, tcl_handler):
-        self._tcl_handler = tcl_handler
+        self.connection = IxTclHalConnection(tcl_handler)
+        # Connections bound to threads, threads without binding use the main connection.
+        self._bound = threading.local()
+        # Optional TclClientPool, see tclpool module.
+        self.pool = None
+        self.write_mode = IxeWriteMode.auto_set
+        # Opt-in attributes read cache, see IxeObject._cache.
+        self.cache_enabled = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def connections(self) -> List[IxTclHalConnection]:
+        """Main connection followed by the pool connections, if any."""
+        return [self.connection] + (self.pool.members if self.pool else [])
+
+    @property
+    def _connection(self) -> IxTclHalConnection:
+        return getattr(self._bound, "connection", None) or self.connection
+
+    @property
+    def _tcl_handler(self):
+        return self._connection.tcl_handler
+
+    @property
+    def tracker(self) -> ScratchpadTracker:
+        """Scratchpad tracker of the connection of the current thread."""
+        return self._connection.tracker
+
+    @property
+    def _batch(self) -> Optional[IxTclHalBatch]:
+        return self._connection.batch
+
+    @_batch.setter
+    def _batch(self, batch: Optional[IxTclHalBatch]) -> None:
+        self._connection.batch = batch
+
+    @contextmanager
+    def bind(self, connection: IxTclHalConnection) -> Iterator[IxTclHalConnection]:
+        """Send all calls of the current thread within the block over the given connection.
+
+        Threads bound to the same connection run their blocks one after the other.
+
+        :param connection: one of the api connections.
+        """
+        with connection.lock:
+            previous = getattr(self._bound, "connection", None)
+            self._bound.connection = connection
+            try:
+                yield connection
+            finally:
+                self._bound.connection = previous
 
     def eval(self, cmd, *args):
         return self.call(cmd, *args)
 
     def call(self, cmd: str, *args: str) -> str:
-        return self._tcl_handler.call(cmd, *args)
+        command = cmd % args
+        self.tracker.observe(command)
+        try:
+            if self._batch:
+                return self._batch.flush(command)
+            return self._tcl_handler.call(cmd, *args)
+        except Exception as error:
+            self.tracker.reset()
+            raise error
 
     def call_rc(self, cmd: str, *args: str):
+        if self._batch:
+            self.tracker.observe(cmd % args)
+            self._batch.queue(cmd % args, check_rc=True)
+            return
         rc = self.call(cmd, *args)
+        try:
+            self._check_rc(rc, cmd, *args)
+        except IxTclHalError as error:
+            self.tracker.reset()
+            raise error
+
+    def defer(self, cmd: str, ignore_errors: bool = False) -> None:
+        """Call command whose result is not required, queue it if a batch is active.
+
+        :param cmd: command to call.
+        :param ignore_errors: True - ignore TclServer errors, False - raise them.
+        """
+        if self._batch:
+            self.tracker.observe(cmd % ())
+            self._batch.queue(cmd % (), ignore_errors=ignore_errors)
+            return
+        try:
+            self.call(cmd)
+        except (TclError, TgnError) as error:
+            if not ignore_errors:
+                raise error
+
+    @contextmanager
+    def instrument(self) -> Iterator[CallsReport]:
+        """Record the TclServer calls of the block on all connections, see TclClient.instrument."""
+        with ExitStack() as stack:
+            report = CallsReport()
+            for connection in self.connections:
+                stack.enter_context(connection.tcl_handler.instrument(report))
+            yield report
+
+    def record(self, path: str) -> ContextManager[TclRecorder]:
+        """Return context manager that records the TclServer round trips of the block, see TclClient.record."""
+        return self._tcl_handler.record(path)
+
+    @contextmanager
+    def batch(self) -> Iterator[IxTclHalBatch]:
+        """Queue config/set/call_rc commands and send them to the TclServer as one script on exit.
+
+        Calls that return a result (call, cget...) flush the queue together with the call itself. Nested batches join
+        the outermost one. If the block raises, the commands that are still queued are discarded.
+        """
+        if self._batch:
+            yield self._batch
+            return
+        self._batch = IxTclHalBatch(self)
+        try:
+            yield self._batch
+            self._batch.flush()
+        except Exception as error:
+            self.tracker.reset()
+            raise error
+        finally:
+            self._batch = None
+
+    def pipeline(self, commands: Iterable[str], check_rc: bool = False) -> List[str]:
+        """Send commands back-to-back and wait for all replies, one round trip instead of one per command.
+
+        All replies are read before the first error (if any) is raised so the connection stays in sync. If a batch is
+        active, its queued commands are sent first, together with commands.
+
+        :param commands: fully formatted commands.
+        :param check_rc: True - validate each result like call_rc, False - return results like call.
+        """
+        commands = list(commands)
+        for command in commands:
+            self.tracker.observe(command)
+        try:
+            if self._batch:
+                return self._batch.pipeline(commands, check_rc)
+            results = self._tcl_handler.pipeline(commands)
+            for command, result in zip(commands, results):
+                if isinstance(result, Exception):
+                    raise result
+                if check_rc:
+                    self._check_rc(result, command)
+        except Exception as error:
+            self.tracker.reset()
+            raise error
+        return results
+
+    @staticmethod
+    def _check_rc(rc: str, cmd: str, *args: str) -> None:
         try:
             int(rc[-1])
         except Exception as err:
@@ -105,6 +469,15 @@ class IxTclHalApi:
             raise IxTclHalError(f"{cmd} {args} - rc = {rc}")
 
 
+def _caller_origin() -> str:
+    """Return 'file:line' of the closest caller outside of the ixexplorer package."""
+    package_dir = os.path.dirname(os.path.dirname(__file__))
+    frame = sys._getframe(1)
+    while frame.f_back and frame.f_code.co_filename.startswith(package_dir):
+        frame = frame.f_back
+    return f"{frame.f_code.co_filename}:{frame.f_lineno}"
+
+
 def ixe_obj_meta(name, bases, atts):
     """Dynamically creates properties, which wraps the IxTclHAL API.
 
@@ -125,54 +498,20 @@ def ixe_obj_meta(name, bases, atts):
         command = clsdict.get("__tcl_command__", None)
         commands = clsdict.get("__tcl_commands__", [])
 
-        for (n, m) in enumerate(members):
+        descriptors = []
+        for n, m in enumerate(members):
             if not isinstance(m, TclMember):
                 raise RuntimeError("Element #%d of __tcl_members__ is not a TclMember" % (n + 1,))
-
-            def fget(self, cmd=command, m=m):
-                try:
-                    self.ix_get(m)
-                    val = self.api.call("%s cget -%s" % (cmd, m.name))
-                except (TclError, TgnError) as e:
-                    if not m.flags & FLAG_IGERR:
-                        raise e
-                    val = "-1"
-
-                return_val = val.strip() if isinstance(val, str) else val[0]
-                if m.type == MacStr:
-                    return str(m.type(return_val))
-                if m.type is bool:
-                    return bool(int(return_val)) if val != "-1" else False
-                return m.type(return_val)
-
-            def fset(self, value, cmd=command, m=m):
-                try:
-                    self.ix_get(m)
-                    self.api.call("%s config -%s %s" % (cmd, m.name, m.type(value)))
-                except (TclError, TgnError) as e:
-                    if not m.flags & FLAG_IGERR:
-                        raise e
-
-                if ixe_obj_auto_set:
-                    self.ix_set(m)
-
             if not m.attrname:
                 m.attrname = m.name
-            attrname = m.attrname
-
-            if m.doc is not None:
-                fget.__doc__ = m.doc
-
-            fget.__name__ = "_get_%s" % attrname
-            clsdict[fget.__name__] = fget
-            if not m.flags & FLAG_RDONLY:
-                fset.__name__ = "_set_%s" % attrname
-                clsdict[fset.__name__] = fset
-                p = property(fget=fget, fset=fset)
-            else:
-                p = property(fget=fget)
-
-            clsdict[attrname] = p
+            descriptor = TclMemberDescriptor(command, m)
+            descriptors.append(descriptor)
+            clsdict[m.attrname] = descriptor
+
+        # Classes without their own members inherit the index of their base class.
+        if "__tcl_members__" in clsdict or not any(hasattr(b, "__tcl_member_index__") for b in clsbases):
+            clsdict["__tcl_member_index__"] = {d.attrname: d for d in descriptors}
+            clsdict["__tcl_rdonly_members__"] = tuple(d.attrname for d in descriptors if d.read_only)
         t = type(clsname, clsbases, clsdict)
 
         for c in commands:
@@ -0,0 +1,137 @@
+"""
+Model of the IxTclHal temporary storage (scratchpad) on one TclServer connection.
+
+IxTclHal keeps one temporary storage per Tcl command. `<cmd> get <uri>` loads it from the IxHal, `<cmd> config`
+modifies it, `<cmd> set <uri>` stores it back into the IxHal and `<cmd> setDefault` resets it. The tracker observes
+every command sent on the connection and keeps, per Tcl command, a key of the object the storage currently holds and
+whether it was modified since it was loaded, so objects can skip `get` when the storage already holds them and `set`
+when the IxHal already holds the storage.
+
+Some storages depend on other storages:
+
+- The IxHal objects behind sub-objects (ip, udp, vlan...) are loaded by the `get` of their parent (stream), so the key
+  of a sub-object includes the generation of its parent storage - any reload of the parent invalidates the sub-object.
+- Some sub-objects have no `get` at all, the `get` of the parent loads them directly (`stream get` loads `protocol`).
+- `set` of a sub-object modifies the IxHal object of its parent, which must then be set as well.
+"""
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+# Verbs that do not change the storage of their command, any other unknown verb invalidates it.
+READ_ONLY_VERBS = {"cget", "write", "export", "isValidFeature", "isActiveFeature"}
+
+
+class ScratchpadTracker:
+    """Track which object the temporary storage of each Tcl command holds."""
+
+    def __init__(self) -> None:
+        """Create tracker that knows nothing about the temporary storages."""
+        # Debug mode - verify that each skipped get/set is really redundant (costs one round trip per skip).
+        self.verify = False
+        self.skipped_gets = 0
+        self.skipped_sets = 0
+        # command -> [key of the held object, modified since loaded]
+        self.storage: Dict[str, list] = {}
+        self.generation: Dict[str, int] = {}
+        self.get_verbs: Dict[str, Set[str]] = {}
+        self.set_verbs: Dict[str, Dict[str, str]] = {}
+        self.depends: Dict[Tuple[str, str], str] = {}
+        self.loads: Dict[str, Set[str]] = {}
+        self.loaded_by: Dict[str, str] = {}
+        self._classes: Set[type] = set()
+
+    def observe(self, command: str) -> None:
+        """Update the model with a command sent to the TclServer.
+
+        :param command: fully formatted command.
+        """
+        words = command.split(None, 2)
+        if len(words) < 2 or words[1] in READ_ONLY_VERBS:
+            return
+        name, verb = words[0], words[1]
+        if name not in self.get_verbs and name not in self.loaded_by:
+            return
+        rest = words[2] if len(words) > 2 else ""
+        if verb == "config":
+            self._modify(name)
+        elif verb in self.get_verbs.get(name, ()):
+            self._load(name, self._key(name, verb, rest))
+            for loaded in self.loads.get(name, ()):
+                self._load(loaded, self._key(loaded, None, rest))
+        elif verb in self.set_verbs.get(name, {}):
+            get_verb = self.set_verbs[name][verb]
+            key = self._key(name, get_verb, rest)
+            self._load(name, key, reload=self.storage.get(name, [None])[0] != key)
+            if (name, get_verb) in self.depends:
+                self._modify(self.depends[(name, get_verb)])
+        else:
+            # setDefault and commands with unknown effect on the storage.
+            self._load(name, None, modified=True)
+            if name in self.loaded_by:
+                self._modify(self.loaded_by[name])
+
+    def holds(self, obj, volatile: bool = False) -> bool:
+        """Return whether the storage of the object command holds the object.
+
+        :param obj: IxeObject.
+        :param volatile: True - the caller reads read-only members that should be reloaded from the IxHal unless the
+            storage is modified (reload would drop the modifications).
+        """
+        key = self.key(obj)
+        entry = self.storage.get(obj.__tcl_command__)
+        if key is None or not entry or entry[0] != key:
+            return False
+        return entry[1] or not volatile
+
+    def clean(self, obj) -> bool:
+        """Return whether the storage holds the object and was not modified, so set would be redundant."""
+        return self.holds(obj) and not self.storage[obj.__tcl_command__][1]
+
+    def assume(self, obj, modified: bool = True) -> None:
+        """Declare that the storage holds the object, e.g. after setDefault in order to create it."""
+        self._load(obj.__tcl_command__, self.key(obj), modified)
+        if modified and obj.__tcl_command__ in self.loaded_by:
+            self._modify(self.loaded_by[obj.__tcl_command__])
+
+    def reset(self, *commands: str) -> None:
+        """Forget the content of the storages of the given commands, or of all storages if no command is given."""
+        for command in commands or list(self.storage):
+            self._load(command, None)
+
+    def key(self, obj) -> Optional[Hashable]:
+        """Return the key of the object in the storage of its command, None if the storage can not hold it."""
+        self._register(obj)
+        if obj.__get_command__:
+            verb, _, rest = f"{obj.__get_command__} {obj.uri}".partition(" ")
+            return self._key(obj.__tcl_command__, verb, rest)
+        if obj.__tcl_command__ in self.loaded_by:
+            return self._key(obj.__tcl_command__, None, obj.parent.uri)
+        return None
+
+    def _register(self, obj) -> None:
+        if type(obj) in self._classes:
+            return
+        self._classes.add(type(obj))
+        command = obj.__tcl_command__
+        get_verb = obj.__get_command__.split()[0] if obj.__get_command__ else None
+        if get_verb:
+            self.get_verbs.setdefault(command, set()).add(get_verb)
+            if obj.__set_command__:
+                self.set_verbs.setdefault(command, {})[obj.__set_command__.split()[0]] = get_verb
+        if obj.__get_parent__:
+            if get_verb:
+                self.depends[(command, get_verb)] = obj.parent.__tcl_command__
+            else:
+                self.loads.setdefault(obj.parent.__tcl_command__, set()).add(command)
+                self.loaded_by[command] = obj.parent.__tcl_command__
+
+    def _key(self, name: str, verb: Optional[str], rest: str) -> Hashable:
+        parent = self.depends.get((name, verb)) if verb else self.loaded_by.get(name)
+        return verb, rest, parent, self.generation.get(parent, 0) if parent else None
+
+    def _load(self, name: str, key: Optional[Hashable], modified: bool = False, reload: bool = True) -> None:
+        self.storage[name] = [key, modified]
+        if reload:
+            self.generation[name] = self.generation.get(name, 0) + 1
+
+    def _modify(self, name: str) -> None:
+        self.storage.setdefault(name, [None, True])[1] = True
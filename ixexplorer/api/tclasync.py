@@ -0,0 +1,231 @@
+"""
+Asyncio TclServer client and IxTclHal api, for applications that drive many TclServers from one event loop.
+
+AsyncTclClient implements the TclClient socket framing on asyncio streams. Commands of concurrent coroutines on the same
+connection are pipelined - each request is written as soon as it is issued and replies are matched to requests in
+order, so a slow command does not block the event loop and other connections keep running. Any reply may be followed by
+the reply of another coroutine, so all commands are marked like TclClient pipelined commands (see mark_command)::
+
+    async def link_up(host, ports):
+        api = AsyncIxTclHalApi(AsyncTclClient(logger, host))
+        await api.connect("user")
+        await api.call_rc(f"chassis add {host}")
+        await api.wait_for_up(ports)
+        return await api.get_members("stat get statAllStats 1 1 1", "stat", "framesSent", "framesReceived")
+
+    await asyncio.gather(*[link_up(host, ports) for host, ports in chassis.items()])
+
+IxTclHal temporary storages are per connection, so commands that load a storage and read it (get + cget) must not be
+interleaved with other coroutines that use the same storage - get_members sends them as one atomic request.
+
+Only TclServer socket connections are supported, not the ssh connection of Linux chassis (port 8022).
+"""
+import asyncio
+import socket
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Union
+
+from trafficgenerator import TgnError
+from trafficgenerator.tgn_utils import new_log_file
+
+from ixexplorer.api import tclproto
+from ixexplorer.api.ixapi import IxTclHalApi, IxTclHalError
+from ixexplorer.api.tcllist import split_tcl_list, tcl_list
+from ixexplorer.api.tclproto import TclClient, TclError, TclReplyParser, mark_command, new_mark
+
+
+class AsyncTclClient:
+    """TclServer socket client for asyncio, concurrent calls are pipelined on one connection."""
+
+    def __init__(self, logger, host: str, port: int = 4555) -> None:
+        """Create client, the connection is opened by connect.
+
+        :param logger: logger.
+        :param host: TclServer host.
+        :param port: TclServer port, ssh (8022) is not supported.
+        """
+        self.logger = logger
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.parser = TclReplyParser()
+        # Mark of the commands, see mark_command.
+        self.mark = new_mark()
+        # Futures of the requests that wait for replies, in request order.
+        self.pending: Deque[asyncio.Future] = deque()
+        self._read_task: Optional[asyncio.Task] = None
+
+        self.tcl_script = new_log_file(self.logger, self.__class__.__name__)
+
+    async def connect(self) -> None:
+        """Connect to the TclServer and load IxTclHal."""
+        self.logger.debug(f"Opening connection to {self.host}:{self.port}")
+        if self.port == 8022:
+            raise TgnError("AsyncTclClient supports only TclServer socket connections")
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.parser = TclReplyParser()
+        self._read_task = asyncio.ensure_future(self._read_replies())
+        await self.call("package req IxTclHal")
+        await self.call("enableEvents true")
+
+    async def close(self) -> None:
+        """Close the connection, the calls that wait for replies fail."""
+        self.logger.debug("Closing connection")
+        if self._read_task:
+            self._read_task.cancel()
+            self._read_task = None
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        self._fail_pending(TgnError("connection closed"))
+
+    async def call(self, string: str, *args: str) -> str:
+        """Send command and return its result, like TclClient.call."""
+        result = (await self.pipeline([string % args]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def pipeline(self, commands: Iterable[str]) -> List[Union[str, Exception]]:
+        """Send commands back-to-back and return their results in order, like TclClient.pipeline.
+
+        :param commands: fully formatted commands (no % formatting is applied).
+        """
+        if self.writer is None:
+            raise RuntimeError("AsyncTclClient is not connected")
+        commands = list(commands)
+        loop = asyncio.get_running_loop()
+        futures = [loop.create_future() for _ in commands]
+        for command in commands:
+            self.logger.debug("sending %s", command)
+            self.tcl_script.debug(command)
+        # Queue the futures and write the request without awaiting in between, so replies match requests.
+        self.pending.extend(futures)
+        self.writer.write("".join(mark_command(command, self.mark) + "\r\n" for command in commands).encode("utf-8"))
+        await self.writer.drain()
+        try:
+            frames = await asyncio.wait_for(asyncio.gather(*futures), tclproto.socket_timeout)
+        except asyncio.TimeoutError:
+            # The replies are still due, the reader drops them when their (cancelled) futures come up.
+            raise TgnError(f"no response after {tclproto.socket_timeout} seconds")
+        results = []
+        for frame in frames:
+            reply = frame.decode("utf-8")
+            self.logger.debug("received %s", reply)
+            try:
+                result, io_output = TclClient._parse_reply(reply)
+                results.append(TgnError(io_output) if io_output and "Error:" in io_output else result)
+            except TclError as error:
+                results.append(error)
+        return results
+
+    async def _read_replies(self) -> None:
+        try:
+            while True:
+                data = await self.reader.read(2**16)
+                if not data:
+                    raise TgnError(f"connection to {self.host}:{self.port} closed by TclServer")
+                self.parser.feed(data)
+                while self.parser.buffer:
+                    if not self.pending:
+                        raise TgnError(f"unexpected data from TclServer {self.host}:{self.port} - {data[:256]!r}")
+                    frame = self.parser.next_frame(mark=self.mark)
+                    if frame is None:
+                        break
+                    future = self.pending.popleft()
+                    if not future.done():
+                        future.set_result(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            self._fail_pending(error)
+
+    def _fail_pending(self, error: Exception) -> None:
+        while self.pending:
+            future = self.pending.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+
+class AsyncIxTclHalApi:
+    """Async facade of IxTclHalApi - raw IxTclHal commands over AsyncTclClient."""
+
+    def __init__(self, tcl_handler: AsyncTclClient) -> None:
+        """Create api over the client, the connection is opened by connect."""
+        self._tcl_handler = tcl_handler
+
+    async def connect(self, user: Optional[str] = None) -> None:
+        """Connect to the TclServer.
+
+        :param user: if user - login session.
+        """
+        await self._tcl_handler.connect()
+        if user:
+            await self.call_rc(f"session login {user}")
+
+    async def close(self) -> None:
+        """Close the TclServer connection."""
+        await self._tcl_handler.close()
+
+    async def call(self, cmd: str, *args: str) -> str:
+        """Send command and return its result, see IxTclHalApi.call."""
+        return await self._tcl_handler.call(cmd, *args)
+
+    async def call_rc(self, cmd: str, *args: str) -> None:
+        """Send command and raise IxTclHalError if its return code is not 0, see IxTclHalApi.call_rc."""
+        IxTclHalApi._check_rc(await self.call(cmd, *args), cmd, *args)
+
+    async def pipeline(self, commands: Iterable[str], check_rc: bool = False) -> List[str]:
+        """Send commands back-to-back and wait for all replies, see IxTclHalApi.pipeline."""
+        commands = list(commands)
+        results = await self._tcl_handler.pipeline(commands)
+        for command, result in zip(commands, results):
+            if isinstance(result, Exception):
+                raise result
+            if check_rc:
+                IxTclHalApi._check_rc(result, command)
+        return results
+
+    async def get_members(self, get: str, command: str, *members: str) -> Dict[str, str]:
+        """Load object into the temporary storage of its command and read members, in one atomic request.
+
+        :param get: get command, e.g. `stat get statAllStats 1 1 1`.
+        :param command: Tcl command of the storage, e.g. `stat`.
+        :param members: members to read.
+        """
+        cgets = " ".join(f"[{command} cget -{member}]" for member in members)
+        script = f'if {{[set rc [{get}]]}} {{return -code error "rc = $rc"}} else {{list {cgets}}}'
+        try:
+            values = await self.call(script)
+        except TclError as error:
+            raise IxTclHalError(f"{get} - {error.result}")
+        return dict(zip(members, split_tcl_list(values)))
+
+    async def wait_for_up(self, ports: Iterable[str], timeout: float = 16, interval: float = 1) -> None:
+        """Wait until all ports reach link up state without blocking the event loop.
+
+        :param ports: port URIs (chassis card port).
+        :param timeout: seconds to wait.
+        :param interval: seconds between link state checks.
+        """
+        script = self._port_list_script("ixCheckLinkState", ports)
+        deadline = time.monotonic() + timeout
+        while await self.call(script) != "0":
+            if time.monotonic() > deadline:
+                raise TgnError(f"Ports {list(ports)} did not reach up state after {timeout} seconds")
+            await asyncio.sleep(interval)
+
+    async def wait_transmit_done(self, ports: Iterable[str]) -> None:
+        """Wait until transmit ends on all ports, the TclServer blocks this connection only.
+
+        :param ports: port URIs (chassis card port).
+        """
+        await self.call_rc(self._port_list_script("ixCheckTransmitDone", ports))
+
+    @staticmethod
+    def _port_list_script(command: str, ports: Iterable[str]) -> str:
+        """Return script that calls ix* port list command, the port list is passed by variable name."""
+        return f"set pl_async [list {tcl_list(*ports)}]; {command} pl_async"
@@ -0,0 +1,155 @@
+"""
+Build and parse Tcl lists locally, without a Tcl interpreter round trip.
+"""
+import re
+from typing import Dict, Iterator, List
+
+_plain_word = re.compile(r"[^\s{}\[\]$\"\\;]+")
+# Plain word and quoted element (up to the closing quote), with backslash sequences.
+_plain_element = re.compile(r"(?:[^\s\\]|\\\n[ \t]*|\\.|\\\Z)*", re.S)
+_quoted_element = re.compile(r'(?:[^"\\]|\\\n[ \t]*|\\.)*', re.S)
+_backslash_sequence = re.compile(
+    r"\\(?:([0-3][0-7]{0,2}|[4-7][0-7]?)|x([0-9a-fA-F]{1,2})|u([0-9a-fA-F]{1,4})|U([0-9a-fA-F]{1,8})|(\n[ \t]*)|(.))|\\\Z",
+    re.S,
+)
+_space = re.compile(r"\s*")
+_special_char = re.compile(r"[{}\"\\]")
+# Braced element without nested braces or backslashes, or plain word without backslashes, followed by space or end.
+_simple_element = re.compile(r"\s*(?:\{([^{}\\]*)\}|([^\s{\"\\][^\s\\]*))(?=\s|\Z)")
+_brace_or_backslash = re.compile(r"[{}\\]")
+_escaped_char = re.compile(r"([\s{}\[\]$\"\\;])")
+_backslash_map = {"a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v"}
+
+
+def tcl_quote(word: str) -> str:
+    """Quote string so Tcl treats it as a single list element / command word.
+
+    :param word: string to quote.
+    """
+    word = str(word)
+    if not word:
+        return "{}"
+    if _plain_word.fullmatch(word):
+        return word
+    if "\\" not in word and "\n" not in word and _balanced(word):
+        return "{" + word + "}"
+    return _escaped_char.sub(lambda m: "\\n" if m.group(1) == "\n" else "\\" + m.group(1), word)
+
+
+def tcl_list(*words: object) -> str:
+    """Return Tcl list of the given words."""
+    return " ".join(tcl_quote(str(w)) for w in words)
+
+
+def split_tcl_list(tcl_str: str) -> List[str]:
+    """Split Tcl list string into its (string) elements.
+
+    :param tcl_str: Tcl list string.
+    """
+    if not _special_char.search(tcl_str):
+        return tcl_str.split()
+    return list(iter_tcl_list(tcl_str))
+
+
+def split_tcl_dict(tcl_str: str) -> Dict[str, str]:
+    """Split Tcl dict string (key value list) into dictionary.
+
+    :param tcl_str: Tcl dict string.
+    """
+    elements = split_tcl_list(tcl_str)
+    if len(elements) % 2:
+        raise ValueError(f"missing value to go with key in dict: {tcl_str}")
+    return dict(zip(elements[::2], elements[1::2]))
+
+
+def iter_tcl_list(tcl_str: str, start: int = 0) -> Iterator[str]:
+    """Yield the elements of Tcl list string one by one, without splitting the whole string first.
+
+    Elements are sliced from the string, only elements with backslash sequences (outside of braces) are substituted.
+
+    :param tcl_str: Tcl list string, e.g. a TclServer reply.
+    :param start: index of the list in the string.
+    """
+    i = start
+    length = len(tcl_str)
+    simple_element = _simple_element.match
+    skip_space = _space.match
+    brace_or_backslash = _brace_or_backslash.search
+    while True:
+        match = simple_element(tcl_str, i)
+        if match:
+            i = match.end()
+            element = match.group(1)
+            yield match.group(2) if element is None else element
+            continue
+        i = skip_space(tcl_str, i).end()
+        if i >= length:
+            return
+        char = tcl_str[i]
+        first = i + 1
+        if char == "{":
+            depth = 1
+            j = first
+            while depth:
+                match = brace_or_backslash(tcl_str, j)
+                if not match:
+                    raise ValueError(f"unmatched open brace in list: {tcl_str}")
+                j = match.end()
+                char = match.group()
+                if char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                else:
+                    j += 1
+            last = j - 1
+            element = tcl_str[first:last]
+        elif char == '"':
+            j = _quoted_element.match(tcl_str, first).end()
+            if j >= length or tcl_str[j] != '"':
+                raise ValueError(f"unmatched open quote in list: {tcl_str}")
+            element = _substitute(tcl_str[first:j])
+            j += 1
+        else:
+            j = _plain_element.match(tcl_str, i).end()
+            element = _substitute(tcl_str[i:j])
+        if j < length and not tcl_str[j].isspace():
+            raise ValueError(f"list element followed by '{tcl_str[j]}' instead of space: {tcl_str}")
+        yield element
+        i = j
+
+
+def _substitute(element: str) -> str:
+    """Return element with its backslash sequences substituted."""
+    return _backslash_sequence.sub(_backslash, element) if "\\" in element else element
+
+
+def _backslash(match: re.Match) -> str:
+    octal, hexadecimal, unicode, long_unicode, newline, char = match.groups()
+    if octal:
+        return chr(int(octal, 8))
+    if hexadecimal or unicode:
+        return chr(int(hexadecimal or unicode, 16))
+    if long_unicode:
+        # Tcl stops at the digit that would take the code point above U+10FFFF.
+        digits = len(long_unicode)
+        while int(long_unicode[:digits], 16) > 0x10FFFF:
+            digits -= 1
+        return chr(int(long_unicode[:digits], 16)) + long_unicode[digits:]
+    if newline:
+        return " "
+    if char is None:
+        return "\\"
+    return _backslash_map.get(char, char)
+
+
+def _balanced(word: str) -> bool:
+    depth = 0
+    for char in word:
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
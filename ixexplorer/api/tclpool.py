@@ -0,0 +1,146 @@
+"""
+Pool of TclServer connections under one IxTclHalApi, for config writes and stats reads that run in parallel threads.
+
+IxTclHal temporary storages are per connection, so each object is pinned to one pool connection by its port (or
+chassis) and all commands of the object, get and cget or config and set, go over this connection. Threads that work
+on objects pinned to the same connection run one after the other::
+
+    pool = ixia.open_pool(4)
+    pool.parallel(lambda port: port.write(), ports)
+    stats = pool.parallel(lambda port: IxePortsStats(port).read_stats(), ports)
+
+Each pool connection is a TclClient to the TclServer of the main connection. After connect, the pool runs its setup
+function on the connection (IxeApp logs in the session and adds the chassis chain) so commands behave the same on all
+connections.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, TypeVar, Union
+
+from ixexplorer.api.ixapi import IxTclHalApi, IxTclHalConnection
+from ixexplorer.api.tclproto import TclClient
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class IxeAffinity(Enum):
+    """Objects of the same port (or chassis) share one pool connection - value is the number of URI words to match."""
+
+    port = 3
+    chassis = 1
+
+
+class TclClientPool:
+    """TclServer connections, in addition to the api main connection, with objects pinned to connections."""
+
+    def __init__(self, api: IxTclHalApi, size: int = 4, affinity: IxeAffinity = IxeAffinity.port) -> None:
+        """Create pool connections to the TclServer of the api main connection, connect them with warm_up.
+
+        The previous pool of the api, if any, is closed.
+
+        :param api: api to serve, the pool is available as api.pool.
+        :param size: number of pool connections, in addition to the main connection.
+        :param affinity: pin objects to connections by port or by chassis.
+        """
+        main = api.connection.tcl_handler
+        self.api = api
+        self.affinity = affinity
+        self.members = [IxTclHalConnection(TclClient(main.logger, main.host, main.port, main.rsa_id)) for _ in range(size)]
+        # Called with the thread bound to each new connection, after connect.
+        self.setup: Optional[Callable[[], None]] = None
+        self._pinned: Dict[str, IxTclHalConnection] = {}
+        self._lock = threading.Lock()
+        if api.pool:
+            api.pool.close()
+        api.pool = self
+
+    def warm_up(self) -> None:
+        """Connect and set up all pool connections that are not connected yet, in parallel."""
+        members = [member for member in self.members if not member.tcl_handler.fd]
+        with ThreadPoolExecutor(max_workers=len(members) or 1) as executor:
+            list(executor.map(self._open, members))
+
+    def health_check(self) -> List[bool]:
+        """Check all pool connections and reopen the ones that do not respond.
+
+        :return: for each pool connection, whether it was healthy.
+        """
+        healthy = []
+        for member in self.members:
+            with self.api.bind(member):
+                try:
+                    member.tcl_handler.call("package present IxTclHal")
+                    healthy.append(True)
+                    continue
+                except Exception as error:
+                    logger.warning(f"pool connection {self.members.index(member)} is down - {error}")
+                    healthy.append(False)
+                if member.tcl_handler.fd:
+                    self._close(member)
+                self._open(member)
+        return healthy
+
+    def close(self) -> None:
+        """Close all pool connections and detach the pool from the api."""
+        for member in self.members:
+            if member.tcl_handler.fd:
+                self._close(member)
+        self._pinned.clear()
+        if self.api.pool is self:
+            self.api.pool = None
+
+    def member(self, obj: Union[object, str]) -> IxTclHalConnection:
+        """Return the pool connection of object, objects are pinned to connections round robin on first use.
+
+        :param obj: IxeObject or object URI.
+        """
+        uri = obj if isinstance(obj, str) else obj.uri
+        key = " ".join(uri.split()[: self.affinity.value])
+        with self._lock:
+            if key not in self._pinned:
+                self._pinned[key] = self.members[len(self._pinned) % len(self.members)]
+            return self._pinned[key]
+
+    def bind(self, obj: Union[object, str]) -> ContextManager[IxTclHalConnection]:
+        """Return context manager that sends all calls of the current thread over the pool connection of object.
+
+        :param obj: IxeObject or object URI.
+        """
+        return self.api.bind(self.member(obj))
+
+    def parallel(self, function: Callable[[T], R], objects: Iterable[T], max_workers: Optional[int] = None) -> List[R]:
+        """Run function on each object in a thread bound to the pool connection of the object.
+
+        :param function: function of one object.
+        :param objects: IxeObjects (or URIs) to run the function on.
+        :param max_workers: maximum number of threads, None - number of pool connections.
+        :return: function results, in objects order.
+        """
+        objects = list(objects)
+
+        def run(obj: T) -> R:
+            with self.bind(obj):
+                return function(obj)
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.members)) as executor:
+            return list(executor.map(run, objects))
+
+    def _open(self, member: IxTclHalConnection) -> None:
+        member.tracker.reset()
+        member.tcl_handler.connect()
+        if self.setup:
+            with self.api.bind(member):
+                self.setup()
+
+    @staticmethod
+    def _close(member: IxTclHalConnection) -> None:
+        try:
+            member.tcl_handler.close()
+        except OSError as error:
+            logger.warning(f"failed to close pool connection - {error}")
+            member.tcl_handler.fd = None
@@ -18,14 +18,44 @@
 # Protocol parser for IXIA's underlying TclServer
 #
 
+import secrets
+import selectors
 import socket
 import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple, Union
 
 import paramiko
 from trafficgenerator import TgnError
 from trafficgenerator.tgn_utils import new_log_file
 
+from ixexplorer.api.instrumentation import CallsReport, caller_operation
+from ixexplorer.api.tcllist import tcl_quote
+from ixexplorer.api.tclrecord import TclRecorder, read_recording
+
 ssh_timeout = 60
+socket_timeout = 16
+
+# Tcl return codes (TCL_OK .. TCL_CONTINUE) that may precede the reply terminator.
+TCL_RETURN_CODES = b"01234"
+# Pipelined command wrapper - the result (or error) of the command is followed by the mark of the connection, so the
+# reply ends at the mark and results that contain lines ending like a reply frame cannot end it early. `return -code`
+# of the command takes effect as it does at top level.
+MARKED_COMMAND = (
+    "apply {{c m} {set code [catch {uplevel #0 $c} r o]; if {$code == 2} {set code [dict get $o -code]}; "
+    "if {$code == 1} {error $r$m}; return $r$m}}"
+)
+
+
+def new_mark() -> bytes:
+    """Return random reply mark for a connection, see mark_command."""
+    return secrets.token_hex(8).encode("ascii")
+
+
+def mark_command(command: str, mark: bytes) -> str:
+    """Return command wrapped so that its reply ends with mark before the return code, see TclReplyParser.next_frame."""
+    return f"{MARKED_COMMAND} {tcl_quote(command)} {mark.decode('ascii')}"
 
 
 class TclError(Exception):
@@ -36,6 +66,74 @@ class TclError(Exception):
         return f"{self.__class__.__name__}: {self.result}"
 
 
+class TclReplyParser:
+    r"""Incremental parser of TclServer reply frames.
+
+    Reply format is
+     [<io output>\r]<result><tcl return code>\r\n
+    where tcl_return code is exactly one byte.
+
+    Results and io output may contain lines that end like a frame (e.g. `less than 64\r\n`), so the last expected
+    frame ends only at a terminator that ends the received data, and pipelined commands are marked (see mark_command) so
+    their frames end at the mark.
+    """
+
+    def __init__(self) -> None:
+        """Create parser with empty buffer."""
+        self.buffer = bytearray()
+        self._scan_pos = 0
+
+    def feed(self, data: bytes) -> None:
+        """Append data received from the socket."""
+        self.buffer += data
+
+    def next_frame(self, last: bool = False, mark: Optional[bytes] = None) -> Optional[bytes]:
+        r"""Pop the next complete frame, without the \r\n terminator, or return None if no frame is complete yet.
+
+        :param last: True - no other reply is due after this frame, the frame is complete only if the buffered data ends
+            with a terminator. False - the frame ends at the first terminator (late replies of timed out calls).
+        :param mark: mark of the marked command of the frame, the frame ends at the first mark followed by a terminator
+            and is returned without the mark.
+        """
+        if mark:
+            return self._next_marked_frame(mark)
+        if last:
+            if len(self.buffer) < 3 or self.buffer[-2:] != b"\r\n" or self.buffer[-3] not in TCL_RETURN_CODES:
+                return None
+            frame = bytes(self.buffer[:-2])
+            self.buffer.clear()
+            self._scan_pos = 0
+            return frame
+        while True:
+            end = self.buffer.find(b"\r\n", self._scan_pos)
+            if end < 0:
+                self._scan_pos = max(len(self.buffer) - 1, 0)
+                return None
+            if end > 0 and self.buffer[end - 1] in TCL_RETURN_CODES:
+                frame = bytes(self.buffer[:end])
+                del self.buffer[: end + 2]
+                self._scan_pos = 0
+                return frame
+            self._scan_pos = end + 1
+
+    def _next_marked_frame(self, mark: bytes) -> Optional[bytes]:
+        while True:
+            end = self.buffer.find(mark, self._scan_pos)
+            if end < 0:
+                self._scan_pos = max(len(self.buffer) - len(mark) + 1, 0)
+                return None
+            code = end + len(mark)
+            if len(self.buffer) < code + 3:
+                self._scan_pos = end
+                return None
+            if self.buffer[code] in TCL_RETURN_CODES and self.buffer.startswith(b"\r\n", code + 1):
+                frame = bytes(self.buffer[:end]) + bytes((self.buffer[code],))
+                del self.buffer[: code + 3]
+                self._scan_pos = 0
+                return frame
+            self._scan_pos = end + 1
+
+
 class TclClient:
     def __init__(self, logger, host, port=4555, rsa_id=None):
         self.logger = logger
@@ -43,7 +141,16 @@ class TclClient:
         self.port = port
         self.rsa_id = rsa_id
         self.fd = None
-        self.buffer_size = 2**12
+        self.buffer_size = 2**16
+        self.selector = None
+        self.parser = TclReplyParser()
+        # Marks of the late replies of timed out calls, None for replies of commands that are not marked.
+        self.stale_replies: Deque[Optional[bytes]] = deque()
+        # Mark of the pipelined commands, see mark_command.
+        self.mark = new_mark()
+        # Reports of the active instrument() blocks.
+        self.reports: List[CallsReport] = []
+        self.recorder: Optional[TclRecorder] = None
 
         self.tcl_script = new_log_file(self.logger, self.__class__.__name__)
 
@@ -55,31 +162,130 @@ class TclClient:
         command = string % args
         self.logger.debug("sending %s", command.rstrip())
         self.tcl_script.debug(command.rstrip())
-        self.fd.send(command.encode("utf-8"))
-
-        # reply format is
-        #  [<io output>\r]<result><tcl return code>\r\n
-        # where tcl_return code is exactly one byte
-        reply = ""
-        for _ in range(16 * 100):
-            reply += str(self.fd.recv(self.buffer_size).decode("utf-8"))
-            if reply.endswith("\r\n"):
-                break
-            time.sleep(0.01)
-        if not reply:
-            raise Exception("no response after 16 seconds")
-        self.logger.debug("received %s", reply.rstrip())
-        assert reply[-2:] == "\r\n"
-
-        tcl_result = int(reply[-3])
-        data = reply[:-3].rsplit("\r", 1)
+        request = command.encode("utf-8")
+        start = time.perf_counter()
+        frame = self._exchange(request)[0]
+        if self.reports:
+            self._report([(command, len(request), len(frame) + 2)], time.perf_counter() - start)
+        if self.recorder:
+            self._write_recording([command[:-2]], [frame], time.perf_counter() - start)
+        reply = frame.decode("utf-8")
+        self.logger.debug("received %s", reply)
+        result, io_output = self._parse_reply(reply)
+        self.logger.debug("result=%s io_output=%s", result, io_output)
+        return result, io_output
+
+    def socket_pipeline(self, commands: Iterable[str]) -> List[Union[Tuple[str, Optional[str]], TclError]]:
+        """Send all commands back-to-back and demultiplex their replies in order.
+
+        Commands are sent as is (no % formatting). Each entry of the returned list is either the (result, io_output)
+        tuple socket_call would have returned for the command or the TclError it would have raised.
+        """
+        if self.fd is None:
+            raise RuntimeError("TclClient is not connected")
+
+        commands = list(commands)
+        for command in commands:
+            self.logger.debug("sending %s", command)
+            self.tcl_script.debug(command)
+        lines = self._pipeline_lines(commands)
+        request = b"".join(lines)
+        start = time.perf_counter()
+        frames = self._exchange(request, len(commands), self.mark)
+        if self.reports:
+            exchange = [(c, len(line), len(f) + 2) for c, line, f in zip(commands, lines, frames)]
+            self._report(exchange, time.perf_counter() - start)
+        if self.recorder:
+            self._write_recording(commands, frames, time.perf_counter() - start)
+        replies = []
+        for frame in frames:
+            reply = frame.decode("utf-8")
+            self.logger.debug("received %s", reply)
+            try:
+                replies.append(self._parse_reply(reply))
+            except TclError as error:
+                replies.append(error)
+        return replies
+
+    def _pipeline_lines(self, commands: List[str]) -> List[bytes]:
+        """Return the request lines of pipelined commands, marked so their replies cannot be confused."""
+        return [(mark_command(command, self.mark) + "\r\n").encode("utf-8") for command in commands]
+
+    def _exchange(self, request: bytes, replies: int = 1, mark: Optional[bytes] = None) -> List[bytes]:
+        """Send request and block until its reply frames arrive or the socket_timeout deadline expires.
+
+        The socket is watched with a selector so the call returns as soon as the last reply terminator is received, and
+        not before the whole request is sent. Sending and receiving are interleaved so a long pipeline cannot dead-lock on
+        full socket buffers.
+
+        :param request: request lines.
+        :param replies: number of replies to the request.
+        :param mark: mark of the commands of the request, None - the request is one command that is not marked.
+        """
+        if self.parser.buffer and not self.stale_replies:
+            # Data that is not the reply of any request - it must not be taken as the reply of this one.
+            data = bytes(self.parser.buffer)
+            self.parser = TclReplyParser()
+            raise TgnError(f"unexpected data from TclServer {self.host}:{self.port} - {data[:256]!r}")
+        deadline = time.monotonic() + socket_timeout
+        frames = []
+        unsent = memoryview(request)
+        self.selector.modify(self.fd, selectors.EVENT_READ | selectors.EVENT_WRITE)
+        try:
+            while len(frames) < replies or unsent:
+                frame = None
+                if self.stale_replies:
+                    frame = self.parser.next_frame(mark=self.stale_replies[0])
+                elif len(frames) < replies:
+                    frame = self.parser.next_frame(last=len(frames) == replies - 1, mark=mark)
+                if frame is not None:
+                    if self.stale_replies:
+                        # Late reply of a call that already timed out.
+                        self.stale_replies.popleft()
+                    else:
+                        frames.append(frame)
+                    continue
+                remaining = deadline - time.monotonic()
+                events = self.selector.select(remaining) if remaining > 0 else []
+                if not events:
+                    self._abort_exchange(request, len(request) - len(unsent), len(frames), mark)
+                    raise TgnError(f"no response after {socket_timeout} seconds")
+                for _, mask in events:
+                    if mask & selectors.EVENT_WRITE and unsent:
+                        sent = self.fd.send(unsent)
+                        unsent = unsent[sent:]
+                        if not unsent:
+                            self.selector.modify(self.fd, selectors.EVENT_READ)
+                    if mask & selectors.EVENT_READ:
+                        data = self.fd.recv(self.buffer_size)
+                        if not data:
+                            raise TgnError(f"connection to {self.host}:{self.port} closed by TclServer")
+                        self.parser.feed(data)
+        finally:
+            if unsent:
+                self.selector.modify(self.fd, selectors.EVENT_READ)
+        return frames
+
+    def _abort_exchange(self, request: bytes, sent: int, received: int, mark: Optional[bytes]) -> None:
+        """Complete the partially sent command and remember how many replies are still due from the server."""
+        line_end = request.find(b"\r\n", sent) + 2
+        if sent and not request[:sent].endswith(b"\r\n") and line_end >= 2:
+            self.fd.sendall(request[sent:line_end])
+            sent = line_end
+        self.stale_replies.extend([mark] * (request[:sent].count(b"\r\n") - received))
+
+    @staticmethod
+    def _parse_reply(reply: str) -> Tuple[str, Optional[str]]:
+        """Split reply frame into result and io output, raise TclError if the command failed."""
+        tcl_result = int(reply[-1])
+        data = reply[:-1].rsplit("\r", 1)
         if len(data) == 2:
             if data[-1].isdigit():
                 io_output, result = data
             else:
                 # Handle 'streamRegion generateWarningList' where we actually care about the output so we put it into
                 # the result...
-                result = reply[:-3]
+                result = reply[:-1]
                 io_output = None
         else:
             result = data[0]
@@ -89,13 +295,13 @@ class TclClient:
             assert not io_output
             raise TclError(result)
 
-        self.logger.debug("result=%s io_output=%s", result, io_output)
         return result, io_output
 
     def ssh_call(self, string: str, *args: str) -> str:
         """Send command to stdin and read return value from stdout."""
         command = f"puts [{string % args}]\n\r"
         self.logger.debug("sending %s", command.rstrip())
+        start = time.perf_counter()
         self.stdin.write(command)
         self.stdin.flush()
         # Sometimes we need to wait, otherwise the command returns without return value (probably because it did not finish).
@@ -110,6 +316,11 @@ class TclClient:
         if not buf_len:
             raise TgnError(f"Chassis not responding after {ssh_timeout} seconds")
         ret_value = str(self.stdout.read(buf_len).decode("utf-8").rstrip())
+        if self.reports:
+            self._report([(string % args, len(command.encode("utf-8")), buf_len)], time.perf_counter() - start)
+        if self.recorder:
+            # Replies of the ssh shell have no return code, record them as successful TclServer replies.
+            self._write_recording([string % args], [(ret_value + "0").encode("utf-8")], time.perf_counter() - start)
         self.logger.debug("received %s", ret_value)
         return ret_value
 
@@ -121,6 +332,71 @@ class TclClient:
             return result
         return self.ssh_call(string, *args)
 
+    def pipeline(self, commands: Iterable[str]) -> List[Union[str, Exception]]:
+        """Send commands without waiting for each reply and return their results in order.
+
+        Each entry is what call would have returned for the command, or the exception it would have raised. Errors are
+        returned in place so one failing command does not hide the replies of the others.
+
+        :param commands: fully formatted commands (no % formatting is applied).
+        """
+        if not self.windows_server:
+            results = []
+            for command in commands:
+                try:
+                    results.append(self.ssh_call(command.replace("%", "%%")))
+                except TgnError as error:
+                    results.append(error)
+            return results
+        results = []
+        for reply in self.socket_pipeline(commands):
+            if isinstance(reply, TclError):
+                results.append(reply)
+            elif reply[1] and "Error:" in reply[1]:
+                results.append(TgnError(reply[1]))
+            else:
+                results.append(reply[0])
+        return results
+
+    @contextmanager
+    def instrument(self, report: Optional[CallsReport] = None) -> Iterator[CallsReport]:
+        """Record counts, bytes and latencies of all commands sent within the block, see instrumentation module.
+
+        Blocks can be nested, each block gets its own report.
+
+        :param report: report to record into, shared by several clients, None - new report.
+        """
+        report = report or CallsReport()
+        self.reports.append(report)
+        try:
+            yield report
+        finally:
+            report.end = time.time()
+            self.reports.remove(report)
+
+    def _report(self, exchange: List[Tuple[str, int, int]], latency: float) -> None:
+        operation = caller_operation()
+        for report in self.reports:
+            report.record(exchange, latency, operation)
+
+    @contextmanager
+    def record(self, path: str) -> Iterator[TclRecorder]:
+        """Record all round trips of the block, with their timing, to a recording file that TclReplayClient can replay.
+
+        To replay a whole session, record it from before connect.
+
+        :param path: recording file path, see tclrecord module.
+        """
+        self.recorder = TclRecorder(path, self.host, self.port)
+        try:
+            yield self.recorder
+        finally:
+            self.recorder.close()
+            self.recorder = None
+
+    def _write_recording(self, commands: List[str], frames: List[bytes], duration: float) -> None:
+        self.recorder.write(commands, [f.decode("utf-8") for f in frames], time.time() - duration, duration)
+
     def connect(self) -> None:
         self.logger.debug(f"Opening connection to {self.host}:{self.port}")
 
@@ -137,12 +413,81 @@ class TclClient:
             fd = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             fd.settimeout(32.0)
             fd.connect((self.host, self.port))
+            fd.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
             self.fd = fd
+            self.selector = selectors.DefaultSelector()
+            self.selector.register(fd, selectors.EVENT_READ)
+            self.parser = TclReplyParser()
+            self.stale_replies.clear()
 
         self.call("package req IxTclHal")
         self.call("enableEvents true")
 
     def close(self) -> None:
         self.logger.debug("Closing connection")
+        if self.selector:
+            self.selector.close()
+            self.selector = None
         self.fd.close()
         self.fd = None
+
+
+class TclReplayClient(TclClient):
+    """TclClient that serves the replies of a recording (see TclClient.record) instead of talking to a TclServer.
+
+    Replies are served in recorded order and each request must match the recorded request, so the session must be
+    replayed by the same code that recorded it.
+    """
+
+    def __init__(self, logger, recording: str, recorded_latency: bool = False) -> None:
+        """Open recording, the replay starts with connect.
+
+        :param logger: logger.
+        :param recording: recording file path.
+        :param recorded_latency: True - delay each reply by its recorded round trip time, False - reply immediately.
+        """
+        header, self.exchanges = read_recording(recording)
+        super().__init__(logger, header["host"], header["port"])
+        self.recording = recording
+        self.recorded_latency = recorded_latency
+        self.replayed = 0
+
+    def connect(self) -> None:
+        """Replay the connection setup commands."""
+        self.logger.debug(f"Replaying {self.recording}")
+        self.windows_server = True
+        # There is no socket, fd only marks the client as connected.
+        self.fd = self
+        if self.port == 8022:
+            self.call("source /opt/ixia/ixos/current/IxiaWish.tcl")
+        self.call("package req IxTclHal")
+        self.call("enableEvents true")
+
+    def close(self) -> None:
+        """Mark the client as disconnected."""
+        self.logger.debug("Closing replay")
+        self.fd = None
+
+    def _pipeline_lines(self, commands: List[str]) -> List[bytes]:
+        # Recordings keep the commands as the application sent them.
+        return [(command + "\r\n").encode("utf-8") for command in commands]
+
+    def _exchange(self, request: bytes, replies: int = 1, mark: Optional[bytes] = None) -> List[bytes]:
+        commands = request.decode("utf-8").split("\r\n")[:-1]
+        frames = []
+        latency = 0
+        while len(frames) < replies:
+            try:
+                _, duration, recorded_commands, recorded_frames = next(self.exchanges)
+            except StopIteration:
+                raise TgnError(f"{self.recording} ended before command {commands[len(frames)]}")
+            first, last = len(frames), len(frames) + len(recorded_commands)
+            expected = commands[first:last]
+            if recorded_commands != expected:
+                raise TgnError(f"{self.recording} exchange {self.replayed} - expected {recorded_commands}, got {expected}")
+            frames.extend(f.encode("utf-8") for f in recorded_frames)
+            latency += duration
+            self.replayed += 1
+        if self.recorded_latency:
+            time.sleep(latency)
+        return frames
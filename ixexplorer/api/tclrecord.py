@@ -0,0 +1,74 @@
+r"""
+Recordings of TclServer sessions, written by TclClient.record() and served back by TclReplayClient.
+
+A recording is a gzip compressed JSON lines file. The first line is a header, each following line is one round trip:
+
+    {"version": 1, "host": <TclServer host>, "port": <TclServer port>, "start": <epoch seconds>}
+    [<seconds since start>, <round trip seconds>, [<command>, ...], [<reply frame>, ...]]
+
+Reply frames are the raw TclServer replies without the \r\n terminator - [<io output>\r]<result><tcl return code>.
+"""
+import gzip
+import json
+import threading
+import time
+from typing import Iterator, List, Tuple
+
+RECORDING_VERSION = 1
+
+# (seconds since start, round trip seconds, commands, reply frames)
+Exchange = Tuple[float, float, List[str], List[str]]
+
+
+class TclRecorder:
+    """Write the round trips of a TclClient to a recording file."""
+
+    def __init__(self, path: str, host: str, port: int) -> None:
+        """Create recording file and write its header.
+
+        :param path: recording file path.
+        :param host: TclServer host.
+        :param port: TclServer port.
+        """
+        self.path = path
+        self.start = time.time()
+        self.exchanges = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._write({"version": RECORDING_VERSION, "host": host, "port": port, "start": self.start})
+
+    def write(self, commands: List[str], frames: List[str], start: float, duration: float) -> None:
+        """Record one round trip.
+
+        :param commands: commands sent, without terminators.
+        :param frames: reply frames received.
+        :param start: epoch seconds when the commands were sent.
+        :param duration: round trip seconds.
+        """
+        with self._lock:
+            self._write([round(start - self.start, 6), round(duration, 6), commands, frames])
+            self.exchanges += 1
+
+    def close(self) -> None:
+        """Close the recording file."""
+        with self._lock:
+            self._file.close()
+
+    def _write(self, entry: object) -> None:
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+
+def read_recording(path: str) -> Tuple[dict, Iterator[Exchange]]:
+    """Return the header and an iterator over the round trips of a recording file."""
+    recording = gzip.open(path, "rt", encoding="utf-8")
+    header = json.loads(recording.readline())
+    if header.get("version") != RECORDING_VERSION:
+        recording.close()
+        raise ValueError(f"{path} is not a version {RECORDING_VERSION} TclServer recording")
+
+    def exchanges() -> Iterator[Exchange]:
+        with recording:
+            for line in recording:
+                yield tuple(json.loads(line))
+
+    return header, exchanges()
@@ -0,0 +1,711 @@
+r"""
+Local stand-in for IxTclServer, to run and benchmark the package without chassis.
+
+The server speaks the TclServer socket protocol (request `<command>\r\n`, reply `<result><tcl return code>\r\n`) and
+evaluates each request in a real Tcl interpreter per connection, so `set`, `list`, `join`, `apply`, `catch` and the
+batch scripts built by IxTclHalApi work as they do on the TclServer.
+
+IxTclHal commands are modeled in Python:
+
+- Each connection has its own temporary storage (scratchpad) per Tcl command, modified by `config`, read by `cget`,
+  loaded from the IxHal by `get` and stored into the IxHal by `set`.
+- The IxHal (chassis, cards, ports, streams and their objects) is shared by all connections.
+- Transmit, capture and clear commands drive a simple traffic model - enabled streams transmit fpsRate frames of
+  framesize bytes per second while their port transmits, and every port receives all transmitted frames, so port,
+  stream transmit and packet group statistics grow with time.
+
+Options that were never configured read as "0".
+"""
+import logging
+import queue
+import socket
+import threading
+import time
+import tkinter
+from collections import defaultdict
+from optparse import OptionParser
+from typing import Dict, List, Optional, Tuple
+
+from ixexplorer.api.tcllist import split_tcl_list, tcl_list
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+Uri = Tuple[str, ...]
+
+IXTCLHAL_VERSION = "9.10"
+IXSERVER_VERSION = "9.10.2000.31"
+
+# Default (setDefault) values of options the package reads and expects to be other than "0".
+DEFAULTS: Dict[str, Dict[str, str]] = {
+    "chassis": {"ixServerVersion": IXSERVER_VERSION, "typeName": "ixiaOptixiaXV", "type": "24", "master": "yes"},
+    "card": {"typeName": "Simulated 10GE LAN", "type": "0", "resourceGroupInfoList": ""},
+    "port": {"linkState": "1", "owner": "", "speed": "10000", "transmitMode": "portTxPacketStreams", "typeName": "10GE LAN"},
+    "stream": {"enable": "1", "fpsRate": "1000", "framesize": "64", "name": ""},
+    "stat": {"link": "1", "lineSpeed": "10000", "duplexMode": "1"},
+}
+
+# Objects that exist only when created by their parent, get of a missing object fails.
+CREATED = {"chassis", "card", "port", "stream"}
+
+# Stream sub-objects - get/set address the stream that was last loaded or stored on the port by this connection.
+STREAM_OBJECTS = {"ip", "ipV6", "tcp", "udp", "vlan", "stackedVlan", "protocolOffset", "weightedRandomFramesize", "udf"}
+
+STATS = {"packetGroupStats", "streamTransmitStats", "captureBuffer"}
+
+OBJECT_COMMANDS = (
+    CREATED
+    | STREAM_OBJECTS
+    | STATS
+    | {"protocol", "stat", "session", "capture", "filter", "filterPallette", "splitPacketGroup", "streamRegion"}
+    | {"portCpu", "portGroup", "resourceGroupEx", "packetGroup", "dataIntegrity", "autoDetectInstrumentation"}
+)
+
+PORT_LIST_COMMANDS = {
+    "ixCheckLinkState",
+    "ixCheckTransmitDone",
+    "ixClearPacketGroups",
+    "ixClearStats",
+    "ixClearTimeStamp",
+    "ixStartCapture",
+    "ixStartPacketGroups",
+    "ixStartTransmit",
+    "ixStopCapture",
+    "ixStopPacketGroups",
+    "ixStopTransmit",
+}
+
+_bool_values = {"true": "1", "false": "0", "yes": "1", "no": "0"}
+
+
+class IxHalModel:
+    """IxHal objects and traffic state shared by all connections of one server."""
+
+    def __init__(self, cards: int = 2, ports: int = 4, slots: Optional[int] = None) -> None:
+        """Create empty IxHal, chassis are added by chassis add.
+
+        :param cards: number of cards in each chassis (cards occupy the first slots).
+        :param ports: number of ports on each card.
+        :param slots: number of card slots in each chassis, defaults to the number of cards.
+        """
+        self.cards = cards
+        self.ports = ports
+        self.slots = slots if slots else cards
+        self.lock = threading.RLock()
+        self.epoch = time.time()
+        # (command, get/set suffix, uri) -> options
+        self.hal: Dict[Tuple[str, str, Uri], Dict[str, str]] = {}
+        self.chassis: Dict[str, str] = {}
+        # port uri -> [start, stop] of the last transmit/capture, stop is None while running.
+        self.transmit: Dict[Uri, List[Optional[float]]] = {}
+        self.capture: Dict[Uri, List[Optional[float]]] = {}
+        # port uri -> time of the last clear.
+        self.cleared: Dict[Uri, float] = defaultdict(lambda: self.epoch)
+        self.pg_cleared: Dict[Uri, float] = defaultdict(lambda: self.epoch)
+        # Number of frames in each capture buffer, None - captured from the traffic model.
+        self.capture_frames: Optional[int] = None
+
+    def add_chassis(self, ip: str) -> str:
+        """Add chassis with its cards and ports (if not added yet) and return its ID."""
+        if ip in self.chassis:
+            return self.chassis[ip]
+        chassis_id = str(len(self.chassis) + 1)
+        self.chassis[ip] = chassis_id
+        self.hal[("chassis", "", (ip,))] = dict(
+            DEFAULTS["chassis"], ipAddress=ip, hostName=ip, name=ip, id=chassis_id, maxCardCount=str(self.slots)
+        )
+        for card in range(1, self.cards + 1):
+            card_uri = (chassis_id, str(card))
+            self.hal[("card", "", card_uri)] = dict(DEFAULTS["card"], portCount=str(self.ports), serialNumber=str(card))
+            for port in range(1, self.ports + 1):
+                self.hal[("port", "", card_uri + (str(port),))] = dict(DEFAULTS["port"])
+        return chassis_id
+
+    def renumber_chassis(self, old_id: str, new_id: str) -> None:
+        """Move all objects of the chassis to the new chassis id, as `chassis config -id` + `chassis set` does.
+
+        A chassis that holds the new id gets the old one, so chassis added in any order can be renumbered.
+        """
+        if old_id == new_id:
+            return
+        self._move_chassis(new_id, "")
+        self._move_chassis(old_id, new_id)
+        self._move_chassis("", old_id)
+
+    def _move_chassis(self, old_id: str, new_id: str) -> None:
+        for ip, chassis_id in self.chassis.items():
+            if chassis_id == old_id:
+                self.chassis[ip] = new_id
+                self.hal[("chassis", "", (ip,))]["id"] = new_id
+        for key in [k for k in self.hal if k[0] != "chassis" and k[2][:1] == (old_id,)]:
+            self.hal[(key[0], key[1], (new_id,) + key[2][1:])] = self.hal.pop(key)
+
+    def stream_ids(self, port: Uri) -> List[int]:
+        """Return the IDs of the streams of the port, in order."""
+        return sorted(int(k[2][3]) for k in self.hal if k[0] == "stream" and k[2][:3] == port)
+
+    def remove(self, uri: Uri, keep: bool = False) -> None:
+        """Remove object and all objects below it, keep - remove only the objects below it."""
+        depth = len(uri)
+        for key in [k for k in self.hal if k[2][:depth] == uri and (len(k[2]) > depth or not keep)]:
+            del self.hal[key]
+
+    #
+    # Traffic model.
+    #
+
+    def streams(self, port: Optional[Uri] = None) -> List[Tuple[Uri, float, int]]:
+        """Return (stream uri, frames per second, frame size) of the enabled streams of the port, of all ports if None."""
+        streams = []
+        for (command, _, uri), options in self.hal.items():
+            if command != "stream" or (port and uri[:3] != port):
+                continue
+            if options.get("enable", "0") not in ("0", "false"):
+                streams.append((uri, float(options.get("fpsRate", "0")), int(options.get("framesize", "64"))))
+        return streams
+
+    def transmit_time(self, port: Uri, since: float, until: float) -> float:
+        """Return the seconds the port transmitted within [since, until]."""
+        start, stop = self.transmit.get(port, (None, None))
+        if start is None:
+            return 0
+        stop = until if stop is None else min(stop, until)
+        return max(0.0, stop - max(start, since))
+
+    def transmitting(self, port: Uri) -> bool:
+        """Return True if the port transmits now."""
+        return port in self.transmit and self.transmit[port][1] is None
+
+    def frames(self, stream: Uri, fps: float, since: float, until: float) -> int:
+        """Return the number of frames the stream transmitted between since and until."""
+        return int(fps * self.transmit_time(stream[:3], since, until))
+
+    def port_stats(self, port: Uri, now: float) -> Dict[str, str]:
+        """Return the statAllStats counters of the port since it was cleared."""
+        since = self.cleared[port]
+        sent = [(self.frames(s, fps, since, now), size) for s, fps, size in self.streams(port)]
+        received = [(self.frames(s, fps, since, now), size) for s, fps, size in self.streams()]
+        counters = {
+            "framesSent": sum(f for f, _ in sent),
+            "bytesSent": sum(f * size for f, size in sent),
+            "framesReceived": sum(f for f, _ in received),
+            "bytesReceived": sum(f * size for f, size in received),
+        }
+        counters["bitsSent"] = counters["bytesSent"] * 8
+        counters["bitsReceived"] = counters["bytesReceived"] * 8
+        counters["transmitDuration"] = int(self.transmit_time(port, since, now) * 1e9)
+        return dict(DEFAULTS["stat"], **{k: str(v) for k, v in counters.items()})
+
+    def port_rates(self, port: Uri) -> Dict[str, str]:
+        """Return the statAllStats rates (per second) of the port."""
+        sent = [(fps, size) for s, fps, size in self.streams(port) if self.transmitting(port)]
+        received = [(fps, size) for s, fps, size in self.streams() if self.transmitting(s[:3])]
+        counters = {
+            "framesSent": sum(fps for fps, _ in sent),
+            "bytesSent": sum(fps * size for fps, size in sent),
+            "framesReceived": sum(fps for fps, _ in received),
+            "bytesReceived": sum(fps * size for fps, size in received),
+        }
+        counters["bitsSent"] = counters["bytesSent"] * 8
+        counters["bitsReceived"] = counters["bytesReceived"] * 8
+        return dict(DEFAULTS["stat"], **{k: str(int(v)) for k, v in counters.items()})
+
+    def stream_tx_stats(self, port: Uri, now: float) -> Dict[int, Dict[str, str]]:
+        """Return {stream ID: statistics} of the streams of the port since the port was cleared."""
+        since = self.cleared[port]
+        rate = self.transmitting(port)
+        return {
+            int(s[3]): {"framesSent": str(self.frames(s, fps, since, now)), "frameRate": str(int(fps) if rate else 0)}
+            for s, fps, _ in self.streams(port)
+        }
+
+    def pg_stats(self, port: Uri, now: float) -> Dict[int, Dict[str, str]]:
+        """Return packet group statistics of the port, every port receives all streams with packet group Tx."""
+        since = self.pg_cleared[port]
+        groups: Dict[int, Dict[str, float]] = {}
+        for stream, fps, size in self.streams():
+            tx = self.hal.get(("packetGroup", "Tx", stream))
+            if tx is None:
+                continue
+            frames = self.frames(stream, fps, since, now)
+            group = groups.setdefault(int(tx.get("groupId", "0")), defaultdict(float))
+            group["totalFrames"] += frames
+            group["totalByteCount"] += frames * size
+            if self.transmitting(stream[:3]):
+                group["frameRate"] += fps
+                group["byteRate"] += fps * size
+            if frames:
+                start = max(self.transmit[stream[:3]][0], since)
+                first, last = start - self.epoch, start - self.epoch + frames / fps
+                group["firstTimeStamp"] = min(group.get("firstTimeStamp", first), first)
+                group["lastTimeStamp"] = max(group["lastTimeStamp"], last)
+        stats = {}
+        for group_id, group in groups.items():
+            group["bitRate"] = group["byteRate"] * 8
+            group["firstTimeStamp"] = group["firstTimeStamp"] * 1e9
+            group["lastTimeStamp"] = group["lastTimeStamp"] * 1e9
+            group["readTimeStamp"] = (now - self.epoch) * 1e9
+            if group["totalFrames"]:
+                group.update(minLatency=800, maxLatency=1200, averageLatency=1000, standardDeviation=100)
+            stats[group_id] = {k: str(int(v)) for k, v in group.items()}
+        return stats
+
+    def captured_frames(self, port: Uri, now: float) -> int:
+        """Return the number of frames captured by the port."""
+        if self.capture_frames is not None:
+            return self.capture_frames if port in self.capture else 0
+        start, stop = self.capture.get(port, (None, None))
+        if start is None:
+            return 0
+        until = now if stop is None else stop
+        return sum(self.frames(s, fps, start, until) for s, fps, _ in self.streams())
+
+
+class _Connection:
+    """IxTclHal state of one TclServer connection - Tcl interpreter, temporary storages and stats snapshots."""
+
+    def __init__(self, server: "TclServerSim", connection: socket.socket) -> None:
+        self.server = server
+        self.model = server.model
+        self.connection = connection
+        self.user = ""
+        self.storage: Dict[str, Dict[str, str]] = {}
+        # port uri -> id of the stream sub-objects get/set address.
+        self.current_stream: Dict[Uri, str] = {}
+        # command -> (first, last, {group: counters}) of the last stats get.
+        self.snapshot: Dict[str, Tuple[int, int, Dict[int, Dict[str, str]]]] = {}
+        self.interp: Optional[tkinter.Tcl] = None
+
+    def serve(self) -> None:
+        # tkinter interpreters must be created, used and deleted by the same thread.
+        self.interp = tkinter.Tcl()
+        self.interp.eval(f"package provide IxTclHal {IXTCLHAL_VERSION}; proc enableEvents {{args}} {{return 0}}")
+        self.interp.tk.createcommand("ixsim_dispatch", self.dispatch)
+        self.interp.eval("proc ixsim_call {args} {lassign [ixsim_dispatch {*}$args] code result; return -code $code $result}")
+        for command in sorted(OBJECT_COMMANDS | PORT_LIST_COMMANDS | {"ixPortTakeOwnership", "ixPortClearOwnership"}):
+            self.interp.eval(f"proc {command} {{args}} {{ixsim_call {command} {{*}}$args}}")
+        for command in ("ixConnectToChassis", "ixDisconnectFromChassis"):
+            self.interp.eval(f"proc {command} {{args}} {{ixsim_call {command} {{*}}$args}}")
+        # Replies are sent by their own thread when due, so reading and evaluating the next requests is not delayed.
+        replies: "queue.Queue[Optional[Tuple[float, bytes]]]" = queue.Queue()
+        sender = threading.Thread(target=self._send_replies, args=(replies,), daemon=True)
+        sender.start()
+        pending = b""
+        try:
+            with self.connection:
+                while True:
+                    data = self.connection.recv(2**16)
+                    if not data:
+                        return
+                    received = time.monotonic()
+                    pending += data
+                    *lines, pending = pending.split(b"\r\n")
+                    for line in lines:
+                        reply = self.evaluate(line.decode("utf-8"))
+                        replies.put((received + self.server.latency, reply.encode("utf-8")))
+        except OSError:
+            return
+        finally:
+            replies.put(None)
+            sender.join()
+            self.interp.tk.deletecommand("ixsim_dispatch")
+            self.interp = None
+
+    def _send_replies(self, replies: "queue.Queue[Optional[Tuple[float, bytes]]]") -> None:
+        while True:
+            reply = replies.get()
+            if reply is None:
+                return
+            delay = reply[0] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.connection.sendall(reply[1])
+            except OSError:
+                pass
+
+    def evaluate(self, command: str) -> str:
+        self.server.requests += 1
+        try:
+            return f"{self.interp.eval(command)}0\r\n"
+        except tkinter.TclError as error:
+            return f"{error}1\r\n"
+
+    def dispatch(self, name: str, *args: str) -> str:
+        """Execute IxTclHal command and return Tcl list {code result} for the ixsim_call wrapper."""
+        try:
+            with self.model.lock:
+                if name in OBJECT_COMMANDS:
+                    result = self._object(name, list(args))
+                else:
+                    result = getattr(self, "_" + name)(*args)
+            return tcl_list("0", result)
+        except Exception as error:
+            return tcl_list("1", str(error))
+
+    #
+    # Object commands.
+    #
+
+    def _object(self, name: str, args: List[str]) -> str:
+        if not args:
+            raise ValueError(f'wrong # args: should be "{name} method ?arg arg ...?"')
+        verb, args = args[0], args[1:]
+        storage = self.storage.setdefault(name, dict(DEFAULTS.get(name, {})))
+        if verb == "config":
+            if len(args) % 2:
+                raise ValueError(f"{name} config: missing value for option {args[-1]}")
+            for option, value in zip(args[::2], args[1::2]):
+                storage[option.lstrip("-")] = _bool_values.get(value.lower(), value)
+            return ""
+        if verb == "cget":
+            if not args:
+                raise ValueError(f'wrong # args: should be "{name} cget -option"')
+            return storage.get(args[0].lstrip("-"), "0")
+        if verb == "setDefault":
+            self.storage[name] = dict(DEFAULTS.get(name, {}))
+            return "0"
+        handler = getattr(self, f"_{name}_{verb}", None)
+        if handler:
+            return handler(*args)
+        if verb.startswith("get") and len(verb) <= 5:
+            return self._get(name, verb[3:], self._uri(name, args))
+        if verb.startswith("set") and len(verb) <= 5:
+            return self._set(name, verb[3:], self._uri(name, args))
+        # write, isValidFeature, setFactoryDefaults and other commands without effect on the model.
+        return "0"
+
+    def _uri(self, name: str, args: List[str]) -> Uri:
+        uri = tuple(args)
+        if name in STREAM_OBJECTS:
+            return uri[:3] + (self.current_stream.get(uri[:3], "1"),)
+        return uri
+
+    def _get(self, name: str, suffix: str, uri: Uri) -> str:
+        options = self.model.hal.get((name, suffix, uri))
+        if options is None:
+            if name in CREATED:
+                return "1"
+            options = DEFAULTS.get(name, {})
+        self.storage[name] = dict(options)
+        if name == "stream":
+            self.current_stream[uri[:3]] = uri[3]
+            self.storage["protocol"] = dict(self.model.hal.get(("protocol", "", uri), {}))
+        return "0"
+
+    def _set(self, name: str, suffix: str, uri: Uri) -> str:
+        if name in CREATED - {"stream"} and (name, suffix, uri) not in self.model.hal:
+            return "1"
+        self.model.hal[(name, suffix, uri)] = dict(self.storage.get(name, DEFAULTS.get(name, {})))
+        if name == "stream":
+            self.current_stream[uri[:3]] = uri[3]
+            self.model.hal[("protocol", "", uri)] = dict(self.storage.get("protocol", {}))
+        return "0"
+
+    def _chassis_add(self, ip: str) -> str:
+        self.model.add_chassis(ip)
+        return "0"
+
+    def _chassis_set(self, ip: str) -> str:
+        options = self.model.hal.get(("chassis", "", (ip,)))
+        if options is None:
+            return "1"
+        self.model.renumber_chassis(options["id"], self.storage["chassis"].get("id", options["id"]))
+        return self._set("chassis", "", (ip,))
+
+    def _chassis_del(self, ip: str) -> str:
+        return "0"
+
+    def _port_getStreamCount(self, *uri: str) -> str:
+        return str(len(self.model.stream_ids(uri)))
+
+    def _port_getFeature(self, *args: str) -> str:
+        return ""
+
+    def _port_isValidFeature(self, *args: str) -> str:
+        return "1"
+
+    _port_isActiveFeature = _port_isValidFeature
+
+    def _port_reset(self, *uri: str) -> str:
+        self.model.remove(uri, keep=True)
+        return "0"
+
+    def _port_setFactoryDefaults(self, *uri: str) -> str:
+        owner = self.model.hal[("port", "", uri)].get("owner", "")
+        self.model.hal[("port", "", uri)] = dict(DEFAULTS["port"], owner=owner)
+        return "0"
+
+    def _port_setTransmitMode(self, mode: str, *uri: str) -> str:
+        self.model.hal[("port", "", uri)]["transmitMode"] = mode
+        return "0"
+
+    def _port_import(self, *args: str) -> str:
+        raise ValueError("port import is not supported by the simulator")
+
+    _port_export = _port_import
+    _stream_import = _port_import
+    _stream_export = _port_import
+
+    def _stream_remove(self, *uri: str) -> str:
+        self.model.remove(uri)
+        return "0"
+
+    def _streamRegion_generateWarningList(self, *uri: str) -> str:
+        return ""
+
+    def _session_login(self, user: str) -> str:
+        self.user = user
+        self.storage["session"] = {"userName": user}
+        return "0"
+
+    def _session_logout(self) -> str:
+        self.user = ""
+        return "0"
+
+    def _session_get(self, *args: str) -> str:
+        self.storage["session"] = {"userName": self.user}
+        return "0"
+
+    #
+    # Statistics.
+    #
+
+    def _stat_get(self, stat: str, *uri: str) -> str:
+        self.storage["stat"] = self.model.port_stats(uri, time.time())
+        return "0"
+
+    def _stat_getRate(self, stat: str, *uri: str) -> str:
+        self.storage["stat"] = self.model.port_rates(uri)
+        return "0"
+
+    def _stat_set(self, *uri: str) -> str:
+        return "0"
+
+    def _packetGroupStats_get(self, *args: str) -> str:
+        port, first, last = args[:3], int(args[3]), int(args[4])
+        self.snapshot["packetGroupStats"] = (first, last, self.model.pg_stats(port, time.time()))
+        return "0"
+
+    def _streamTransmitStats_get(self, *args: str) -> str:
+        port, first, last = args[:3], int(args[3]), int(args[4])
+        self.snapshot["streamTransmitStats"] = (first, last, self.model.stream_tx_stats(port, time.time()))
+        return "0"
+
+    def _packetGroupStats_getGroup(self, group: str) -> str:
+        return self._get_group("packetGroupStats", int(group))
+
+    def _streamTransmitStats_getGroup(self, group: str) -> str:
+        return self._get_group("streamTransmitStats", int(group))
+
+    def _get_group(self, name: str, group: int) -> str:
+        if name not in self.snapshot:
+            return "1"
+        first, last, groups = self.snapshot[name]
+        if not first <= group <= last:
+            return "1"
+        self.storage[name] = dict(groups.get(group, {}))
+        return "0"
+
+    def _capture_get(self, *uri: str) -> str:
+        self._get("capture", "", uri)
+        self.storage["capture"]["nPackets"] = str(self.model.captured_frames(uri, time.time()))
+        return "0"
+
+    def _captureBuffer_get(self, *args: str) -> str:
+        port, first, last = args[:3], int(args[3]), int(args[4])
+        if last > self.model.captured_frames(port, time.time()) or first < 1:
+            return "1"
+        self.snapshot["captureBuffer"] = (first, last, {})
+        return "0"
+
+    def _captureBuffer_getframe(self, frame: str) -> str:
+        if "captureBuffer" not in self.snapshot:
+            return "1"
+        first, last, _ = self.snapshot["captureBuffer"]
+        index = int(frame)
+        if not 1 <= index <= last - first + 1:
+            return "1"
+        self.storage["captureBuffer"] = {"frame": _frame(first + index - 1), "length": "64", "status": "0"}
+        return "0"
+
+    def _captureBuffer_export(self, file_name: str) -> str:
+        first, last, _ = self.snapshot.get("captureBuffer", (1, 0, {}))
+        with open(file_name, "w") as cap_file:
+            cap_file.writelines(_frame(index) + "\n" for index in range(first, last + 1))
+        return "0"
+
+    #
+    # ix* utility commands.
+    #
+
+    def _ports(self, port_list: str) -> List[Uri]:
+        if self.interp.eval(f"info exists ::{port_list}") == "1":
+            port_list = self.interp.eval(f"set ::{port_list}")
+        return [tuple(split_tcl_list(port)) for port in split_tcl_list(port_list)]
+
+    def _ixConnectToChassis(self, ip: str) -> str:
+        self.model.add_chassis(ip)
+        return "0"
+
+    def _ixDisconnectFromChassis(self, *args: str) -> str:
+        return "0"
+
+    def _ixPortTakeOwnership(self, *args: str) -> str:
+        port = self.model.hal[("port", "", args[:3])]
+        if port.get("owner") and port["owner"] != self.user and "force" not in args[3:]:
+            return "1"
+        port["owner"] = self.user
+        return "0"
+
+    def _ixPortClearOwnership(self, *args: str) -> str:
+        port = self.model.hal[("port", "", args[:3])]
+        if port.get("owner") and port["owner"] != self.user and "force" not in args[3:]:
+            return "1"
+        port["owner"] = ""
+        return "0"
+
+    def _ixCheckLinkState(self, port_list: str) -> str:
+        return "0"
+
+    def _ixCheckTransmitDone(self, port_list: str) -> str:
+        return "0"
+
+    def _ixStartTransmit(self, port_list: str) -> str:
+        for port in self._ports(port_list):
+            self.model.transmit[port] = [time.time(), None]
+        return "0"
+
+    def _ixStopTransmit(self, port_list: str) -> str:
+        for port in self._ports(port_list):
+            if self.model.transmitting(port):
+                self.model.transmit[port][1] = time.time()
+        return "0"
+
+    def _ixStartCapture(self, port_list: str) -> str:
+        for port in self._ports(port_list):
+            self.model.capture[port] = [time.time(), None]
+        return "0"
+
+    def _ixStopCapture(self, port_list: str) -> str:
+        for port in self._ports(port_list):
+            if port in self.model.capture and self.model.capture[port][1] is None:
+                self.model.capture[port][1] = time.time()
+        return "0"
+
+    def _ixClearStats(self, port_list: str) -> str:
+        for port in self._ports(port_list):
+            self.model.cleared[port] = time.time()
+        return "0"
+
+    def _ixClearPacketGroups(self, port_list: str) -> str:
+        for port in self._ports(port_list):
+            self.model.pg_cleared[port] = time.time()
+        return "0"
+
+    def _ixClearTimeStamp(self, port_list: str) -> str:
+        return "0"
+
+    def _ixStartPacketGroups(self, port_list: str) -> str:
+        return "0"
+
+    def _ixStopPacketGroups(self, port_list: str) -> str:
+        return "0"
+
+
+def _frame(index: int) -> str:
+    """Return hex dump of a synthetic 64 bytes captured frame with the frame index in its last bytes."""
+    return " ".join(["00"] * 60 + [f"{b:02X}" for b in index.to_bytes(4, "big")])
+
+
+class TclServerSim:
+    """Local IxTclServer stand-in, see module docstring.
+
+    Usage::
+
+        with TclServerSim(port=0, latency=0.001) as server:
+            ixia = init_ixe("127.0.0.1", server.port)
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 4555, latency: float = 0, cards: int = 2, ports: int = 4, slots: int = None
+    ) -> None:
+        """Create server, it listens from start.
+
+        :param host: address to listen on.
+        :param port: TCP port to listen on, 0 - any free port (see self.port after start).
+        :param latency: seconds from request arrival to its reply (network round trip + server time), can be changed while
+            the server runs. Pipelined requests overlap their latencies, like on a real network.
+        :param cards: number of cards in each chassis.
+        :param ports: number of ports on each card.
+        :param slots: number of card slots in each chassis, defaults to the number of cards.
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.model = IxHalModel(cards, ports, slots)
+        self.requests = 0
+        self.listener: Optional[socket.socket] = None
+        self.connections: List[socket.socket] = []
+
+    def start(self) -> "TclServerSim":
+        """Listen and serve the connections in background threads."""
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((self.host, self.port))
+        self.listener.listen(16)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, name=f"TclServerSim-{self.port}", daemon=True).start()
+        logger.debug(f"TclServerSim listening on {self.host}:{self.port}")
+        return self
+
+    def stop(self) -> None:
+        """Stop listening and close all connections."""
+        if self.listener:
+            self.listener.close()
+            self.listener = None
+        for connection in self.connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.connections = []
+
+    def __enter__(self) -> "TclServerSim":
+        return self.start()
+
+    def __exit__(self, *_) -> None:
+        self.stop()
+
+    def _accept(self) -> None:
+        listener = self.listener
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.connections.append(connection)
+            threading.Thread(target=_Connection(self, connection).serve, daemon=True).start()
+
+
+def main() -> None:
+    """Run the server until Ctrl-C, see `tcl_server_sim -h` for the options."""
+    parser = OptionParser(usage="usage: %prog [options]")
+    parser.add_option("-p", dest="port", help="TCP port number", type=int, default=4555)
+    parser.add_option("-l", dest="latency", help="latency per request in seconds", type=float, default=0)
+    parser.add_option("-c", dest="cards", help="cards per chassis", type=int, default=2)
+    parser.add_option("-n", dest="ports", help="ports per card", type=int, default=4)
+    (options, _) = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG)
+    server = TclServerSim("0.0.0.0", options.port, options.latency, options.cards, options.ports).start()
+    logger.info(f"TclServerSim listening on port {server.port}. Quit with Ctrl-C.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
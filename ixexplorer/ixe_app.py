@@ -1,18 +1,20 @@
 import logging
 import time
 from collections import OrderedDict
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 import trafficgenerator.tgn_tcl
 from trafficgenerator import TgnApp, TgnError
 
 from ixexplorer.api.ixapi import FLAG_RDONLY, IxTclHalApi, TclMember, ixe_obj_meta
-from ixexplorer.api.tclproto import TclClient
-from ixexplorer.ixe_hw import IxeChassis
+from ixexplorer.api.tclpool import IxeAffinity, TclClientPool
+from ixexplorer.api.tclproto import TclClient, TclReplayClient
+from ixexplorer.ixe_hw import IxeChassis, IxeInventorySnapshot
 from ixexplorer.ixe_object import IxeObject
 from ixexplorer.ixe_port import IxeCapture, IxeCaptureBuffer, IxePort, IxeReceiveMode
-from ixexplorer.ixe_statistics_view import IxeCapFileFormat
-from ixexplorer.ixe_stream import IxeStream
+from ixexplorer.ixe_statistics_sampler import StatsSampler
+from ixexplorer.ixe_statistics_view import IxeCapFileFormat, IxePortsStats, IxeRateMode, IxeStreamsStats
+from ixexplorer.ixe_stream import IxePgidAllocator, IxeStream
 
 logger = logging.getLogger("tgn.ixexplorer")
 
@@ -27,6 +29,15 @@ def init_ixe(host: str, port: Optional[int] = 4555, rsa_id: Optional[str] = None
     return IxeApp(IxTclHalApi(TclClient(logger, host, port, rsa_id)))
 
 
+def replay_ixe(recording: str, recorded_latency: bool = False) -> "IxeApp":
+    """Create IxExplorer object that replays a recorded session instead of connecting to Tcl Server.
+
+    :param recording: recording file path, see TclClient.record
+    :param recorded_latency: True - replay at the recorded latency, False - at zero latency
+    """
+    return IxeApp(IxTclHalApi(TclReplayClient(logger, recording, recorded_latency)))
+
+
 class IxeApp(TgnApp):
     def __init__(self, api_wrapper: IxTclHalApi) -> None:
         """Initialize global Tcl interpreter and session."""
@@ -34,6 +45,11 @@ class IxeApp(TgnApp):
         trafficgenerator.tgn_tcl.tcl_interp_g = self.api
         self.session = IxeSession(self.logger, self.api)
         self.chassis_chain: Dict[str, IxeChassis] = {}
+        self.user: Optional[str] = None
+        # Maximum number of chassis to add or discover in parallel.
+        self.concurrency = 8
+        # Open statistics samplers, closed on disconnect.
+        self.samplers: List[StatsSampler] = []
 
     @property
     def connected(self) -> bool:
@@ -46,35 +62,139 @@ class IxeApp(TgnApp):
         :param user: if user - login session.
         """
         self.api._tcl_handler.connect()
+        self.user = user
         if user:
             self.session.login(user)
 
     def disconnect(self) -> None:
         """Disconnect from all chassis in the chassis chain and logout."""
+        for sampler in self.samplers:
+            sampler.close()
+        self.samplers = []
+        if self.api.pool:
+            self.api.pool.close()
         for chassis in self.chassis_chain.values():
             chassis.disconnect()
         self.session.logout()
         self.api._tcl_handler.close()
 
-    def add(self, chassis: str) -> None:
-        """Add chassis.
+    def open_pool(self, size: int = 4, affinity: IxeAffinity = IxeAffinity.port) -> TclClientPool:
+        """Open pool of TclServer connections for parallel work on ports, see tclpool module.
+
+        Each pool connection logs in with the user of the main connection and adds the chassis chain.
 
-        :param chassis: chassis IP address.
+        :param size: number of pool connections, in addition to the main connection.
+        :param affinity: pin objects to connections by port or by chassis.
         """
-        if chassis not in self.chassis_chain:
-            self.chassis_chain[chassis] = IxeChassis(self.session, chassis)
-            self.chassis_chain[chassis].connect()
+        pool = TclClientPool(self.api, size, affinity)
+        pool.setup = self._setup_connection
+        pool.warm_up()
+        return pool
 
-    def discover(self) -> None:
-        """Get inventory from all chassis in the chassis chain."""
+    def open_sampler(
+        self,
+        interval: float = 1,
+        capacity: int = 3600,
+        port_stats: Optional[List[str]] = None,
+        stream_stats: Optional[List[str]] = None,
+    ) -> StatsSampler:
+        """Open background sampler of the session ports and streams statistics, see ixe_statistics_sampler module.
+
+        The sampler connection logs in with the user of the main connection and adds the chassis chain. Port rates are
+        computed from consecutive samples, see IxeRateMode.client.
+
+        :param interval: seconds between samples.
+        :param capacity: number of samples to keep.
+        :param port_stats: port statistics to sample, if empty - all statistics, None - do not sample ports.
+        :param stream_stats: stream statistics to sample, if empty - all statistics, None - do not sample streams.
+        """
+        sampler = StatsSampler(
+            self.api,
+            IxePortsStats(rate_mode=IxeRateMode.client) if port_stats is not None else None,
+            IxeStreamsStats() if stream_stats is not None else None,
+            port_stats or (),
+            stream_stats or (),
+            interval,
+            capacity,
+        )
+        sampler.setup = self._setup_connection
+        sampler.connect()
+        self.samplers.append(sampler)
+        return sampler
+
+    def _setup_connection(self) -> None:
+        """Login and add the chassis chain on the connection the current thread is bound to."""
+        self._login()
         for chassis in self.chassis_chain.values():
-            chassis.discover()
+            chassis.connect()
+
+    def _login(self) -> None:
+        if self.user:
+            self.session.login(self.user)
+
+    def add(self, *chassis: str, concurrency: Optional[int] = None) -> None:
+        """Add chassis.
+
+        Several chassis are added in parallel, each over its own TclServer connection, and then connected in chain order
+        on the main connection, which is cheap once the TclServer is connected to the chassis.
+
+        :param chassis: chassis IP addresses.
+        :param concurrency: maximum number of chassis to connect in parallel, None - self.concurrency.
+        """
+        new_chassis = []
+        for ip in chassis:
+            if ip not in self.chassis_chain:
+                self.chassis_chain[ip] = IxeChassis(self.session, ip)
+                self.chassis_chain[ip].chassis_id = len(self.chassis_chain)
+                new_chassis.append(self.chassis_chain[ip])
+        if len(new_chassis) > 1:
+            self._fan_out(IxeChassis.add, new_chassis, concurrency)
+        for ixe_chassis in new_chassis:
+            ixe_chassis.connect()
+
+    def discover(self, concurrency: Optional[int] = None, snapshot: Optional[str] = None) -> None:
+        """Get inventory from all chassis in the chassis chain, in parallel over one TclServer connection per chassis.
+
+        :param concurrency: maximum number of chassis to discover in parallel, None - self.concurrency.
+        :param snapshot: inventory snapshot file path - build the inventory of chassis that did not change from the
+            snapshot and save the inventory of the others to it, None - always discover, see IxeInventorySnapshot.
+        """
+        inventory_snapshot = IxeInventorySnapshot(snapshot) if snapshot else None
+        chassis = list(self.chassis_chain.values())
+        if len(chassis) > 1:
+            self._fan_out(
+                lambda ixe_chassis: (ixe_chassis.connect(), ixe_chassis.discover(inventory_snapshot)), chassis, concurrency
+            )
+        elif chassis:
+            chassis[0].discover(inventory_snapshot)
+        if inventory_snapshot:
+            inventory_snapshot.save()
+
+    def _fan_out(
+        self, function: Callable[[IxeChassis], object], chassis: List[IxeChassis], concurrency: Optional[int]
+    ) -> None:
+        """Run function on each chassis in parallel threads, each bound to its own TclServer connection.
+
+        Uses the open pool (if any), else a temporary pool with one logged in connection per parallel chassis.
+        """
+        concurrency = concurrency or self.concurrency
+        pool = self.api.pool
+        if pool:
+            pool.parallel(function, chassis, max_workers=concurrency)
+            return
+        pool = TclClientPool(self.api, min(len(chassis), concurrency), IxeAffinity.chassis)
+        pool.setup = self._login
+        try:
+            pool.warm_up()
+            pool.parallel(function, chassis)
+        finally:
+            pool.close()
 
     def refresh(self) -> None:
         """Refresh (read) configuration from chassis."""
         for chassis in self.chassis_chain.values():
             chassis.refresh()
-        self.session._reset_current_object()
+        self.session._reset_scratchpad()
 
 
 class IxeSession(IxeObject, metaclass=ixe_obj_meta):
@@ -93,6 +213,7 @@ class IxeSession(IxeObject, metaclass=ixe_obj_meta):
         super().__init__(parent=None, uri="")
         self.logger = logger_
         self.api = api
+        self.pgids = IxePgidAllocator()
         IxeObject.session = self
 
     def add_ports(self, *ports_locations: str) -> Dict[str, IxePort]:
@@ -208,8 +329,7 @@ class IxeSession(IxeObject, metaclass=ixe_obj_meta):
 
         :param ports: list of ports to start capture on, if empty start on all ports.
         """
-        IxeCapture.current_object = None
-        IxeCaptureBuffer.current_object = None
+        self.api.tracker.reset(IxeCapture.__tcl_command__, IxeCaptureBuffer.__tcl_command__)
         if not ports:
             ports = self.ports.values()
         for port in ports:
@@ -296,41 +416,46 @@ class IxeSession(IxeObject, metaclass=ixe_obj_meta):
         if data_integrity:
             di_signatureOffset = next_offset
 
-        for port in rx_ports:
-            modes = []
-            modes.append(IxeReceiveMode.widePacketGroup)
-            port.packetGroup.groupIdOffset = groupIdOffset
-            port.packetGroup.signatureOffset = signatureOffset
-            if sequence_checking and int(port.isValidFeature("portFeatureRxSequenceChecking")):
-                modes.append(IxeReceiveMode.sequenceChecking)
-                port.packetGroup.sequenceNumberOffset = sequenceNumberOffset
-            if data_integrity and int(port.isValidFeature("portFeatureRxDataIntegrity")):
-                modes.append(IxeReceiveMode.dataIntegrity)
-                port.dataIntegrity.signatureOffset = di_signatureOffset
-            if timestamp and int(port.isValidFeature("portFeatureRxFirstTimeStamp")):
-                port.dataIntegrity.enableTimeStamp = True
-            else:
-                port.dataIntegrity.enableTimeStamp = False
-            port.set_receive_modes(*modes)
-
-            port.write()
-
-        for port, streams in tx_ports.items():
-            for stream in streams:
-                stream.packetGroup.insertSignature = True
-                stream.packetGroup.groupIdOffset = groupIdOffset
-                stream.packetGroup.signatureOffset = signatureOffset
-                if sequence_checking:
-                    stream.packetGroup.insertSequenceSignature = True
-                    stream.packetGroup.sequenceNumberOffset = sequenceNumberOffset
-                if data_integrity and int(port.isValidFeature("portFeatureRxDataIntegrity")):
-                    stream.dataIntegrity.insertSignature = True
-                    stream.dataIntegrity.signatureOffset = di_signatureOffset
-                if timestamp:
-                    stream.enableTimestamp = True
+        features = ["portFeatureRxSequenceChecking", "portFeatureRxDataIntegrity", "portFeatureRxFirstTimeStamp"]
+        ports = list(dict.fromkeys([*rx_ports, *tx_ports]))
+        valid = iter(self.api.pipeline(f"port isValidFeature {p.uri} {f}" for p in ports for f in features))
+        valid_features = {p: {f: int(next(valid)) for f in features} for p in ports}
+
+        with self.api.batch():
+            for port in rx_ports:
+                modes = []
+                modes.append(IxeReceiveMode.widePacketGroup)
+                port.packetGroup.groupIdOffset = groupIdOffset
+                port.packetGroup.signatureOffset = signatureOffset
+                if sequence_checking and valid_features[port]["portFeatureRxSequenceChecking"]:
+                    modes.append(IxeReceiveMode.sequenceChecking)
+                    port.packetGroup.sequenceNumberOffset = sequenceNumberOffset
+                if data_integrity and valid_features[port]["portFeatureRxDataIntegrity"]:
+                    modes.append(IxeReceiveMode.dataIntegrity)
+                    port.dataIntegrity.signatureOffset = di_signatureOffset
+                if timestamp and valid_features[port]["portFeatureRxFirstTimeStamp"]:
+                    port.dataIntegrity.enableTimeStamp = True
                 else:
-                    stream.enableTimestamp = False
+                    port.dataIntegrity.enableTimeStamp = False
+                port.set_receive_modes(*modes)
+
+            for port, streams in tx_ports.items():
+                for stream in streams:
+                    stream.packetGroup.insertSignature = True
+                    stream.packetGroup.groupIdOffset = groupIdOffset
+                    stream.packetGroup.signatureOffset = signatureOffset
+                    if sequence_checking:
+                        stream.packetGroup.insertSequenceSignature = True
+                        stream.packetGroup.sequenceNumberOffset = sequenceNumberOffset
+                    if data_integrity and valid_features[port]["portFeatureRxDataIntegrity"]:
+                        stream.dataIntegrity.insertSignature = True
+                        stream.dataIntegrity.signatureOffset = di_signatureOffset
+                    if timestamp:
+                        stream.enableTimestamp = True
+                    else:
+                        stream.enableTimestamp = False
 
+        for port in ports:
             port.write()
 
     def set_prbs(self, rx_ports: List[IxePort] = None, tx_ports: Dict[IxePort, List[IxeStream]] = None) -> None:
@@ -3,14 +3,16 @@ Classes to manage IxExplorer HW objects - chassis, card and resource group.
 
 Port class in in ixe_port module.
 """
+import json
 import logging
-import re
+import os
+import threading
 from collections import OrderedDict
-from typing import TYPE_CHECKING, Dict
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 
-from trafficgenerator.tgn_tcl import tcl_list_2_py_list
-
-from ixexplorer.api.ixapi import FLAG_RDONLY, IxTclHalError, TclMember, ixe_obj_meta
+from ixexplorer.api.ixapi import FLAG_RDONLY, IxeWriteMode, IxTclHalError, TclMember, ixe_obj_meta
+from ixexplorer.api.tcllist import split_tcl_list
+from ixexplorer.api.tclproto import TclError
 from ixexplorer.ixe_object import IxeObject, IxeObjectObj
 from ixexplorer.ixe_port import IxePort
 
@@ -19,6 +21,72 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger("tgn.ixexplorer")
 
+# Server side inventory of one chassis - ixServerVersion and {slot type <members>} of each populated slot.
+DISCOVER_SCRIPT = (
+    'if {{[set rc [chassis get {ip}]]}} {{return -code error "rc = $rc"}}; set cards {{}}; '
+    "for {{set slot 1}} {{$slot <= [chassis cget -maxCardCount]}} {{incr slot}} {{"
+    "if {{![card get {id} $slot]}} {{set type [card cget -type]; lappend cards [list $slot $type {members}]}}}}; "
+    "list [chassis cget -ixServerVersion] $cards"
+)
+# Card members to build the card - portCount operationMode resourceGroupInfoList, operationMode is read only for type 110
+# cards, the only ones that use it.
+DISCOVER_MEMBERS = (
+    "[card cget -portCount] [expr {$type == 110 ? [card cget -operationMode] : 0}] [card cget -resourceGroupInfoList]"
+)
+
+# Words of the field names in card resourceGroupInfoList entries.
+RG_FIELD_WORDS = {"mode", "ppm", "active", "capture", "resource", "ports"}
+RG_FIELDS = {"mode", "ppm", "active ports", "active capture ports", "resource ports"}
+
+
+def parse_resource_groups(resource_group_info_list: str) -> List[Dict[str, str]]:
+    """Parse card resourceGroupInfoList into {field: value} of each resource group.
+
+    Each resource group entry is a list like
+    `RG0 mode 10000 ppm 0 active ports {1 2 3 4} active capture ports {1} resource ports {1 2 3 4}`, the resource
+    group number is returned as field RG.
+
+    :param resource_group_info_list: card resourceGroupInfoList, may be wrapped in extra braces. Cards without resource
+        groups return other values, e.g. NA, that have no entries.
+    """
+    entries = [resource_group_info_list]
+    while len(entries) == 1 and not entries[0].lstrip().startswith("RG"):
+        unwrapped = split_tcl_list(entries[0])
+        if unwrapped == entries:
+            break
+        entries = unwrapped
+    resource_groups = []
+    for entry in entries:
+        if not entry.lstrip().startswith("RG"):
+            continue
+        words = split_tcl_list(entry)
+        fields = {"RG": words[0][2:]}
+        key: List[str] = []
+        for word in words[1:]:
+            if word in RG_FIELD_WORDS:
+                # Field without value, e.g. empty ppm.
+                if " ".join(key) in RG_FIELDS:
+                    fields[" ".join(key)] = ""
+                    key = []
+                key.append(word)
+            else:
+                fields[" ".join(key)] = word
+                key = []
+        resource_groups.append(fields)
+    return resource_groups
+
+
+def parse_port_list(port_list: str) -> List[str]:
+    """Return the port URIs (chassis card port) of IxTclHal port list, e.g. {{1 1 1} {1 1 2}}."""
+    uris = []
+    for element in split_tcl_list(port_list):
+        words = split_tcl_list(element)
+        if len(words) == 3 and all(word.isdigit() for word in words):
+            uris.append(" ".join(words))
+        elif words != [element]:
+            uris.extend(parse_port_list(element))
+    return uris
+
 
 class IxeCard(IxeObject, metaclass=ixe_obj_meta):
     __tcl_command__ = "card"
@@ -39,31 +107,39 @@ class IxeCard(IxeObject, metaclass=ixe_obj_meta):
 
     TYPE_NONE = 0
 
-    regex = r"RG([\d]+)\s*mode\s*([\d]+)\s*ppm\s*([-]*[\d]*)\s*active ports\s\{([\s\d]*)\}\s*active capture ports\s\{([\s\d]*)\}\s*resource ports\s*\{([\s\d]*)\}"  # noqa
-
     def __init__(self, parent, uri) -> None:
         super().__init__(parent=parent, uri=uri.replace("/", " "))
 
     def discover(self) -> None:
         self.logger.info(f"Discover card {self.name}")
-        for pid in range(1, self.portCount + 1):
+        self._build(self.portCount, lambda: self.type, lambda: self.resourceGroupInfoList, lambda: self.operationMode)
+
+    def _build(
+        self,
+        port_count: int,
+        card_type: Callable[[], int],
+        resource_group_info_list: Callable[[], str],
+        operation_mode: Callable[[], int],
+    ) -> None:
+        """Create the ports and resource groups of the card.
+
+        Card members other than portCount are passed as functions so they are read only when needed.
+        """
+        for pid in range(1, port_count + 1):
             IxePort(self, self.uri + "/" + str(pid))
         try:
-            rg_info_list = tcl_list_2_py_list(self.resourceGroupInfoList, within_tcl_str=True)
-            for entry in rg_info_list:
-                matches = re.finditer(self.regex, entry.strip())
-                for match in matches:
-                    IxeResourceGroup(
-                        self,
-                        str(int(match.group(1)) + 1),
-                        match.group(2),
-                        match.group(3),
-                        [int(p) for p in match.group(4).strip().split()],
-                        [int(p) for p in match.group(5).strip().split()],
-                        [int(p) for p in match.group(6).strip().split()],
-                    )
-            if self.type == 110:
-                operationMode = self.operationMode
+            for rg in parse_resource_groups(resource_group_info_list()):
+                IxeResourceGroup(
+                    self,
+                    str(int(rg["RG"]) + 1),
+                    rg["mode"],
+                    rg["ppm"],
+                    [int(p) for p in split_tcl_list(rg["active ports"])],
+                    [int(p) for p in split_tcl_list(rg["active capture ports"])],
+                    [int(p) for p in split_tcl_list(rg["resource ports"])],
+                )
+            if card_type() == 110:
+                operationMode = operation_mode()
                 if operationMode == 2:
                     ports = [13]
                     operationMode = "10000"
@@ -128,6 +204,53 @@ class IxeCard(IxeObject, metaclass=ixe_obj_meta):
     active_ports = property(get_active_ports)
 
 
+class IxeInventorySnapshot:
+    """Chassis inventories saved to a local JSON file, keyed by chassis IP and ixServerVersion.
+
+    Each inventory is the [slot, type, portCount, operationMode, resourceGroupInfoList] list of the populated slots, as
+    returned by DISCOVER_SCRIPT.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: str) -> None:
+        """Load the snapshot file, if exists.
+
+        :param path: snapshot file path.
+        """
+        self.path = path
+        self.inventories: Dict[str, List[List[str]]] = {}
+        self.modified = False
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            if snapshot.get("version") == self.VERSION:
+                self.inventories = snapshot["inventories"]
+
+    def get(self, ip: str, version: str) -> Optional[List[List[str]]]:
+        """Return the inventory of the chassis at the given IxServer version, None if not in the snapshot."""
+        with self._lock:
+            return self.inventories.get(f"{ip}/{version}")
+
+    def put(self, ip: str, version: str, inventory: List[List[str]]) -> None:
+        """Store the inventory of the chassis at the given IxServer version, written by save."""
+        with self._lock:
+            self.inventories[f"{ip}/{version}"] = inventory
+            self.modified = True
+
+    def save(self) -> None:
+        """Write the snapshot file, if modified, through a temporary file so readers never see a partial file."""
+        with self._lock:
+            if not self.modified:
+                return
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as snapshot_file:
+                json.dump({"version": self.VERSION, "inventories": self.inventories}, snapshot_file)
+            os.replace(temp_path, self.path)
+            self.modified = False
+
+
 class IxeChassis(IxeObject, metaclass=ixe_obj_meta):
     __tcl_command__ = "chassis"
     __tcl_members__ = [
@@ -246,10 +369,47 @@ class IxeChassis(IxeObject, metaclass=ixe_obj_meta):
             self.logger.info(f"Slot {cid} is empty")
             card.del_object_from_parent()
 
-    def discover(self) -> None:
+    def discover(self, snapshot: Optional["IxeInventorySnapshot"] = None) -> None:
+        """Get inventory - cards, ports and resource groups of all populated slots, in one round trip.
+
+        :param snapshot: inventory snapshot - if it holds the inventory of the chassis and the chassis still has the
+            same card types in the same slots, build the inventory from the snapshot, else discover and save it there.
+        """
         self.logger.info(f"Discover chassis {self.obj_name()}")
-        for cid in range(1, self.maxCardCount + 1):
-            self.add_card(cid)
+        if snapshot:
+            version, slots = self._inventory("")
+            cards = snapshot.get(self.uri, version)
+            if cards is not None and [card[:2] for card in cards] == slots:
+                self.logger.info(f"Chassis {self.obj_name()} inventory loaded from {snapshot.path}")
+                self._build(cards)
+                return
+        version, cards = self._inventory(DISCOVER_MEMBERS)
+        self._build(cards)
+        if snapshot:
+            snapshot.put(self.uri, version, cards)
+
+    def _inventory(self, members: str) -> Tuple[str, List[List[str]]]:
+        """Return ixServerVersion and [slot, type, members...] of each populated slot, see DISCOVER_SCRIPT."""
+        try:
+            version, cards = split_tcl_list(
+                self.api.call(DISCOVER_SCRIPT.format(ip=self.uri, id=self.chassis_id, members=members))
+            )
+        except TclError as error:
+            raise IxTclHalError(f"chassis get {self.uri} - {error.result}")
+        finally:
+            self.api.tracker.reset(self.__tcl_command__, IxeCard.__tcl_command__)
+        return version, [split_tcl_list(card) for card in split_tcl_list(cards)]
+
+    def _build(self, inventory: List[List[str]]) -> None:
+        """Create cards, ports and resource groups from [slot, type, portCount, operationMode, resourceGroupInfoList]."""
+        cards = {int(card[0]): card for card in inventory}
+        for card in self.cards.values():
+            if card.index not in cards:
+                card.del_object_from_parent()
+        for slot, card_type, port_count, operation_mode, rg_info_list in cards.values():
+            card = IxeCard(self, f"{self.chassis_id}/{slot}")
+            self.logger.info(f"Discover card {card.name}")
+            card._build(int(port_count), lambda: int(card_type), lambda: rg_info_list, lambda: int(operation_mode))
 
     def add_vm_card(self, card_ip, card_id, keep_alive=300):
         self._api.call_rc(f"chassis addVirtualCard {self.host} {card_ip} {card_id} {keep_alive}")
@@ -265,8 +425,13 @@ class IxeChassis(IxeObject, metaclass=ixe_obj_meta):
     cards = property(get_cards)
 
     def refresh_chassis(self) -> None:
+        """Refresh (read) configuration from chassis and drop the cached attributes of its objects."""
         self.refresh()
-        self._reset_current_object()
+        self._reset_scratchpad()
+        # Session ports are children of the session, not of the chassis.
+        for port in self.session.ports.values():
+            if port.uri.split()[0] == str(self.chassis_id):
+                port._invalidate_cache(recursive=True)
 
 
 #
@@ -298,7 +463,6 @@ class IxeResourceGroup(IxeCardObj, metaclass=ixe_obj_meta):
         TclMember("activeCapturePortList"),
         TclMember("ppm"),
     ]
-    rePortInList = re.compile(r"(?:{((?:\d+\s*){3})})")
 
     def __init__(self, parent, rg_num, mode, ppm, active_ports, capture_ports, resource_ports):
         super().__init__(parent=parent, uri=parent.uri.replace("/", " ") + " " + rg_num)
@@ -310,7 +474,7 @@ class IxeResourceGroup(IxeCardObj, metaclass=ixe_obj_meta):
     def enable_capture_state(self, state, writeToHw=False):
         """Enable/Disable capture on resource group."""
         if state:
-            activePorts = self.rePortInList.findall(self.activePortList)
+            activePorts = parse_port_list(self.activePortList)
             self.activeCapturePortList = "{{" + activePorts[0] + "}}"
         else:
             self.activeCapturePortList = "{{}}"
@@ -321,10 +485,10 @@ class IxeResourceGroup(IxeCardObj, metaclass=ixe_obj_meta):
         mode = int(mode)
         if mode == self.mode:
             return None
-        allPorts = self.rePortInList.findall(self.resourcePortList)
-        self.set_auto_set(False)
+        allPorts = parse_port_list(self.resourcePortList)
+        write_mode, self.api.write_mode = self.api.write_mode, IxeWriteMode.manual
         self.mode = mode
-        self.set_auto_set(True)
+        self.api.write_mode = write_mode
         if mode == 100000 or mode == 40000:
             self.activePortList = "{{" + allPorts[0] + "}}"
             activeIndex = 0
@@ -1,17 +1,20 @@
 from collections import OrderedDict
 from typing import Dict, List, Type
 
+from trafficgenerator import TgnError
 from trafficgenerator.tgn_object import TgnObject
 
-from ixexplorer.api.ixapi import ixe_obj_auto_set, ixe_obj_meta
+from ixexplorer.api.ixapi import FLAG_RDONLY, IxeWriteMode, ixe_obj_meta, tcl_members_cget
+from ixexplorer.api.tcllist import split_tcl_list
 
 
 class IxeObject(TgnObject, metaclass=ixe_obj_meta):
-
     session = None
 
     __get_command__ = "get"
     __set_command__ = "set"
+    # True - the object is loaded into the IxHal by the get of its parent.
+    __get_parent__ = False
 
     def __init__(self, parent, **data):
         data["objRef"] = self.__tcl_command__ + " " + str(data["uri"])
@@ -20,7 +23,10 @@ class IxeObject(TgnObject, metaclass=ixe_obj_meta):
             self._data["name"] = self.uri.replace(" ", "/")
         if self.uri and (self.uri.split()[-1]).isdigit():
             self._data["index"] = int(self.uri.split()[-1])
-        self.__class__.current_object = None
+        # Values of (writable) members read from the TclServer, used only when api.cache_enabled.
+        self._cache = {}
+        # Values of members assigned in write back mode and not flushed yet.
+        self._dirty = {}
 
     def obj_uri(self) -> str:
         """Object URI."""
@@ -36,27 +42,75 @@ class IxeObject(TgnObject, metaclass=ixe_obj_meta):
         return [o for o in self.objects.values() if o.obj_type().lower() in types_l]
 
     def ix_command(self, command, *args, **kwargs):
+        if self._dirty:
+            self.flush()
+        self._invalidate_cache(recursive=True)
         return self.api.call(("{} {} {}" + len(args) * " {}").format(self.__tcl_command__, command, self.uri, *args))
 
     def ix_set_default(self) -> None:
-        self.api.call("{} setDefault".format(self.__tcl_command__))
-        self.__class__.current_object = self
+        self._invalidate_cache()
+        self.api.defer("{} setDefault".format(self.__tcl_command__))
+        self.api.tracker.assume(self)
 
     def ix_get(self, member=None, force=False) -> None:
-        if (self != self.__class__.current_object or force) and self.__get_command__:
-            self.api.call_rc(f"{self.__tcl_command__} {self.__get_command__} {self.uri}")
-        self.__class__.current_object = self
+        """Load the object into the Tcl storage of its command unless the storage already holds it.
+
+        :param member: member about to be accessed, read-only members are reloaded unless the storage is modified.
+        :param force: True - load even if the storage holds the object.
+        """
+        if force:
+            self._invalidate_cache()
+        if not self.__get_command__:
+            return
+        tracker = self.api.tracker
+        if not force and tracker.holds(self, volatile=bool(member and member.flags & FLAG_RDONLY)):
+            tracker.skipped_gets += 1
+            if tracker.verify and tracker.clean(self):
+                self._verify_scratchpad("get")
+            return
+        self.api.call_rc(f"{self.__tcl_command__} {self.__get_command__} {self.uri}")
 
     def ix_set(self, member=None) -> None:
+        """Store the Tcl storage into the IxHal object unless the IxHal already holds it."""
+        self._invalidate_cache()
+        tracker = self.api.tracker
+        if tracker.clean(self):
+            tracker.skipped_sets += 1
+            if tracker.verify:
+                self._verify_scratchpad("set")
+            return
         self.api.call_rc(f"{self.__tcl_command__} {self.__set_command__} {self.uri}")
 
     def get_attributes(self, flags: int = 0xFF, *attributes: str) -> OrderedDict:
-        attrs_values = OrderedDict()
-        if not attributes:
-            attributes = [m.attrname for m in self.__tcl_members__]
-        for member in self.__tcl_members__:
-            if (flags == 0xFF or member.flags & flags) and member.name in attributes:
-                attrs_values[member.attrname] = getattr(self, member.attrname)
+        """Read group of attributes in a single round trip.
+
+        :param flags: read only members with any of these flags, 0xFF - read all members.
+        :param attributes: requested attributes, if empty - read all attributes.
+        """
+        if self._dirty:
+            self.flush()
+        requested = set(attributes)
+        descriptors = [
+            d
+            for d in self.__tcl_member_index__.values()
+            if (flags == 0xFF or d.member.flags & flags) and (not requested or d.attrname in requested)
+        ]
+        attrs_values = OrderedDict((d.attrname, None) for d in descriptors)
+        cache = self.api.cache_enabled
+        if cache:
+            cached = [d for d in descriptors if not d.read_only and d.attrname in self._cache]
+            for descriptor in cached:
+                attrs_values[descriptor.attrname] = self._cache[descriptor.attrname]
+            self.api.cache_hits += len(cached)
+            descriptors = [d for d in descriptors if d not in cached]
+            self.api.cache_misses += len([d for d in descriptors if not d.read_only])
+        if descriptors:
+            self.ix_get(next((d.member for d in descriptors if d.read_only), None))
+            values = split_tcl_list(self.api.call(tcl_members_cget(descriptors)))
+            for descriptor, value in zip(descriptors, values):
+                attrs_values[descriptor.attrname] = descriptor.convert(value)
+                if cache and not descriptor.read_only:
+                    self._cache[descriptor.attrname] = attrs_values[descriptor.attrname]
         return attrs_values
 
     def get_attribute(self, attribute):
@@ -64,33 +118,100 @@ class IxeObject(TgnObject, metaclass=ixe_obj_meta):
         return getattr(self, attribute)
 
     def set_attributes(self, **attributes) -> None:
-        """Set group of attributes without calling set between attributes regardless of global auto_set.
+        """Set group of attributes with a single config command.
 
-        Set will be called only after all attributes are set based on global auto_set.
+        Set will be called only after all attributes are set based on the api write mode. In write back mode the
+        attributes are only recorded as dirty.
 
         :param attributes: dictionary of <attribute, value> to set.
         """
-        auto_set = IxeObject.get_auto_set()
-        IxeObject.set_auto_set(False)
-        for name, value in attributes.items():
-            setattr(self, name, value)
-        if auto_set:
-            self.ix_set()
-        IxeObject.set_auto_set(auto_set)
+        for name in attributes:
+            if name not in self.__tcl_member_index__:
+                raise AttributeError(f"{self.__class__.__name__} has no attribute {name}")
+            if self.__tcl_member_index__[name].read_only:
+                raise AttributeError(f"{self.__class__.__name__} attribute {name} is read only")
+            self._cache.pop(name, None)
+        self._assigned(attributes)
+        if self.api.write_mode == IxeWriteMode.write_back:
+            self._dirty.update(attributes)
+            return
+
+        with self.api.batch():
+            self._config(attributes)
+            if self.api.write_mode == IxeWriteMode.auto_set:
+                self.ix_set()
+
+    def flush(self) -> None:
+        """Write back dirty members of the object and its descendants in a single round trip.
+
+        Each touched object is configured with one config command and set once, sub-objects before the object they
+        belong to - stream sub-objects, then stream, then port.
+        """
+        with self.api.batch():
+            self._flush()
 
     @classmethod
-    def get_auto_set(cls):
-        return ixe_obj_auto_set
+    def get_auto_set(cls) -> bool:
+        """Return True if the session api is in auto set write mode."""
+        return cls.session.api.write_mode == IxeWriteMode.auto_set
 
     @classmethod
-    def set_auto_set(cls, auto_set) -> None:
-        global ixe_obj_auto_set
-        ixe_obj_auto_set = auto_set
-
-    def _reset_current_object(self) -> None:
-        self.__class__.current_object = None
-        for child in self.objects.values():
-            child._reset_current_object()
+    def set_auto_set(cls, auto_set: bool) -> None:
+        """Switch the session api between auto set and manual write modes, see IxTclHalApi.write_mode."""
+        cls.session.api.write_mode = IxeWriteMode.auto_set if auto_set else IxeWriteMode.manual
+
+    def _reset_scratchpad(self) -> None:
+        """Forget the content of all Tcl storages and cached attributes, after the IxHal was changed externally."""
+        self.api.tracker.reset()
+        self._invalidate_cache(recursive=True)
+
+    def _verify_scratchpad(self, skipped: str) -> None:
+        """Verify that skipped get/set was redundant - reloading the object from the IxHal must not change the storage."""
+        descriptors = [d for d in self.__tcl_member_index__.values() if not d.read_only]
+        if not descriptors:
+            return
+        cget = tcl_members_cget(descriptors)
+        get = f"{self.__tcl_command__} {self.__get_command__} {self.uri}"
+        if self.api.call(f"apply {{{{}} {{set before [{cget}]; {get}; expr {{$before eq [{cget}]}}}}}}") != "1":
+            raise TgnError(f"{self.__tcl_command__} storage does not hold {self.uri} but {skipped} was skipped")
+
+    def _assigned(self, attributes: Dict[str, object]) -> None:
+        """Handle the members assigned by attribute or set_attributes, in any write mode, before they are written."""
+
+    def _config(self, attributes: Dict[str, object]) -> None:
+        """Load the object and config the attributes, members flagged FLAG_IGERR are configured separately."""
+        options = [(self.__tcl_member_index__[name], value) for name, value in attributes.items()]
+        self.ix_get()
+        config = " ".join(f"-{d.member.name} {d.member.type(value)}" for d, value in options if not d.ignore_errors)
+        if config:
+            self.api.defer(f"{self.__tcl_command__} config {config}")
+        for descriptor, value in [(d, v) for d, v in options if d.ignore_errors]:
+            self.api.defer(descriptor.config + str(descriptor.member.type(value)), ignore_errors=True)
+
+    def _flush(self) -> None:
+        # The object and the sub-objects loaded by its get (see __get_parent__) share one config/set cycle, other
+        # descendants (streams of port...) are independent and flushed first.
+        unit = [self]
+        for obj in unit:
+            for child in list(obj.objects.values()):
+                if child.__get_parent__:
+                    unit.append(child)
+                else:
+                    child._flush()
+        touched = [obj for obj in unit if obj._dirty]
+        for obj in touched:
+            dirty, obj._dirty = obj._dirty, {}
+            obj._config(dirty)
+        # Sub-objects set their parents as well, the tracker skips the set of parents that were already set.
+        for obj in reversed(touched):
+            obj.ix_set()
+
+    def _invalidate_cache(self, recursive: bool = False) -> None:
+        """Drop cached attributes values of the object (and its children if recursive)."""
+        self._cache.clear()
+        if recursive:
+            for child in self.objects.values():
+                child._invalidate_cache(recursive)
 
     def _get_object(self, field, ixe_object):
         if not hasattr(self, field) or not getattr(self, field):
@@ -115,6 +236,8 @@ class IxeObject(TgnObject, metaclass=ixe_obj_meta):
 
 
 class IxeObjectObj(IxeObject):
+    __get_parent__ = True
+
     def ix_get(self, member=None, force=False):
         self.parent.ix_get(member, force)
         super().ix_get(member, force)
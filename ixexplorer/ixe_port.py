@@ -5,9 +5,17 @@ from pathlib import Path
 from trafficgenerator import TgnError
 
 from ixexplorer.api.ixapi import FLAG_IGERR, FLAG_RDONLY, MacStr, TclMember, ixe_obj_meta
+from ixexplorer.api.tcllist import split_tcl_list
 from ixexplorer.ixe_object import IxeObject, IxeObjectObj
 from ixexplorer.ixe_statistics_view import IxeCapFileFormat, IxePortsStats, IxeStat, IxeStreamsStats
-from ixexplorer.ixe_stream import IxeStream
+from ixexplorer.ixe_stream import IxePacketGroupStream, IxeStream
+
+# Server side packet group IDs of all streams on one port, -1 for streams without packet group.
+DISCOVER_STREAMS_SCRIPT = (
+    "set r {{}}; set n [port getStreamCount {port}]; for {{set s 1}} {{$s <= $n}} {{incr s}} {{"
+    "lappend r [if {{[packetGroup getTx {port} $s]}} {{list -1}} else {{packetGroup cget -groupId}}]}}; "
+    "set r"
+)
 
 
 class IxePhyMode(Enum):
@@ -205,18 +213,13 @@ class IxePort(IxeObject, metaclass=ixe_obj_meta):
                 raise TgnError(f"Failed to clear ownership for port {self} current owner is {self.owner}")
 
     def write(self) -> None:
-        """Write configuration to chassis.
+        """Write configuration, including members recorded in write back mode, to chassis.
 
         Raise StreamWarningsError if configuration warnings found.
         """
+        self.flush()
         self.ix_command("write")
-        stream_warnings = self.streamRegion.generateWarningList()
-        warnings_list = (
-            self.api.call("join " + " {" + stream_warnings + "} " + " LiStSeP").split("LiStSeP")
-            if self.streamRegion.generateWarningList()
-            else []
-        )
-        for warning in warnings_list:
+        for warning in split_tcl_list(self.streamRegion.generateWarningList()):
             if warning:
                 raise StreamWarningsError(warning)
 
@@ -225,6 +228,7 @@ class IxePort(IxeObject, metaclass=ixe_obj_meta):
         self.setFactoryDefaults()
         self.set_phy_mode(phy_mode)
         self.reset()
+        self.session.pgids.release_port(self.uri)
         self.write()
         if stats:
             self.clear_port_stats()
@@ -244,6 +248,7 @@ class IxePort(IxeObject, metaclass=ixe_obj_meta):
                 IxTclServer run on the client machine.
         """
         ext = config_file.suffix
+        self._invalidate_cache(recursive=True)
         if ext == ".prt":
             self.api.call_rc(f'port import "{config_file}" {self.uri}')
         elif ext == ".str":
@@ -280,9 +285,17 @@ class IxePort(IxeObject, metaclass=ixe_obj_meta):
         self.session.wait_for_up(timeout, [self])
 
     def discover(self) -> None:
+        """Create the port streams and index their packet group IDs, see IxePgidAllocator."""
         self.logger.info("Discover port {}".format(self.obj_name()))
-        for stream_id in range(1, int(self.getStreamCount()) + 1):
-            IxeStream(self, self.uri + "/" + str(stream_id))
+        try:
+            groups = split_tcl_list(self.api.call(DISCOVER_STREAMS_SCRIPT.format(port=self.uri)))
+        finally:
+            self.api.tracker.reset(IxePacketGroupStream.__tcl_command__)
+        self.session.pgids.release_port(self.uri)
+        for stream_id, group in enumerate(groups, start=1):
+            stream = IxeStream(self, self.uri + "/" + str(stream_id))
+            if int(group) >= 0:
+                self.session.pgids.assign(stream.uri, int(group))
 
     def start_transmit(self, blocking: bool = False) -> None:
         """Start transmit on port.
@@ -395,6 +408,7 @@ class IxePort(IxeObject, metaclass=ixe_obj_meta):
         :type mode: ixexplorer.ixe_port.IxeTransmitMode
         """
 
+        self._invalidate_cache()
         self.api.call_rc("port setTransmitMode {} {}".format(mode, self.uri))
 
     def set_rx_ports(self, *rx_ports):
@@ -405,9 +419,7 @@ class IxePort(IxeObject, metaclass=ixe_obj_meta):
 
     def ix_set_list(self, optList):
         self.ix_get()
-        for opt in optList:
-            value = optList[opt]
-            self.api.call("%s config -%s %s" % (self.__tcl_command__, opt, value))
+        self.api.pipeline(f"{self.__tcl_command__} config -{opt} {value}" for opt, value in optList.items())
         self.ix_set()
 
     def set_wide_packet_group(self) -> None:
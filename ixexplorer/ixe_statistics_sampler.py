@@ -0,0 +1,167 @@
+"""
+Background sampling of port and stream statistics into a ring buffer.
+
+StatsSampler reads the statistics views at a fixed interval in its own thread, over its own TclServer connection, so
+sampling does not wait for (or block) the calls of the application on the main connection::
+
+    sampler = ixia.open_sampler(interval=1, port_stats=["framesSent", "framesReceived"], stream_stats=["totalFrames"])
+    sampler.subscribe(lambda sample: print(sample.time, sample.ports))
+    sampler.start()
+    ...
+    sampler.close()
+    samples = list(sampler.samples)
+
+Each sample is timestamped with the chassis clock (readTimeStamp of the packet group statistics, in nanoseconds) when
+stream statistics are sampled, and always with the host clock. The interval is kept by the sampler clock - a sample that
+takes longer than the interval skips the missed ticks instead of drifting.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+
+from ixexplorer.api.ixapi import IxTclHalApi, IxTclHalConnection
+from ixexplorer.api.tclproto import TclClient
+from ixexplorer.ixe_statistics_view import IxePortsStats, IxeStreamsStats
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+
+class IxeStatsSample(NamedTuple):
+    """One sample of the statistics views, host and chassis timestamped."""
+
+    # Host time, seconds since the epoch, in the middle of the sample.
+    time: float
+    # Chassis time in nanoseconds, latest readTimeStamp of the stream statistics, None if streams are not sampled.
+    chassis_time: Optional[int]
+    # IxePortsStats.read_stats result, None if ports are not sampled.
+    ports: Optional[Dict[str, dict]]
+    # IxeStreamsStats.read_stats result, None if streams are not sampled.
+    streams: Optional[Dict[str, dict]]
+
+
+class StatsSampler:
+    """Samples the statistics views at a fixed interval in a background thread, over its own TclServer connection."""
+
+    def __init__(
+        self,
+        api: IxTclHalApi,
+        ports_stats: Optional[IxePortsStats] = None,
+        streams_stats: Optional[IxeStreamsStats] = None,
+        port_stats: Iterable[str] = (),
+        stream_stats: Iterable[str] = (),
+        interval: float = 1,
+        capacity: int = 3600,
+    ) -> None:
+        """Create sampler and its TclServer connection, the connection is opened by connect.
+
+        :param api: api of the session, the sampler connection is to the TclServer of the api main connection.
+        :param ports_stats: ports statistics view to sample, None - do not sample ports.
+        :param streams_stats: streams statistics view to sample, None - do not sample streams.
+        :param port_stats: port statistics to read, if empty - read all statistics.
+        :param stream_stats: stream statistics to read, if empty - read all statistics. readTimeStamp is added.
+        :param interval: seconds between samples.
+        :param capacity: number of samples to keep, older samples are dropped.
+        """
+        main = api.connection.tcl_handler
+        self.api = api
+        self.connection = IxTclHalConnection(TclClient(main.logger, main.host, main.port, main.rsa_id))
+        self.ports_stats = ports_stats
+        self.streams_stats = streams_stats
+        self.port_stats = tuple(port_stats)
+        self.stream_stats = tuple(stream_stats)
+        if self.stream_stats and "readTimeStamp" not in self.stream_stats:
+            self.stream_stats += ("readTimeStamp",)
+        self.interval = interval
+        self.samples: Deque[IxeStatsSample] = deque(maxlen=capacity)
+        # Number of ticks skipped because the previous sample took longer than the interval, and of failed samples.
+        self.missed = 0
+        self.errors = 0
+        # Called with the thread bound to the sampler connection, after connect.
+        self.setup: Optional[Callable[[], None]] = None
+        self._subscribers: List[Callable[[IxeStatsSample], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def connect(self) -> None:
+        """Connect and set up the sampler connection."""
+        self.connection.tracker.reset()
+        self.connection.tcl_handler.connect()
+        if self.setup:
+            with self.api.bind(self.connection):
+                self.setup()
+
+    def close(self) -> None:
+        """Stop sampling and close the sampler connection."""
+        self.stop()
+        if self.connection.tcl_handler.fd:
+            self.connection.tcl_handler.close()
+
+    def subscribe(self, callback: Callable[[IxeStatsSample], None]) -> None:
+        """Call callback with each new sample, from the sampler thread.
+
+        :param callback: function of one IxeStatsSample, exceptions are logged and ignored.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[IxeStatsSample], None]) -> None:
+        """Stop calling callback with new samples."""
+        self._subscribers.remove(callback)
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="StatsSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sample in progress (if any) to complete."""
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def latest(self) -> Optional[IxeStatsSample]:
+        """Return the latest sample, None if no sample was taken yet."""
+        return self.samples[-1] if self.samples else None
+
+    def sample(self) -> IxeStatsSample:
+        """Read the statistics views once, on the sampler connection, and return the sample without buffering it."""
+        with self.api.bind(self.connection):
+            start = time.time()
+            ports = self.ports_stats.read_stats(*self.port_stats) if self.ports_stats else None
+            streams = self.streams_stats.read_stats(*self.stream_stats, refresh=False) if self.streams_stats else None
+            end = time.time()
+        chassis_time = None
+        if streams:
+            timestamps = [rx["readTimeStamp"] for s in streams.values() for rx in s["rx"].values() if "readTimeStamp" in rx]
+            chassis_time = max(timestamps, default=-1)
+            chassis_time = chassis_time if chassis_time >= 0 else None
+        return IxeStatsSample((start + end) / 2, chassis_time, ports, streams)
+
+    def _run(self) -> None:
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                sample = self.sample()
+            except Exception as error:
+                self.errors += 1
+                logger.warning(f"statistics sample failed - {error}")
+            else:
+                self.samples.append(sample)
+                for callback in list(self._subscribers):
+                    try:
+                        callback(sample)
+                    except Exception as error:
+                        logger.warning(f"statistics sample callback failed - {error}")
+            next_sample += self.interval
+            now = time.monotonic()
+            if next_sample < now:
+                missed = int((now - next_sample) / self.interval) + 1
+                self.missed += missed
+                next_sample += missed * self.interval
+            self._stop.wait(next_sample - now)
@@ -0,0 +1,226 @@
+"""
+Columnar time series store of port and stream statistics.
+
+IxeStatsStore keeps one preallocated, growable column per (object, counter) and a shared time axis, instead of one
+nested OrderedDict of Python numbers per read. It is fed with IxePortsStats/IxeStreamsStats statistics or with
+StatsSampler samples::
+
+    store = IxeStatsStore()
+    sampler.subscribe(store.add_sample)
+    ...
+    store.rate("192.168.1.1/1/1", "framesSent")
+    store.percentile("s1/rx/192.168.1.1/1/2", "averageLatency", 99)
+    store.to_csv("soak.csv")
+
+Columns are NumPy int64/float64 arrays when NumPy is installed (pip install pyixexplorer[numpy]) and the computations
+are vectorized, else compact array module arrays. Parquet export requires pyarrow (pip install pyixexplorer[parquet]).
+
+Stream statistics are stored under object `<stream>/tx` and `<stream>/rx/<port>`. Values missing from a read are -1 in
+int columns, like statistics that could not be read, and NaN in float columns.
+"""
+import csv
+import math
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from trafficgenerator import TgnError
+
+from ixexplorer.ixe_statistics_sampler import IxeStatsSample
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+class IxeStatsStore:
+    """Columnar time series of statistics, one growable column per (object, counter) and a shared time axis."""
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """Create empty store.
+
+        :param capacity: initial number of rows, columns double their capacity when full.
+        """
+        # {(object, counter): column index}
+        self.columns: Dict[Tuple[str, str], int] = {}
+        self.length = 0
+        self._capacity = capacity
+        self._time = self._new_column(True)
+        self._values: List[Sequence] = []
+        self._float: List[bool] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def add(self, timestamp: float, statistics: Dict[str, Dict[str, object]]) -> None:
+        """Add one row of statistics.
+
+        :param timestamp: time of the statistics, seconds.
+        :param statistics: {object: {counter: value}}, values that are not numbers are ignored.
+        """
+        with self._lock:
+            if self.length == self._capacity:
+                self._grow()
+            row = self.length
+            self._time[row] = timestamp
+            for obj, counters in statistics.items():
+                for counter, value in counters.items():
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        continue
+                    column = self.columns.get((obj, counter))
+                    if column is None:
+                        column = self._add_column(obj, counter, isinstance(value, float))
+                    self._values[column][row] = value if self._float[column] else int(value)
+            self.length += 1
+
+    def add_ports_stats(self, timestamp: float, statistics: Dict[str, Dict[str, object]]) -> None:
+        """Add row of IxePortsStats.read_stats statistics."""
+        self.add(timestamp, statistics)
+
+    def add_streams_stats(self, timestamp: float, statistics: Dict[str, dict]) -> None:
+        """Add row of IxeStreamsStats.read_stats statistics."""
+        self.add(timestamp, self._flatten_streams(statistics))
+
+    def add_sample(self, sample: IxeStatsSample) -> None:
+        """Add row of StatsSampler sample, can be used as sampler callback."""
+        statistics = dict(sample.ports or {})
+        statistics.update(self._flatten_streams(sample.streams or {}))
+        self.add(sample.time, statistics)
+
+    def times(self) -> Sequence[float]:
+        """Return the time axis."""
+        with self._lock:
+            return self._time[: self.length]
+
+    def series(self, obj: str, counter: str) -> Sequence:
+        """Return the values of one counter of one object, in time order.
+
+        :param obj: port, `<stream>/tx` or `<stream>/rx/<port>`.
+        :param counter: statistic name.
+        """
+        if (obj, counter) not in self.columns:
+            raise KeyError(f"No statistics for {obj} {counter}")
+        with self._lock:
+            return self._values[self.columns[(obj, counter)]][: self.length]
+
+    def delta(self, obj: str, counter: str) -> Sequence:
+        """Return the differences between consecutive values, one less than the number of rows."""
+        values = self.series(obj, counter)
+        if np is not None:
+            return np.diff(values)
+        return [b - a for a, b in zip(values, values[1:])]
+
+    def rate(self, obj: str, counter: str) -> Sequence[float]:
+        """Return the change per second between consecutive values, NaN between rows with the same time."""
+        deltas = self.delta(obj, counter)
+        intervals = self.delta_time()
+        if np is not None:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                return np.where(intervals > 0, deltas / np.where(intervals > 0, intervals, 1), np.nan)
+        return [d / i if i > 0 else math.nan for d, i in zip(deltas, intervals)]
+
+    def delta_time(self) -> Sequence[float]:
+        """Return the seconds between consecutive rows."""
+        times = self.times()
+        if np is not None:
+            return np.diff(times)
+        return [b - a for a, b in zip(times, times[1:])]
+
+    def minimum(self, obj: str, counter: str):
+        """Return the minimum value."""
+        values = self.series(obj, counter)
+        return values.min() if np is not None else min(values)
+
+    def maximum(self, obj: str, counter: str):
+        """Return the maximum value."""
+        values = self.series(obj, counter)
+        return values.max() if np is not None else max(values)
+
+    def percentile(self, obj: str, counter: str, percent: float) -> float:
+        """Return the percentile of the values, linear interpolation between the closest ranks like numpy.percentile.
+
+        :param percent: percentile, 0 - 100.
+        """
+        values = self.series(obj, counter)
+        if np is not None:
+            return float(np.percentile(values, percent))
+        ordered = sorted(values)
+        rank = (len(ordered) - 1) * percent / 100
+        low, high = math.floor(rank), math.ceil(rank)
+        return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+    def to_csv(self, path: str) -> None:
+        """Export to CSV file, one row per time, one column per `<object>:<counter>`."""
+        with self._lock:
+            keys = list(self.columns)
+            columns = [self._time[: self.length]] + [self._values[self.columns[key]][: self.length] for key in keys]
+            with open(path, "w", newline="") as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(["time"] + [f"{obj}:{counter}" for obj, counter in keys])
+                writer.writerows(zip(*[c.tolist() for c in columns]))
+
+    def to_npz(self, path: str) -> None:
+        """Export to NumPy NPZ file - time, objects and counters arrays and column c<i> of each (objects[i], counters[i])."""
+        if np is None:
+            raise TgnError("NPZ export requires numpy - pip install pyixexplorer[numpy]")
+        with self._lock:
+            keys = list(self.columns)
+            np.savez(
+                path,
+                time=self._time[: self.length],
+                objects=np.array([obj for obj, _ in keys], dtype=str),
+                counters=np.array([counter for _, counter in keys], dtype=str),
+                **{f"c{i}": self._values[self.columns[key]][: self.length] for i, key in enumerate(keys)},
+            )
+
+    def to_parquet(self, path: str) -> None:
+        """Export to Parquet file, columns like to_csv."""
+        if pa is None:
+            raise TgnError("Parquet export requires pyarrow - pip install pyixexplorer[parquet]")
+        with self._lock:
+            table = {"time": self._time[: self.length]}
+            for (obj, counter), column in self.columns.items():
+                table[f"{obj}:{counter}"] = self._values[column][: self.length]
+            pq.write_table(pa.table({name: pa.array(values) for name, values in table.items()}), path)
+
+    @staticmethod
+    def _flatten_streams(statistics: Dict[str, dict]) -> Dict[str, Dict[str, object]]:
+        flat = {}
+        for stream, stream_stats in statistics.items():
+            flat[f"{stream}/tx"] = stream_stats["tx"]
+            for port, rx_stats in stream_stats["rx"].items():
+                flat[f"{stream}/rx/{port}"] = rx_stats
+        return flat
+
+    def _new_column(self, is_float: bool, capacity: Optional[int] = None) -> Sequence:
+        capacity = self._capacity if capacity is None else capacity
+        if np is not None:
+            return np.full(capacity, np.nan if is_float else -1, dtype=np.float64 if is_float else np.int64)
+        return array("d", [math.nan]) * capacity if is_float else array("q", [-1]) * capacity
+
+    def _add_column(self, obj: str, counter: str, is_float: bool) -> int:
+        self.columns[(obj, counter)] = len(self._values)
+        self._values.append(self._new_column(is_float))
+        self._float.append(is_float)
+        return self.columns[(obj, counter)]
+
+    def _grow(self) -> None:
+        capacity = self._capacity
+        self._capacity *= 2
+        columns: Iterable[Tuple[Sequence, bool]] = [(self._time, True)] + list(zip(self._values, self._float))
+        grown = []
+        for column, is_float in columns:
+            if np is not None:
+                new_column = self._new_column(is_float)
+                new_column[:capacity] = column
+            else:
+                new_column = column + self._new_column(is_float, self._capacity - capacity)
+            grown.append(new_column)
+        self._time, self._values = grown[0], grown[1:]
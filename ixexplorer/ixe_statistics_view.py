@@ -5,12 +5,81 @@ Classes and utilities to manage IxExplorer statistics views.
 import time
 from collections import OrderedDict
 from enum import Enum
+from typing import Iterable, List, Optional, Tuple
 
 import ixexplorer.api.tclproto
 import ixexplorer.ixe_port
-from ixexplorer.api.ixapi import FLAG_IGERR, FLAG_RDONLY, IxTclHalError, TclMember, ixe_obj_meta
+from ixexplorer.api.ixapi import FLAG_IGERR, FLAG_RDONLY, IxTclHalError, TclMember, ixe_obj_meta, tcl_members_cget
+from ixexplorer.api.tcllist import split_tcl_list
+from ixexplorer.api.tclproto import TclError
 from ixexplorer.ixe_object import IxeObject
 
+# Server side snapshot of the port statistics - list of member values.
+PORT_STATS_SCRIPT = 'if {{[set rc [stat get statAllStats {port}]]}} {{return -code error "rc = $rc"}}; {cgets}'
+# Port statistics that are states, not counters, their rate can be read only from the chassis.
+PORT_STATES = {"duplexMode", "link", "lineSpeed", "linkFaultState"}
+
+# Server side snapshot of the TX statistics of streams on one port - {name {framesSent frameRate}} of each stream.
+STREAMS_TX_STATS_SCRIPT = (
+    'if {{[set rc [streamTransmitStats get {port} {first} {last}]]}} {{return -code error "rc = $rc"}}; set r {{}}; '
+    "foreach s {{{streams}}} {{"
+    'if {{[set rc [stream get {port} $s]]}} {{return -code error "stream $s rc = $rc"}}; '
+    'if {{[set rc [streamTransmitStats getGroup $s]]}} {{return -code error "stream $s rc = $rc"}}; '
+    "lappend r [list [stream cget -name] [{cgets}]]}}; "
+    "set r"
+)
+# Server side snapshot of the packet group statistics of one range of groups on one RX port - {} for groups without
+# statistics. The snapshot of a port is `set r {}`, the snapshots of its ranges and `set r`.
+PG_STATS_RANGE_SCRIPT = (
+    'if {{[set rc [packetGroupStats get {port} {first} {last}]]}} {{return -code error "rc = $rc"}}; '
+    "foreach g {{{groups}}} {{if {{[packetGroupStats getGroup $g]}} {{lappend r {{}}}} else {{lappend r [{cgets}]}}}}; "
+)
+# Groups closer than this are fetched in one range, the chassis reads the groups between them as well.
+PG_RANGE_GAP = 256
+
+
+def group_ranges(groups: Iterable[int], gap: int = PG_RANGE_GAP) -> List[Tuple[int, int]]:
+    """Return the (first, last) ranges that cover the groups, groups closer than gap share one range.
+
+    :param groups: group IDs.
+    :param gap: maximum distance between two groups in the same range.
+    """
+    ranges: List[Tuple[int, int]] = []
+    for group in sorted(set(groups)):
+        if ranges and group - ranges[-1][1] <= gap:
+            ranges[-1] = (ranges[-1][0], group)
+        else:
+            ranges.append((group, group))
+    return ranges
+
+
+def counter_delta(previous: int, current: int) -> Optional[int]:
+    """Return the increment of a counter between two reads, None if the counter was cleared in between.
+
+    A counter that went down wrapped around if it was in the top quarter of its 32 or 64 bit range and is now in the
+    bottom quarter, else it was cleared.
+
+    :param previous: counter value at the previous read.
+    :param current: counter value at the current read.
+    """
+    if current >= previous:
+        return current - previous
+    for bits in (32, 64):
+        if previous < 2**bits:
+            if previous >= 3 * 2 ** (bits - 2) and current < 2 ** (bits - 2):
+                return current + 2**bits - previous
+            break
+    return None
+
+
+class IxeRateMode(Enum):
+    """Source of the `_rate` port statistics."""
+
+    # Read rates from the chassis (stat getRate), a second read per port.
+    chassis = 1
+    # Compute rates from consecutive reads of the totals, see IxePortsStats.
+    client = 2
+
 
 class IxeCapFileFormat(Enum):
     cap = 1
@@ -99,11 +168,9 @@ class IxeStat(IxeObject, metaclass=ixe_obj_meta):
 
     def read_stats(self, *stats):
         if not stats:
-            stats = [m.attrname for m in self.__tcl_members__ if m.flags & FLAG_RDONLY]
-        stats_values = OrderedDict(zip(stats, [-1] * len(stats)))
-        for stat in stats:
-            stats_values[stat] = getattr(self, stat)
-        return stats_values
+            stats = self.__tcl_rdonly_members__
+        stats_values = self.get_attributes(0xFF, *stats)
+        return OrderedDict((stat, stats_values[stat]) for stat in stats)
 
 
 class IxeStatTotal(IxeStat, metaclass=ixe_obj_meta):
@@ -151,11 +218,12 @@ class IxePgStats(IxeObject, metaclass=ixe_obj_meta):
 
     def read_stats(self, *stats):
         if not stats:
-            stats = [m.attrname for m in self.__tcl_members__ if m.flags & FLAG_RDONLY]
+            stats = self.__tcl_rdonly_members__
         stats_values = OrderedDict(zip(stats, [-1] * len(stats)))
         try:
-            if int(self.get_attribute("totalFrames")):
-                return self.get_attributes(FLAG_RDONLY, *stats)
+            pg_stats = self.get_attributes(FLAG_RDONLY, "totalFrames", *stats)
+            if int(pg_stats["totalFrames"]):
+                return OrderedDict((c, v) for c, v in pg_stats.items() if c in stats)
         except IxTclHalError as _:
             pass
 
@@ -183,9 +251,25 @@ class IxeStats:
 
 
 class IxePortsStats(IxeStats):
-    def __init__(self, *ports) -> None:
+    def __init__(self, *ports, rate_mode: IxeRateMode = IxeRateMode.chassis, chassis_rates: Iterable[str] = ()) -> None:
+        """Port statistics view.
+
+        In client rate mode the `_rate` statistics are computed from the totals of consecutive reads of the view, so each
+        read costs one pipelined round trip for all ports instead of two round trips per port. The rates of the first
+        read, and of ports whose counters were cleared since the previous read, are read from the chassis. Port states
+        (link...) have no rate unless they are in chassis_rates, so all reads return the same statistics. Rates that
+        could not be read or computed are -1.
+
+        :param ports: ports to read, if empty - all session ports.
+        :param rate_mode: where the `_rate` statistics come from.
+        :param chassis_rates: in client rate mode, statistics whose rate is always read from the chassis.
+        """
         super().__init__()
         self.ports = ports if ports else IxeObject.session.ports.values()
+        self.rate_mode = rate_mode
+        self.chassis_rates = tuple(chassis_rates)
+        # {port: (time, totals)} of the previous read, for client side rates.
+        self._previous = {}
 
     def set_attributes(self, **attributes) -> None:
         for port in self.ports:
@@ -196,6 +280,8 @@ class IxePortsStats(IxeStats):
 
         :param stats: list of requested statistics to read, if empty - read all statistics.
         """
+        if self.rate_mode == IxeRateMode.client:
+            return self._read_client_rates(*stats)
         self.statistics = OrderedDict()
         ixexplorer.api.tclproto.ssh_timeout = 1
         for port in self.ports:
@@ -205,6 +291,56 @@ class IxePortsStats(IxeStats):
         ixexplorer.api.tclproto.ssh_timeout = 60
         return self.statistics
 
+    def _read_client_rates(self, *stats):
+        requested = set(stats)
+        descriptors = [
+            d for d in IxeStatTotal.__tcl_member_index__.values() if d.read_only and (not requested or d.attrname in requested)
+        ]
+        cgets = tcl_members_cget(descriptors)
+        api = IxeObject.session.api
+        start = time.monotonic()
+        try:
+            results = api.pipeline([PORT_STATS_SCRIPT.format(port=port.uri, cgets=cgets) for port in self.ports])
+        except TclError as error:
+            raise IxTclHalError(f"stat get statAllStats - {error.result}")
+        finally:
+            api.tracker.reset(IxeStat.__tcl_command__)
+        now = (start + time.monotonic()) / 2
+
+        self.statistics = OrderedDict()
+        for port, result in zip(self.ports, results):
+            port_stats = OrderedDict((d.attrname, d.convert(v)) for d, v in zip(descriptors, split_tcl_list(result)))
+            rates = self._client_rates(port, now, port_stats)
+            if rates is None:
+                rates = IxeStatRate(port).get_attributes(FLAG_RDONLY, *stats)
+            elif self.chassis_rates:
+                rates.update(IxeStatRate(port).get_attributes(FLAG_RDONLY, *self.chassis_rates))
+            rated = [c for c in port_stats if c not in PORT_STATES or c in self.chassis_rates]
+            port_stats.update({c + "_rate": rates.get(c, -1) for c in rated})
+            self.statistics[str(port)] = port_stats
+            self._previous[port] = (now, port_stats)
+        return self.statistics
+
+    def _client_rates(self, port, now: float, totals) -> Optional[OrderedDict]:
+        """Return {counter: rate} since the previous read, None if there is no previous read or counters were cleared."""
+        if port not in self._previous:
+            return None
+        previous_time, previous = self._previous[port]
+        if now <= previous_time:
+            return None
+        rates = OrderedDict()
+        for counter, value in totals.items():
+            if counter in PORT_STATES or counter in self.chassis_rates or not isinstance(value, int):
+                continue
+            # Counters that could not be read are -1.
+            if value < 0 or previous.get(counter, -1) < 0:
+                continue
+            delta = counter_delta(previous[counter], value)
+            if delta is None:
+                return None
+            rates[counter] = int(delta / (now - previous_time))
+        return rates
+
 
 class PgStatsDict(OrderedDict):
     """If only one RX port - no need to specify port name."""
@@ -237,42 +373,129 @@ class IxeStreamsStats(IxeStats):
             if p.receiveMode & int(ixexplorer.ixe_port.IxeReceiveMode.widePacketGroup.value)
         ]
 
-    def read_stats(self, *stats):
+    def read_stats(self, *stats, refresh: bool = True):
         """Read stream statistics from chassis.
 
+        TX statistics (and stream names) are read once per TX port and packet group statistics once per RX port, each
+        snapshot with one server side script, and the statistics of all streams are built from the snapshots. The
+        packet group IDs of the streams come from the session index (see IxePgidAllocator) and only the ranges of
+        groups sent to each RX port are read, see group_ranges.
+
         :param stats: list of requested statistics to read, if empty - read all statistics.
+        :param refresh: True - read twice to refresh rate statistics, False - read once, when the statistics are read
+            periodically (see StatsSampler).
         """
-        from ixexplorer.ixe_stream import IxePacketGroupStream
-
         sleep_time = 0.1  # in case we only want few counters but very fast we need a smaller sleep time
         if not stats:
-            stats = [m.attrname for m in IxePgStats.__tcl_members__ if m.flags & FLAG_RDONLY]
+            stats = IxePgStats.__tcl_rdonly_members__
             sleep_time = 1
-
-        # Read twice to refresh rate statistics.
-        for port in self.tx_ports_streams:
-            port.api.call_rc(f"streamTransmitStats get {port.uri} 1 4096")
-        for rx_port in self.rx_ports:
-            rx_port.api.call_rc(f"packetGroupStats get {rx_port.uri} 0 65536")
-        time.sleep(sleep_time)
+        api = IxeObject.session.api
+        tx_ports = [port for port, streams in self.tx_ports_streams.items() if streams]
+        pgids = self._pgids()
+        rx_groups = OrderedDict((rx_port, set()) for rx_port in self.rx_ports)
+        for streams in self.tx_ports_streams.values():
+            for stream in streams:
+                for rx_port in self._stream_rx_ports(stream):
+                    if pgids[stream] >= 0:
+                        rx_groups[rx_port].add(pgids[stream])
+        rx_groups = OrderedDict((port, sorted(groups)) for port, groups in rx_groups.items() if groups)
+
+        if refresh:
+            # Read twice to refresh rate statistics.
+            ranges = [("streamTransmitStats", port, *self._tx_range(port)) for port in tx_ports]
+            ranges += [("packetGroupStats", port, *r) for port, groups in rx_groups.items() for r in group_ranges(groups)]
+            api.pipeline([f"{command} get {port.uri} {first} {last}" for command, port, first, last in ranges], check_rc=True)
+            time.sleep(sleep_time)
+
+        pg_descriptors = [IxePgStats.__tcl_member_index__[stat] for stat in dict.fromkeys(("totalFrames", *stats))]
+        tx_scripts = [self._tx_stats_script(port) for port in tx_ports]
+        rx_scripts = [self._pg_stats_script(port, groups, pg_descriptors) for port, groups in rx_groups.items()]
+        snapshots = self._read_snapshots(api, tx_scripts + rx_scripts)
+        tx_count = len(tx_scripts)
+        tx_stats = self._tx_stats(tx_ports, snapshots[:tx_count])
+        rx_stats = {}
+        for port, snapshot in zip(rx_groups, snapshots[tx_count:]):
+            for group, values in zip(rx_groups[port], snapshot):
+                rx_stats[(port, group)] = self._convert(pg_descriptors, values) if values else None
 
         self.statistics = OrderedDict()
-        for tx_port, streams in self.tx_ports_streams.items():
+        for streams in self.tx_ports_streams.values():
             for stream in streams:
-                stream_stats = OrderedDict()
-                tx_port.api.call_rc(f"streamTransmitStats get {tx_port.uri} 1 4096")
-                stream_tx_stats = IxeStreamTxStats(tx_port, stream.index)
-                stream_stats_tx = {c: v for c, v in stream_tx_stats.get_attributes(FLAG_RDONLY).items()}
-                stream_stats["tx"] = stream_stats_tx
-                stream_stat_pgid = IxePacketGroupStream(stream).groupId
+                pgid = pgids[stream]
+                name, stream_stats_tx = tx_stats[stream]
                 stream_stats_pg = PgStatsDict()
                 for port in IxeObject.session.ports.values():
                     stream_stats_pg[str(port)] = OrderedDict(zip(stats, [-1] * len(stats)))
-                for rx_port in self.rx_ports:
-                    if not stream.rx_ports or rx_port in stream.rx_ports:
-                        rx_port.api.call_rc(f"packetGroupStats get {rx_port.uri} 0 65536")
-                        pg_stats = IxePgStats(rx_port, stream_stat_pgid)
-                        stream_stats_pg[str(rx_port)] = pg_stats.read_stats(*stats)
-                stream_stats["rx"] = stream_stats_pg
-                self.statistics[str(stream)] = stream_stats
+                for rx_port in self._stream_rx_ports(stream):
+                    pg_stats = rx_stats.get((rx_port, pgid))
+                    # No group or no packets on group - keep the -1 defaults.
+                    if pg_stats and pg_stats["totalFrames"]:
+                        stream_stats_pg[str(rx_port)] = OrderedDict((stat, pg_stats[stat]) for stat in stats)
+                self.statistics[name] = OrderedDict(tx=stream_stats_tx, rx=stream_stats_pg)
         return self.statistics
+
+    def _stream_rx_ports(self, stream):
+        return [rx_port for rx_port in self.rx_ports if not stream.rx_ports or rx_port in stream.rx_ports]
+
+    def _pgids(self):
+        """Return {stream: pgid} from the session index, streams missing from the index are read from the chassis."""
+        from ixexplorer.ixe_stream import IxePacketGroupStream
+
+        pgids = {}
+        index = IxeObject.session.pgids
+        for streams in self.tx_ports_streams.values():
+            for stream in streams:
+                pgids[stream] = index.pgid(stream.uri)
+                if pgids[stream] is None:
+                    pgids[stream] = IxePacketGroupStream(stream).groupId
+                    index.assign(stream.uri, pgids[stream])
+        return pgids
+
+    def _tx_stats(self, tx_ports, snapshots):
+        """Return {stream: (name, tx stats)} from the TX snapshots of the ports."""
+        descriptors = list(IxeStreamTxStats.__tcl_member_index__.values())
+        tx_stats = {}
+        for port, snapshot in zip(tx_ports, snapshots):
+            for stream, (name, values) in zip(self.tx_ports_streams[port], snapshot):
+                tx_stats[stream] = (name, self._convert(descriptors, split_tcl_list(values)))
+        return tx_stats
+
+    def _tx_range(self, port):
+        indices = [int(stream.index) for stream in self.tx_ports_streams[port]]
+        return min(indices), max(indices)
+
+    def _tx_stats_script(self, port):
+        first, last = self._tx_range(port)
+        return STREAMS_TX_STATS_SCRIPT.format(
+            port=port.uri,
+            first=first,
+            last=last,
+            streams=" ".join(str(stream.index) for stream in self.tx_ports_streams[port]),
+            cgets=tcl_members_cget(IxeStreamTxStats.__tcl_member_index__.values()),
+        )
+
+    @staticmethod
+    def _pg_stats_script(port, groups, descriptors):
+        """Return script that reads the packet group statistics of (sorted) groups, one snapshot per group range."""
+        cgets = tcl_members_cget(descriptors)
+        script = "set r {}; "
+        for first, last in group_ranges(groups):
+            range_groups = " ".join(str(group) for group in groups if first <= group <= last)
+            script += PG_STATS_RANGE_SCRIPT.format(port=port.uri, first=first, last=last, groups=range_groups, cgets=cgets)
+        return script + "set r"
+
+    @staticmethod
+    def _read_snapshots(api, scripts):
+        """Run snapshot scripts in one round trip and return the list of rows of each script."""
+        if not scripts:
+            return []
+        try:
+            return [[split_tcl_list(row) for row in split_tcl_list(result)] for result in api.pipeline(scripts)]
+        except TclError as error:
+            raise IxTclHalError(f"statistics snapshot - {error.result}")
+        finally:
+            api.tracker.reset("streamTransmitStats", "packetGroupStats", "stream")
+
+    @staticmethod
+    def _convert(descriptors, values):
+        return OrderedDict((d.attrname, d.convert(value)) for d, value in zip(descriptors, values))
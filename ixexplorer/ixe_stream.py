@@ -1,8 +1,116 @@
-from ixexplorer.api.ixapi import FLAG_RDONLY, MacStr, TclMember, ixe_obj_meta
+import bisect
+import threading
+from typing import Dict, List, Optional, Set
+
+from trafficgenerator import TgnError
+
+from ixexplorer.api.ixapi import FLAG_RDONLY, IxeWriteMode, MacStr, TclMember, ixe_obj_meta
 from ixexplorer.ixe_object import IxeObject, IxeObjectObj
 from ixexplorer.ixe_statistics_view import IxeStreamsStats
 
 
+class IxePgidAllocator:
+    """Packet group IDs of the session streams, with a local stream <-> packet group ID index.
+
+    New streams get the lowest free ID, IDs of removed streams are reused and the free IDs at the top are given back,
+    so the IDs in use stay packed in few contiguous ranges (see group_ranges). The index is kept by stream URI so it
+    survives re-creation of the stream objects, IxePort.discover (and load_config) refresh it from the chassis.
+    """
+
+    MAX_PGID = 65535
+
+    def __init__(self) -> None:
+        """Create empty index, the first allocated ID is 0."""
+        # {port URI: {stream URI: pgid}}
+        self.ports: Dict[str, Dict[str, int]] = {}
+        # {pgid: stream URIs}, imported configurations may send several streams with the same group.
+        self.streams: Dict[int, Set[str]] = {}
+        # Sorted IDs below the next (never used) ID that are not in use.
+        self._free: List[int] = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def allocate(self, stream_uri: str) -> int:
+        """Return the packet group ID of the stream, allocate the lowest free ID to new streams.
+
+        :param stream_uri: stream URI (chassis card port stream).
+        """
+        with self._lock:
+            pgid = self.pgid(stream_uri)
+            if pgid is not None:
+                return pgid
+            if self._free:
+                pgid = self._free.pop(0)
+            elif self._next <= self.MAX_PGID:
+                pgid = self._next
+                self._next += 1
+            else:
+                raise TgnError(f"No free packet group ID for stream {stream_uri}")
+            self._index(stream_uri, pgid)
+            return pgid
+
+    def assign(self, stream_uri: str, pgid: int) -> None:
+        """Index the packet group ID configured on the stream.
+
+        :param stream_uri: stream URI (chassis card port stream).
+        :param pgid: packet group ID read from the chassis or set by the user.
+        """
+        with self._lock:
+            if self.pgid(stream_uri) == pgid:
+                return
+            self._release(stream_uri)
+            if pgid >= self._next:
+                self._free.extend(range(self._next, pgid))
+                self._next = pgid + 1
+            elif pgid not in self.streams:
+                del self._free[bisect.bisect_left(self._free, pgid)]
+            self._index(stream_uri, pgid)
+
+    def release(self, stream_uri: str) -> None:
+        """Free the packet group ID of a removed stream.
+
+        :param stream_uri: stream URI (chassis card port stream).
+        """
+        with self._lock:
+            self._release(stream_uri)
+
+    def release_port(self, port_uri: str) -> None:
+        """Free the packet group IDs of all streams of a port.
+
+        :param port_uri: port URI (chassis card port).
+        """
+        with self._lock:
+            for stream_uri in list(self.ports.get(port_uri, {})):
+                self._release(stream_uri)
+
+    def pgid(self, stream_uri: str) -> Optional[int]:
+        """Return the packet group ID of the stream, None if the stream is not indexed.
+
+        :param stream_uri: stream URI (chassis card port stream).
+        """
+        return self.ports.get(_port_uri(stream_uri), {}).get(stream_uri)
+
+    def _index(self, stream_uri: str, pgid: int) -> None:
+        self.ports.setdefault(_port_uri(stream_uri), {})[stream_uri] = pgid
+        self.streams.setdefault(pgid, set()).add(stream_uri)
+
+    def _release(self, stream_uri: str) -> None:
+        pgid = self.ports.get(_port_uri(stream_uri), {}).pop(stream_uri, None)
+        if pgid is None:
+            return
+        self.streams[pgid].discard(stream_uri)
+        if self.streams[pgid]:
+            return
+        del self.streams[pgid]
+        bisect.insort(self._free, pgid)
+        while self._free and self._free[-1] == self._next - 1:
+            self._next = self._free.pop()
+
+
+def _port_uri(stream_uri: str) -> str:
+    return " ".join(stream_uri.split()[:3])
+
+
 class IxeStream(IxeObject, metaclass=ixe_obj_meta):
     __tcl_command__ = "stream"
     __tcl_members__ = [
@@ -68,26 +176,25 @@ class IxeStream(IxeObject, metaclass=ixe_obj_meta):
 
     __tcl_commands__ = ["export", "write"]
 
-    next_group_id = 0
-
     def __init__(self, parent, uri):
         super().__init__(parent=parent, uri=uri.replace("/", " "))
         self.rx_ports = []
 
     def create(self, name: str) -> None:
-        self.ix_set_default()
-        self.protocol.ix_set_default()
-        self.vlan.ix_set_default()
-        if not name:
-            name = self.obj_name()
-        self.name = "{" + name.replace("%", "%%").replace("\\", "\\\\") + "}"
-        self.ix_set()
-        self.packetGroup.groupId = IxeStream.next_group_id
-        IxeStream.next_group_id += 1
+        with self.api.batch():
+            self.ix_set_default()
+            self.protocol.ix_set_default()
+            self.vlan.ix_set_default()
+            if not name:
+                name = self.obj_name()
+            self.name = "{" + name.replace("%", "%%").replace("\\", "\\\\") + "}"
+            self.ix_set()
+            self.packetGroup.groupId = self.session.pgids.allocate(self.uri)
 
     def remove(self) -> None:
         self.ix_command("remove")
         self.ix_command("write")
+        self.session.pgids.release(self.uri)
         self.del_object_from_parent()
 
     def ix_set_default(self) -> None:
@@ -111,7 +218,7 @@ class IxeStream(IxeObject, metaclass=ixe_obj_meta):
             # for some reason (bug?) alias (ip/ipv4) is not acceptable here.
             self.protocol.name = str(version)
             require_set = True
-        if require_set and not IxeObject.get_auto_set():
+        if require_set and self.api.write_mode == IxeWriteMode.manual:
             self.ix_set()
 
     def get_ip(self):
@@ -205,9 +312,14 @@ class IxeProtocol(IxeStreamObj, metaclass=ixe_obj_meta):
         TclMember("enable802dot1qTag", type=int),
         TclMember("name"),
     ]
+    # Protocol has no get/set of its own, it is loaded by stream get and stored by stream set.
+    __get_command__ = None
+    __set_command__ = None
 
     def ix_get(self, member=None, force=False):
-        self.parent.ix_get(member, force)
+        # Reload the stream only if its storage is clean, a modified stream storage (new stream) holds the protocol.
+        tracker = self.api.tracker
+        self.parent.ix_get(member, force or (tracker.clean(self.parent) and not tracker.holds(self)))
 
     def ix_set(self, member=None):
         self.parent.ix_set(member)
@@ -410,6 +522,7 @@ class IxeUdf(IxeStreamObj, metaclass=ixe_obj_meta):
         pass
 
     def set(self, index):
+        self.flush()
         self.api.call_rc("{} {} {}".format(self.__tcl_command__, self.__set_command__, index))
 
 
@@ -480,6 +593,11 @@ class IxePacketGroupStream(IxeStreamTxObj, metaclass=ixe_obj_meta):
         TclMember("timeBinDuration", type=int),
     ]
 
+    def _assigned(self, attributes: Dict[str, object]) -> None:
+        # Keep the session index in sync with IDs set by the user, e.g. stream.packetGroup.groupId = 100.
+        if "groupId" in attributes:
+            self.session.pgids.assign(self.uri, int(attributes["groupId"]))
+
 
 class IxeAutoDetectInstrumentationStream(IxeStreamTxObj, metaclass=ixe_obj_meta):
     __tcl_command__ = "autoDetectInstrumentation"
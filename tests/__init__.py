@@ -8,6 +8,9 @@ from trafficgenerator import TgnSutUtils, set_logger
 
 from ixexplorer.ixe_app import IxeApp, init_ixe
 
+# Chassis added by the TclServerSim fixtures.
+SIM_CHASSIS = "192.168.1.1"
+
 
 class IxeSutUtils(TgnSutUtils):
     """IxExplorer SUT utilities."""
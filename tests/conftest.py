@@ -9,8 +9,9 @@ from typing import Iterable, List
 import pytest
 from trafficgenerator.tgn_conftest import log_level, pytest_addoption, sut  # pylint: disable=unused-import
 
-from ixexplorer.ixe_app import IxeApp
-from tests import IxeSutUtils
+from ixexplorer.api.tclserver import TclServerSim
+from ixexplorer.ixe_app import IxeApp, init_ixe
+from tests import SIM_CHASSIS, IxeSutUtils
 
 
 @pytest.fixture(scope="session")
@@ -35,6 +36,23 @@ def locations(sut_utils: IxeSutUtils) -> List[str]:
     return sut_utils.locations()
 
 
+@pytest.fixture
+def server() -> Iterable[TclServerSim]:
+    """Yield local TclServer stand-in with 2 cards of 2 ports, 3 slots."""
+    with TclServerSim(port=0, cards=2, ports=2, slots=3) as server:
+        yield server
+
+
+@pytest.fixture
+def sim_ixia(server: TclServerSim) -> Iterable[IxeApp]:
+    """Yield Ixia object connected to the local TclServer stand-in, with SIM_CHASSIS added."""
+    ixia = init_ixe("127.0.0.1", server.port)
+    ixia.connect("sim")
+    ixia.add(SIM_CHASSIS)
+    yield ixia
+    ixia.disconnect()
+
+
 def test_save_config(ixia: IxeApp, locations: List[str]) -> None:
     """Save current configuration from port."""
     ixia.session.add_ports(*locations)
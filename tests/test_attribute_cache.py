@@ -0,0 +1,76 @@
+"""
+Tests for the opt-in attributes read cache, run against the local TclServer stand-in.
+"""
+from typing import Callable
+
+import pytest
+
+from ixexplorer.ixe_app import IxeApp
+from ixexplorer.ixe_port import IxePort
+from tests import SIM_CHASSIS
+
+
+def _reserved_port(ixia: IxeApp) -> IxePort:
+    port = ixia.session.add_ports(f"{SIM_CHASSIS}/1/1")[f"{SIM_CHASSIS}/1/1"]
+    port.reserve()
+    ixia.api.cache_enabled = True
+    return port
+
+
+def _round_trips(ixia: IxeApp, read: Callable[[], object]) -> int:
+    with ixia.api.instrument() as report:
+        read()
+    return report.total.round_trips
+
+
+def test_cache_hits(sim_ixia: IxeApp) -> None:
+    """Writable members are read once and then served from the cache, read only members are always read."""
+    port = _reserved_port(sim_ixia)
+    api = sim_ixia.api
+    hits, misses = api.cache_hits, api.cache_misses
+    assert _round_trips(sim_ixia, lambda: port.autonegotiate) > 0
+    assert (api.cache_hits, api.cache_misses) == (hits, misses + 1)
+    assert _round_trips(sim_ixia, lambda: port.autonegotiate) == 0
+    assert (api.cache_hits, api.cache_misses) == (hits + 1, misses + 1)
+
+    # get_attributes reads only the members that are not cached.
+    with api.instrument() as report:
+        attributes = port.get_attributes(0xFF, "autonegotiate", "duplex", "linkState")
+    assert list(attributes) == ["autonegotiate", "duplex", "linkState"]
+    assert report.total.round_trips > 0
+    assert (api.cache_hits, api.cache_misses) == (hits + 2, misses + 2)
+    assert _round_trips(sim_ixia, lambda: port.get_attributes(0xFF, "autonegotiate", "duplex")) == 0
+
+    for _ in range(2):
+        assert _round_trips(sim_ixia, lambda: port.linkState) > 0
+    assert (api.cache_hits, api.cache_misses) == (hits + 4, misses + 2)
+
+    # The cache is opt-in.
+    api.cache_enabled = False
+    assert _round_trips(sim_ixia, lambda: port.autonegotiate) > 0
+    assert (api.cache_hits, api.cache_misses) == (hits + 4, misses + 2)
+
+
+@pytest.mark.parametrize(
+    "invalidate",
+    [
+        lambda ixia, port: setattr(port, "autonegotiate", False),
+        lambda ixia, port: port.set_attributes(autonegotiate=False),
+        lambda ixia, port: port.ix_set(),
+        lambda ixia, port: port.write(),
+        lambda ixia, port: ixia.refresh(),
+        lambda ixia, port: ixia.chassis_chain[SIM_CHASSIS].refresh_chassis(),
+        lambda ixia, port: ixia.session._reset_scratchpad(),
+    ],
+    ids=["set", "set_attributes", "ix_set", "write", "refresh", "refresh_chassis", "reset_scratchpad"],
+)
+def test_cache_invalidation(sim_ixia: IxeApp, invalidate: Callable[[IxeApp, IxePort], None]) -> None:
+    """Cached members are read again after each operation that may change them."""
+    port = _reserved_port(sim_ixia)
+    port.autonegotiate
+    assert _round_trips(sim_ixia, lambda: port.autonegotiate) == 0
+    invalidate(sim_ixia, port)
+    misses = sim_ixia.api.cache_misses
+    assert _round_trips(sim_ixia, lambda: port.autonegotiate) > 0
+    assert sim_ixia.api.cache_misses == misses + 1
+    assert _round_trips(sim_ixia, lambda: port.autonegotiate) == 0
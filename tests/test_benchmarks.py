@@ -0,0 +1,238 @@
+"""
+Round trip budget benchmarks of the core flows, run against the local TclServer stand-in.
+
+Each benchmark asserts that its flow does not exceed its budget of TclServer round trips. Wall time depends on the
+host, so a wall time over budget is only reported as a warning. Results are written as JSON to $IXE_BENCHMARK_JSON
+(default <temp dir>/ixexplorer_benchmarks.json) so call count and time regressions can be tracked between versions.
+
+The benchmarks are marked `benchmark` and are deselected by default, run them with::
+
+    pytest -m benchmark tests/test_benchmarks.py
+
+Fixed sleeps of the package (settle times after reserve, start_transmit...) are not executed, they are reported as
+sleep time and are not part of the measured wall time.
+"""
+import json
+import os
+import tempfile
+import time
+import warnings
+from typing import Callable, Dict, Iterable, List
+
+import pytest
+
+import ixexplorer.ixe_app
+import ixexplorer.ixe_statistics_view
+from ixexplorer.api.tcllist import iter_tcl_list, split_tcl_list, tcl_list
+from ixexplorer.api.tclserver import TclServerSim
+from ixexplorer.ixe_app import IxeApp, init_ixe
+from ixexplorer.ixe_port import IxePort
+from ixexplorer.ixe_statistics_view import IxePortsStats, IxeRateMode, IxeStreamsStats
+
+pytestmark = pytest.mark.benchmark
+
+CHASSIS = "192.168.1.1"
+LATENCY = 0.0005
+
+# benchmark -> (max round trips, wall time budget seconds)
+BUDGETS = {
+    "add_ports_reserve_ports": (80, 1),
+    "chassis_discover": (1, 0.5),
+    "add_stream_x100": (205, 2),
+    "ports_stats": (16, 0.5),
+    "ports_stats_client_rates": (1, 0.5),
+    "streams_stats_64x4": (2, 1),
+    "capture_fetch_10k": (20007, 60),
+}
+
+TCL_LIST_ELEMENTS = 100000
+# reply -> (list string, wall time budget seconds to parse TCL_LIST_ELEMENTS elements)
+TCL_LIST_REPLIES = {
+    "words": (lambda n: " ".join(str(i) for i in range(n)), 0.25),
+    "port_uris": (lambda n: tcl_list(*[f"1 {i % 16 + 1} {i}" for i in range(n)]), 0.5),
+    "nested": (lambda n: tcl_list(*[tcl_list(f"1 1 {i}", "framesSent", str(i)) for i in range(n)]), 1),
+    "escaped": (lambda n: tcl_list(*[f'warning "{i}" \\ {{' for i in range(n)]), 2.5),
+}
+
+
+@pytest.fixture(scope="module")
+def results() -> Iterable[Dict[str, dict]]:
+    """Yield the results of the module benchmarks, write them as JSON when all benchmarks completed."""
+    results: Dict[str, dict] = {}
+    yield results
+    path = os.environ.get("IXE_BENCHMARK_JSON", os.path.join(tempfile.gettempdir(), "ixexplorer_benchmarks.json"))
+    with open(path, "w") as json_file:
+        json.dump({"latency": LATENCY, "benchmarks": results}, json_file, indent=2)
+
+
+@pytest.fixture
+def server() -> Iterable[TclServerSim]:
+    """Yield local TclServer stand-in with LATENCY and 4 cards of 4 ports."""
+    with TclServerSim(port=0, latency=LATENCY, cards=4, ports=4, slots=6) as server:
+        yield server
+
+
+@pytest.fixture
+def sleeps(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """Record, instead of executing, the fixed sleeps of the package."""
+    sleeps: List[float] = []
+    for module in (ixexplorer.ixe_app, ixexplorer.ixe_statistics_view):
+        monkeypatch.setattr(module, "time", _Time(sleeps))
+    return sleeps
+
+
+@pytest.fixture
+def ixia(server: TclServerSim, sleeps: List[float]) -> Iterable[IxeApp]:
+    """Yield Ixia object connected to the stand-in, with CHASSIS added."""
+    ixia = init_ixe("127.0.0.1", server.port)
+    ixia.connect("benchmark")
+    ixia.add(CHASSIS)
+    yield ixia
+    ixia.disconnect()
+
+
+class _Time:
+    def __init__(self, sleeps: List[float]) -> None:
+        self.sleeps = sleeps
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+
+    def __getattr__(self, name: str):
+        return getattr(time, name)
+
+
+def _benchmark(name: str, ixia: IxeApp, sleeps: List[float], results: Dict[str, dict], flow: Callable[[], object]) -> None:
+    del sleeps[:]
+    with ixia.api.instrument() as report:
+        flow()
+    results[name] = {
+        "round_trips": report.total.round_trips,
+        "commands": report.total.count,
+        "wall_time": report.elapsed,
+        "sleep_time": sum(sleeps),
+        "bytes_sent": report.total.bytes_sent,
+        "bytes_received": report.total.bytes_received,
+        "stats_groups": report.stats_groups,
+        "by_verb": {verb: stats.round_trips for verb, stats in report.by_verb.items()},
+        "by_operation": {operation: stats.round_trips for operation, stats in report.by_operation.items()},
+    }
+    max_round_trips, max_wall_time = BUDGETS[name]
+    assert report.total.round_trips <= max_round_trips, f"{name} round trips over budget\n{report}"
+    _check_wall_time(name, report.elapsed, max_wall_time)
+
+
+def _check_wall_time(name: str, wall_time: float, max_wall_time: float) -> None:
+    if wall_time > max_wall_time:
+        warnings.warn(f"{name} wall time {wall_time:.3f} seconds over budget of {max_wall_time} seconds")
+
+
+def _ports(ixia: IxeApp) -> List[IxePort]:
+    return list(ixia.session.add_ports(*[f"{CHASSIS}/{card}/1" for card in range(1, 5)]).values())
+
+
+def _add_streams(ixia: IxeApp, ports: List[IxePort], streams: int) -> None:
+    for port in ports:
+        port.reserve()
+        for _ in range(streams):
+            port.add_stream()
+    ixia.session.set_stream_stats(rx_ports=ports, tx_ports={p: list(p.streams.values()) for p in ports})
+
+
+def test_add_ports_reserve_ports(ixia: IxeApp, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Add 4 ports and reserve them."""
+
+    def flow() -> None:
+        _ports(ixia)
+        ixia.session.reserve_ports()
+
+    _benchmark("add_ports_reserve_ports", ixia, sleeps, results, flow)
+
+
+def test_chassis_discover(ixia: IxeApp, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Discover chassis with 4 cards of 4 ports."""
+    _benchmark("chassis_discover", ixia, sleeps, results, ixia.chassis_chain[CHASSIS].discover)
+    assert len(ixia.chassis_chain[CHASSIS].cards) == 4
+
+
+def test_add_stream_x100(ixia: IxeApp, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Add 100 streams to one port and write them."""
+    port = _ports(ixia)[0]
+    port.reserve()
+
+    def flow() -> None:
+        for _ in range(100):
+            port.add_stream()
+        port.write()
+
+    _benchmark("add_stream_x100", ixia, sleeps, results, flow)
+    assert int(port.getStreamCount()) == 100
+
+
+def test_ports_stats(ixia: IxeApp, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Read all statistics of 4 ports."""
+    ports = _ports(ixia)
+    _add_streams(ixia, ports, 1)
+    ixia.session.start_transmit()
+    ixia.session.stop_transmit()
+    _benchmark("ports_stats", ixia, sleeps, results, IxePortsStats().read_stats)
+
+
+def test_ports_stats_client_rates(ixia: IxeApp, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Read all statistics of 4 ports, rates computed from the previous read."""
+    ports = _ports(ixia)
+    _add_streams(ixia, ports, 1)
+    ixia.session.start_transmit()
+    stats = IxePortsStats(rate_mode=IxeRateMode.client)
+    # The first read takes the chassis rates, the next reads compute them from the previous totals.
+    stats.read_stats()
+    _benchmark("ports_stats_client_rates", ixia, sleeps, results, stats.read_stats)
+    assert all(port_stats["framesSent_rate"] > 0 for port_stats in stats.statistics.values())
+    ixia.session.stop_transmit()
+
+
+def test_streams_stats_64x4(ixia: IxeApp, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Read the statistics of 64 streams on each of 4 ports."""
+    ports = _ports(ixia)
+    _add_streams(ixia, ports, 64)
+    ixia.session.start_transmit()
+    ixia.session.stop_transmit()
+    stats = IxeStreamsStats()
+    _benchmark("streams_stats_64x4", ixia, sleeps, results, stats.read_stats)
+    assert len(stats.statistics) == 256
+    # Stream IDs 1-64 on each TX port and groups 0-255 on each RX port, read twice.
+    assert results["streams_stats_64x4"]["stats_groups"] == 2 * 4 * (64 + 256)
+
+
+def test_capture_fetch_10k(ixia: IxeApp, server: TclServerSim, sleeps: List[float], results: Dict[str, dict]) -> None:
+    """Fetch 10000 captured frames."""
+    port = _ports(ixia)[0]
+    port.reserve()
+    server.model.capture_frames = 10000
+    ixia.session.start_capture(port)
+    ixia.session.stop_capture(None, ixexplorer.ixe_app.IxeCapFileFormat.mem, port)
+    frames = []
+    _benchmark("capture_fetch_10k", ixia, sleeps, results, lambda: frames.extend(port.get_cap_frames(*range(1, 10001))))
+    assert len(frames) == 10000 and all(frames)
+
+
+@pytest.mark.parametrize("reply", TCL_LIST_REPLIES)
+def test_tcl_list_100k(reply: str, results: Dict[str, dict]) -> None:
+    """Parse Tcl list of 100000 elements, whole and streamed."""
+    build, max_wall_time = TCL_LIST_REPLIES[reply]
+    tcl_str = build(TCL_LIST_ELEMENTS)
+    start = time.perf_counter()
+    elements = split_tcl_list(tcl_str)
+    split_time = time.perf_counter() - start
+    start = time.perf_counter()
+    streamed = sum(1 for _ in iter_tcl_list(tcl_str))
+    stream_time = time.perf_counter() - start
+    results[f"tcl_list_100k_{reply}"] = {
+        "elements": len(elements),
+        "bytes": len(tcl_str),
+        "wall_time": split_time,
+        "stream_wall_time": stream_time,
+    }
+    assert len(elements) == streamed == TCL_LIST_ELEMENTS
+    _check_wall_time(f"tcl_list_100k_{reply}", split_time, max_wall_time)
+    _check_wall_time(f"tcl_list_100k_{reply} streamed", stream_time, max_wall_time)
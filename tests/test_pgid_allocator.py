@@ -0,0 +1,56 @@
+"""
+Tests for the session packet group ID allocator.
+"""
+import pytest
+
+from ixexplorer.ixe_app import IxeApp
+from ixexplorer.ixe_statistics_view import IxeStreamsStats
+from ixexplorer.ixe_stream import IxePgidAllocator
+from tests import SIM_CHASSIS
+
+
+def test_pgid_allocator() -> None:
+    """Lowest free IDs are allocated first, released IDs are reused and assigned IDs are reserved."""
+    pgids = IxePgidAllocator()
+    assert [pgids.allocate(f"1 1 1 {stream}") for stream in range(1, 5)] == [0, 1, 2, 3]
+    assert pgids.allocate("1 1 1 2") == 1
+    pgids.release("1 1 1 2")
+    pgids.release("1 1 1 4")
+    # Lowest free ID first, the free IDs at the top are given back.
+    assert pgids.allocate("1 1 2 1") == 1
+    assert pgids.allocate("1 1 2 2") == 3
+    pgids.assign("1 1 2 3", 6)
+    assert pgids.allocate("1 1 2 4") == 4
+    pgids.release_port("1 1 2")
+    assert pgids.ports == {"1 1 1": {"1 1 1 1": 0, "1 1 1 3": 2}, "1 1 2": {}}
+    assert pgids.allocate("1 1 3 1") == 1
+    assert pgids.allocate("1 1 3 2") == 3
+
+
+@pytest.mark.parametrize("set_by", ["attribute", "set_attributes"])
+def test_pgid_set_by_user(sim_ixia: IxeApp, set_by: str) -> None:
+    """Packet group ID set on the stream by the user replaces the allocated ID in the index and in stream statistics."""
+    ports = sim_ixia.session.add_ports(f"{SIM_CHASSIS}/1/1", f"{SIM_CHASSIS}/1/2")
+    for port in ports.values():
+        port.reserve()
+    tx_port, rx_port = ports.values()
+    first, second = tx_port.add_stream(), tx_port.add_stream()
+    assert sim_ixia.session.pgids.ports[tx_port.uri] == {first.uri: 0, second.uri: 1}
+
+    if set_by == "attribute":
+        second.packetGroup.groupId = 100
+    else:
+        second.packetGroup.set_attributes(groupId=100)
+    tx_port.write()
+    assert sim_ixia.session.pgids.ports[tx_port.uri] == {first.uri: 0, second.uri: 100}
+    # The allocated ID is free again.
+    assert sim_ixia.session.pgids.pgid(rx_port.add_stream().uri) == 1
+
+    sim_ixia.session.set_stream_stats(rx_ports=[rx_port], tx_ports={tx_port: [first, second]})
+    sim_ixia.session.clear_all_stats()
+    sim_ixia.session.start_transmit()
+    sim_ixia.session.stop_transmit()
+    streams_stats = IxeStreamsStats(first, second).read_stats("totalFrames")
+    assert len(streams_stats) == 2
+    for stream_stats in streams_stats.values():
+        assert stream_stats["rx"][str(rx_port)]["totalFrames"] == stream_stats["tx"]["framesSent"] > 0
@@ -0,0 +1,121 @@
+"""
+Tests for the ScratchpadTracker and the write modes, run against a Tcl model of the command storage and IxHal objects.
+"""
+import logging
+from typing import List
+
+import pytest
+from trafficgenerator import TgnError
+
+import ixexplorer.api.ixapi
+from ixexplorer.api.ixapi import IxeWriteMode, IxTclHalApi, TclMember, ixe_obj_meta
+from ixexplorer.api.tcllist import split_tcl_list
+from ixexplorer.ixe_app import IxeSession
+from ixexplorer.ixe_object import IxeObject, IxeObjectObj
+from tests.test_tclproto import _storage_model_api
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+
+class _Port(IxeObject, metaclass=ixe_obj_meta):
+    __tcl_command__ = "port"
+    __tcl_members__ = [TclMember("c", type=int)]
+
+
+class _Stream(IxeObject, metaclass=ixe_obj_meta):
+    __tcl_command__ = "stream"
+    __tcl_members__ = [TclMember("a", type=int), TclMember("b")]
+
+
+class _Ip(IxeObjectObj, metaclass=ixe_obj_meta):
+    __tcl_command__ = "ip"
+    __tcl_members__ = [TclMember("x", type=int)]
+
+
+def _sent(api: IxTclHalApi) -> List[str]:
+    """Return the requests sent since last call, without cget and verification requests."""
+    server = api._tcl_handler.server
+    reported = getattr(server, "reported", 0)
+    new, server.reported = server.requests[reported:], len(server.requests)
+    return [r for r in new if " cget " not in r and not r.startswith("apply")]
+
+
+def test_scratchpad_tracker() -> None:
+    """Redundant get/set are skipped, sub-objects are reloaded when their parent storage changes."""
+    api = _storage_model_api()
+    api.tracker.verify = True
+    session = IxeSession(logger, api)
+    stream_1 = _Stream(parent=session, uri="1 1 1 1")
+    stream_2 = _Stream(parent=session, uri="1 1 1 2")
+    ip_1 = _Ip(parent=stream_1, uri="1 1 1")
+    _sent(api)
+
+    stream_1.a = 1
+    assert _sent(api) == ["stream get 1 1 1 1", "stream config -a 1", "stream set 1 1 1 1"]
+    ip_1.x = 10
+    assert _sent(api) == ["ip get 1 1 1", "ip config -x 10", "ip set 1 1 1", "stream set 1 1 1 1"]
+    assert (stream_1.a, ip_1.x) == (1, 10)
+    stream_1.ix_set()
+    ip_1.ix_set()
+    assert _sent(api) == []
+    assert stream_2.a == 0
+    assert ip_1.x == 10
+    assert _sent(api) == ["stream get 1 1 1 2", "stream get 1 1 1 1", "ip get 1 1 1"]
+    assert api.tracker.skipped_gets and api.tracker.skipped_sets
+
+    # Storage changed behind the back of the tracker is detected by the verify mode.
+    api._tcl_handler.call("stream config -a 2")
+    with pytest.raises(TgnError):
+        stream_1.ix_set()
+    api._tcl_handler.close()
+
+
+def test_write_back() -> None:
+    """Dirty members are written back in one round trip, one set per object, sub-objects first."""
+    api = _storage_model_api()
+    api.write_mode = IxeWriteMode.write_back
+    session = IxeSession(logger, api)
+    port = _Port(parent=session, uri="1 1 1")
+    streams = [_Stream(parent=port, uri=f"1 1 1 {i}") for i in range(1, 4)]
+    ips = [_Ip(parent=stream, uri="1 1 1") for stream in streams]
+    requests = len(api._tcl_handler.server.requests)
+
+    port.c = 5
+    for i, (stream, ip) in enumerate(zip(streams, ips)):
+        stream.a = i
+        stream.set_attributes(b=f"s{i}")
+        ip.x = 10 + i
+    assert len(api._tcl_handler.server.requests) == requests
+    port.flush()
+    assert len(api._tcl_handler.server.requests) == requests + 1
+    script = split_tcl_list(split_tcl_list(api._tcl_handler.server.requests[-1])[-1])
+    assert script[:6] == [
+        "stream get 1 1 1 1",
+        "stream config -a 0 -b s0",
+        "ip get 1 1 1",
+        "ip config -x 10",
+        "ip set 1 1 1",
+        "stream set 1 1 1 1",
+    ]
+    assert script[-3:] == ["port get 1 1 1", "port config -c 5", "port set 1 1 1"]
+    assert len(script) == 3 * 6 + 3
+
+    api.write_mode = IxeWriteMode.auto_set
+    assert [(s.a, s.b, ip.x) for s, ip in zip(streams, ips)] == [(0, "s0", 10), (1, "s1", 11), (2, "s2", 12)]
+    assert port.c == 5
+    api._tcl_handler.close()
+
+
+def test_auto_set_global() -> None:
+    """The removed ixe_obj_auto_set global maps to the write mode of the session api."""
+    api = _storage_model_api()
+    IxeSession(logger, api)
+    with pytest.deprecated_call():
+        ixexplorer.api.ixapi.ixe_obj_auto_set = False
+    assert api.write_mode == IxeWriteMode.manual
+    with pytest.deprecated_call():
+        assert not ixexplorer.api.ixapi.ixe_obj_auto_set
+    api.write_mode = IxeWriteMode.auto_set
+    with pytest.deprecated_call():
+        assert ixexplorer.api.ixapi.ixe_obj_auto_set
+    api._tcl_handler.close()
@@ -0,0 +1,45 @@
+"""
+Tests for the background statistics sampler, run against the local TclServer stand-in.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import ixexplorer.ixe_statistics_view
+from ixexplorer.ixe_app import IxeApp
+from ixexplorer.ixe_statistics_store import IxeStatsStore
+from tests import SIM_CHASSIS
+
+
+def test_stats_sampler(sim_ixia: IxeApp, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Samples are taken at the interval on the sampler connection, delivered to subscribers and kept in the ring buffer."""
+    port = sim_ixia.session.add_ports(f"{SIM_CHASSIS}/1/1")[f"{SIM_CHASSIS}/1/1"]
+    port.reserve()
+    port.add_stream()
+    sim_ixia.session.set_stream_stats()
+    sim_ixia.session.start_transmit()
+
+    # Samples are read back to back, without the fixed sleep of a single read.
+    monkeypatch.setattr(ixexplorer.ixe_statistics_view, "time", SimpleNamespace(monotonic=time.monotonic))
+    sampler = sim_ixia.open_sampler(interval=0.02, capacity=3, port_stats=["framesSent"], stream_stats=["totalFrames"])
+    samples = []
+    sampled = threading.Event()
+    store = IxeStatsStore()
+    sampler.subscribe(store.add_sample)
+    sampler.subscribe(lambda sample: (samples.append(sample), len(samples) == 5 and sampled.set()))
+    with sim_ixia.api.instrument() as report:
+        sampler.start()
+        assert sampled.wait(5)
+        sampler.stop()
+    # The sampler reads over its own connection.
+    assert report.total.count == 0
+    assert list(sampler.samples) == samples[-3:]
+    assert [sample.chassis_time for sample in samples] == sorted(sample.chassis_time for sample in samples)
+    # Sample times are in the middle of each read, the first read may end after the tick of the second.
+    assert samples[-1].time - samples[0].time >= 3 * 0.02
+    assert samples[-1].ports[str(port)]["framesSent"] > 0
+    assert samples[-1].streams[str(port.streams[1])]["rx"]["totalFrames"] > 0
+    assert len(store) >= 5 and all(rate > 0 for rate in store.rate(str(port), "framesSent")[:4])
+    sim_ixia.session.stop_transmit()
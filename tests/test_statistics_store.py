@@ -0,0 +1,54 @@
+"""
+Tests for the columnar statistics store.
+"""
+import math
+from pathlib import Path
+
+import pytest
+from trafficgenerator import TgnError
+
+import ixexplorer.ixe_statistics_store
+from ixexplorer.ixe_statistics_store import IxeStatsStore
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_stats_store(numpy: bool, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Columns grow, missing values are filled and the computations and exports match with and without numpy."""
+    if not numpy:
+        monkeypatch.setattr(ixexplorer.ixe_statistics_store, "np", None)
+    elif ixexplorer.ixe_statistics_store.np is None:
+        pytest.skip("numpy is not installed")
+    store = IxeStatsStore(capacity=2)
+    for second in range(5):
+        store.add_ports_stats(second, {"p1": {"framesSent": 100 * second, "linkFaultState": "noFault"}})
+        streams = {"s1": {"tx": {"framesSent": 10 * second}, "rx": {"p2": {"totalFrames": 10 * second, "prbsBerRatio": 0.5}}}}
+        store.add_streams_stats(second + 0.5, streams if second != 2 else {})
+    assert len(store) == 10
+    assert list(store.series("p1", "framesSent")) == [0, -1, 100, -1, 200, -1, 300, -1, 400, -1]
+    assert list(store.series("s1/rx/p2", "totalFrames")) == [-1, 0, -1, 10, -1, -1, -1, 30, -1, 40]
+    assert math.isnan(store.series("s1/rx/p2", "prbsBerRatio")[0])
+    assert ("p1", "linkFaultState") not in store.columns
+
+    store = IxeStatsStore()
+    for second, frames in enumerate([0, 100, 300, 300, 700]):
+        store.add(second / 2, {"p1": {"framesSent": frames}})
+    assert list(store.delta("p1", "framesSent")) == [100, 200, 0, 400]
+    assert list(store.rate("p1", "framesSent")) == [200, 400, 0, 800]
+    assert (store.minimum("p1", "framesSent"), store.maximum("p1", "framesSent")) == (0, 700)
+    assert store.percentile("p1", "framesSent", 50) == 300
+    assert store.percentile("p1", "framesSent", 90) == 540
+
+    store.to_csv(str(tmp_path.joinpath("stats.csv")))
+    with open(tmp_path.joinpath("stats.csv")) as csv_file:
+        assert csv_file.read().splitlines()[:2] == ["time,p1:framesSent", "0.0,0"]
+    if numpy:
+        store.to_npz(str(tmp_path.joinpath("stats.npz")))
+        npz = ixexplorer.ixe_statistics_store.np.load(tmp_path.joinpath("stats.npz"))
+        assert list(npz["objects"]) == ["p1"] and list(npz["c0"]) == [0, 100, 300, 300, 700]
+        if ixexplorer.ixe_statistics_store.pa is not None:
+            store.to_parquet(str(tmp_path.joinpath("stats.parquet")))
+            table = ixexplorer.ixe_statistics_store.pq.read_table(tmp_path.joinpath("stats.parquet"))
+            assert table.column("p1:framesSent").to_pylist() == [0, 100, 300, 300, 700]
+    else:
+        with pytest.raises(TgnError):
+            store.to_npz(str(tmp_path.joinpath("stats.npz")))
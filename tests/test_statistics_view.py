@@ -0,0 +1,121 @@
+"""
+Tests for the port and stream statistics views, run against the local TclServer stand-in.
+"""
+import time
+
+import pytest
+
+from ixexplorer.api.tclserver import TclServerSim
+from ixexplorer.ixe_app import IxeApp
+from ixexplorer.ixe_statistics_view import IxePortsStats, IxeRateMode, IxeStreamsStats, counter_delta, group_ranges
+from tests import SIM_CHASSIS
+
+
+def test_streams_stats(sim_ixia: IxeApp, server: TclServerSim) -> None:
+    """Stream statistics are read from one snapshot per TX and RX port and match the port statistics."""
+    ports = sim_ixia.session.add_ports(f"{SIM_CHASSIS}/1/1", f"{SIM_CHASSIS}/1/2")
+    for port in ports.values():
+        port.reserve()
+        assert port.owner == "sim"
+        for _ in range(2):
+            port.add_stream()
+        port.write()
+    assert [len(port.streams) for port in ports.values()] == [2, 2]
+    assert [int(port.getStreamCount()) for port in ports.values()] == [2, 2]
+
+    # The packet group ID index is refreshed from the chassis by discover.
+    pgids = {port: dict(streams) for port, streams in sim_ixia.session.pgids.ports.items()}
+    assert sorted(pgid for streams in pgids.values() for pgid in streams.values()) == [0, 1, 2, 3]
+    for port in ports.values():
+        port.discover()
+    assert sim_ixia.session.pgids.ports == pgids
+
+    tx_ports = {p: list(p.streams.values()) for p in ports.values()}
+    sim_ixia.session.set_stream_stats(rx_ports=list(ports.values()), tx_ports=tx_ports)
+    sim_ixia.session.clear_all_stats()
+    sim_ixia.session.start_transmit()
+    sim_ixia.session.stop_transmit()
+
+    ports_stats = IxePortsStats().read_stats("framesSent", "framesReceived")
+    for port_stats in ports_stats.values():
+        assert port_stats["framesSent"] > 0
+        assert port_stats["framesReceived"] == sum(s["framesSent"] for s in ports_stats.values())
+    with sim_ixia.api.instrument() as report:
+        streams_stats = IxeStreamsStats().read_stats("totalFrames")
+    # Only the 4 groups of the streams are read, on both RX ports, before and after the sleep.
+    for port in ports.values():
+        assert [last - first for first, last in report.stats_ranges[f"packetGroupStats {port.uri}"]] == [3, 3]
+    assert list(streams_stats) == [str(stream) for streams in tx_ports.values() for stream in streams]
+    for stream_stats in streams_stats.values():
+        assert stream_stats["tx"]["framesSent"] > 0
+        for rx_stats in stream_stats["rx"].values():
+            assert rx_stats["totalFrames"] == stream_stats["tx"]["framesSent"]
+
+
+def test_group_ranges() -> None:
+    """Groups closer than the gap are merged into one range."""
+    assert group_ranges([]) == []
+    assert group_ranges([7, 3, 5, 3], gap=2) == [(3, 7)]
+    assert group_ranges([1, 2, 10, 11, 40], gap=8) == [(1, 11), (40, 40)]
+
+
+def test_counter_delta() -> None:
+    """Counter deltas cover 32 and 64 bit wraps, counters that went down otherwise were cleared."""
+    assert counter_delta(10, 25) == 15
+    assert counter_delta(2**32 - 10, 5) == 15
+    assert counter_delta(2**64 - 10, 5) == 15
+    # Cleared - went down from the middle of the range.
+    assert counter_delta(2**31, 5) is None
+    assert counter_delta(10, 5) is None
+
+
+def test_client_rates(sim_ixia: IxeApp) -> None:
+    """Client rates are computed from consecutive reads in one round trip, the first and cleared reads use chassis rates."""
+    port = sim_ixia.session.add_ports(f"{SIM_CHASSIS}/1/1")[f"{SIM_CHASSIS}/1/1"]
+    port.reserve()
+    port.add_stream()
+    sim_ixia.session.start_transmit()
+    view = IxePortsStats(port, rate_mode=IxeRateMode.client, chassis_rates=["link"])
+    stats = ["framesSent", "bytesSent", "link"]
+
+    def read() -> tuple:
+        with sim_ixia.api.instrument() as report:
+            port_stats = view.read_stats(*stats)[str(port)]
+        return port_stats, report
+
+    # First read - no previous totals, rates are read from the chassis.
+    chassis_rates, report = read()
+    assert "getRate" in report.by_verb
+    time.sleep(0.2)
+    client_rates, report = read()
+    # One round trip for the totals, and getRate + cget for the chassis rate of link.
+    assert report.total.round_trips == 3 and report.by_verb["getRate"].count == 1
+    assert list(client_rates) == list(chassis_rates)
+    assert client_rates["framesSent_rate"] == pytest.approx(chassis_rates["framesSent_rate"], rel=0.2)
+    assert client_rates["link_rate"] == chassis_rates["link_rate"]
+
+    # Cleared counters went down - rates are read from the chassis.
+    sim_ixia.session.stop_transmit()
+    sim_ixia.session.clear_all_stats()
+    cleared_rates, report = read()
+    assert cleared_rates["framesSent"] == 0 and cleared_rates["framesSent_rate"] == 0
+    assert "getRate" in report.by_verb
+
+
+def test_client_rates_keys(sim_ixia: IxeApp) -> None:
+    """Client rate reads of all statistics return the same statistics, whether rates come from the chassis or not."""
+    port = sim_ixia.session.add_ports(f"{SIM_CHASSIS}/1/1")[f"{SIM_CHASSIS}/1/1"]
+    port.reserve()
+    port.add_stream()
+    sim_ixia.session.start_transmit()
+    view = IxePortsStats(port, rate_mode=IxeRateMode.client)
+
+    # Chassis rates, client rates and chassis rates again after clear.
+    chassis_rates = view.read_stats()[str(port)]
+    time.sleep(0.1)
+    client_rates = view.read_stats()[str(port)]
+    sim_ixia.session.stop_transmit()
+    sim_ixia.session.clear_all_stats()
+    cleared_rates = view.read_stats()[str(port)]
+    assert list(client_rates) == list(chassis_rates) == list(cleared_rates)
+    assert "link" in client_rates and "link_rate" not in client_rates
@@ -0,0 +1,60 @@
+"""
+Tests for the asyncio TclClient and IxTclHal api, run against the local TclServer stand-in.
+"""
+import asyncio
+import logging
+import time
+
+import pytest
+
+from ixexplorer.api.ixapi import IxTclHalError
+from ixexplorer.api.tclasync import AsyncIxTclHalApi, AsyncTclClient
+from ixexplorer.api.tclserver import TclServerSim
+from tests import SIM_CHASSIS
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+
+def test_async_api() -> None:
+    """Async calls on two servers run concurrently, calls on one connection are pipelined."""
+
+    async def chassis_stats(server: TclServerSim) -> dict:
+        api = AsyncIxTclHalApi(AsyncTclClient(logger, "127.0.0.1", server.port))
+        await api.connect("sim")
+        await api.call_rc(f"chassis add {SIM_CHASSIS}")
+        await api.wait_for_up(["1 1 1", "1 1 2"])
+        # Concurrent calls on one connection are pipelined - 8 calls take about one latency.
+        server.latency = 0.05
+        start = time.time()
+        owners = await asyncio.gather(*[api.call("port get 1 1 1; port cget -owner") for _ in range(8)])
+        elapsed = time.time() - start
+        stats = await api.get_members("stat get statAllStats 1 1 1", "stat", "framesSent", "link")
+        with pytest.raises(IxTclHalError):
+            await api.get_members("port get 1 1 9", "port", "owner")
+        await api.close()
+        return {"owners": owners, "elapsed": elapsed, "stats": stats}
+
+    async def main() -> list:
+        with TclServerSim(port=0) as server_1, TclServerSim(port=0) as server_2:
+            return await asyncio.gather(chassis_stats(server_1), chassis_stats(server_2))
+
+    for result in asyncio.run(main()):
+        assert result["owners"] == [""] * 8
+        assert result["elapsed"] < 2 * 0.05
+        assert result["stats"] == {"framesSent": "0", "link": "1"}
+
+
+def test_async_multi_line_result(server: TclServerSim) -> None:
+    """Multi-line result that ends like a reply frame is not split when the replies of other calls follow it."""
+    warnings = "Stream 1: frame size less than 64\r\nStream 2: bad"
+
+    async def calls() -> list:
+        client = AsyncTclClient(logger, "127.0.0.1", server.port)
+        await client.connect()
+        server.latency = 0.05
+        results = await asyncio.gather(client.call('set x "%s"' % warnings.replace("\r\n", "\\r\\n")), client.call("set y 1"))
+        results.append(await client.call("set x"))
+        await client.close()
+        return results
+
+    assert asyncio.run(calls()) == [warnings, "1", warnings]
@@ -0,0 +1,45 @@
+"""
+Tests for the TclClient connection pool, run against the local TclServer stand-in.
+"""
+import time
+
+from ixexplorer.api.tclpool import IxeAffinity
+from ixexplorer.api.tclserver import TclServerSim
+from ixexplorer.ixe_app import IxeApp
+from ixexplorer.ixe_statistics_view import IxePortsStats
+from tests import SIM_CHASSIS
+
+
+def test_pool(sim_ixia: IxeApp, server: TclServerSim) -> None:
+    """Objects are pinned to pool connections, parallel work overlaps round trips, dead connections are reopened."""
+    ports = list(sim_ixia.session.add_ports(*[f"{SIM_CHASSIS}/{card}/{port}" for card in (1, 2) for port in (1, 2)]).values())
+    pool = sim_ixia.open_pool(2)
+    assert pool.member(ports[0]) is pool.member(ports[0].uri + " 1") is not pool.member(ports[1])
+
+    # Each pool connection is logged in, so ports reserved over the pool are owned by the session user.
+    pool.parallel(lambda port: port.reserve(), ports)
+    assert [port.owner for port in ports] == ["sim"] * 4
+
+    server.latency = 0.05
+    start = time.time()
+    with sim_ixia.api.instrument() as report:
+        stats = pool.parallel(lambda port: IxePortsStats(port).read_stats("framesSent")[port.name]["framesSent"], ports)
+    elapsed = time.time() - start
+    assert stats == [0] * 4
+    # Two connections - about half the time of the round trips in series.
+    assert elapsed < 0.75 * report.total.round_trips * 0.05
+
+    server.latency = 0
+    pool.members[1].tcl_handler.fd.close()
+    assert pool.health_check() == [True, False]
+    assert pool.parallel(lambda port: port.owner, ports) == ["sim"] * 4
+    chassis_pool = sim_ixia.open_pool(1, IxeAffinity.chassis)
+    assert chassis_pool.member(ports[0]) is sim_ixia.api.pool.member(ports[3])
+
+    # The new pool replaces the previous one, which is closed, closing it again keeps the new pool.
+    assert sim_ixia.api.pool is chassis_pool
+    assert not any(member.tcl_handler.fd for member in pool.members)
+    pool.close()
+    assert sim_ixia.api.pool is chassis_pool
+    chassis_pool.close()
+    assert sim_ixia.api.pool is None
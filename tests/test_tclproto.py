@@ -0,0 +1,394 @@
+"""
+Tests for the TclServer socket protocol that run without chassis.
+"""
+import logging
+import pydoc
+import socket
+import threading
+import time
+import tkinter
+from typing import Callable, Iterable, List
+
+import pytest
+from trafficgenerator import TgnError
+
+import ixexplorer.api.tclproto
+from ixexplorer.api.ixapi import FLAG_IGERR, FLAG_RDONLY, IxTclHalApi, IxTclHalError, TclMember, ixe_obj_meta
+from ixexplorer.api.tcllist import iter_tcl_list, split_tcl_dict, split_tcl_list, tcl_list, tcl_quote
+from ixexplorer.api.tclproto import MARKED_COMMAND, TclClient, TclError, TclReplyParser, mark_command
+from ixexplorer.ixe_app import IxeSession
+from ixexplorer.ixe_hw import parse_port_list, parse_resource_groups
+from ixexplorer.ixe_object import IxeObject
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+
+class ScriptedServer:
+    """Minimal TclServer that answers each request line with the chunks returned by the reply function.
+
+    Marked (pipelined) commands are unwrapped for the reply function, and their replies are marked like the wrapper
+    script marks them.
+    """
+
+    def __init__(self, reply: Callable[[str], Iterable[bytes]], unwrap: bool = True) -> None:
+        """Listen on a free local port and serve the first connection in a thread.
+
+        :param reply: function of the request line that returns the reply chunks.
+        :param unwrap: True - unwrap marked commands, False - pass marked commands to reply as is.
+        """
+        self.reply = reply
+        self.unwrap = unwrap
+        self.requests: List[str] = []
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(1)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self) -> None:
+        connection, _ = self.listener.accept()
+        with connection:
+            pending = b""
+            while True:
+                data = connection.recv(4096)
+                if not data:
+                    # Release the reply function (and any Tcl interpreter it owns) in the thread that created it.
+                    self.reply = None
+                    return
+                pending += data
+                while b"\r\n" in pending:
+                    line, pending = pending.split(b"\r\n", 1)
+                    for chunk in self._reply(line.decode("utf-8")):
+                        connection.sendall(chunk)
+
+    def _reply(self, line: str) -> Iterable[bytes]:
+        if not self.unwrap or not line.startswith(MARKED_COMMAND):
+            self.requests.append(line)
+            return self.reply(line)
+        wrapper = len(MARKED_COMMAND)
+        command, mark = split_tcl_list(line[wrapper:])
+        self.requests.append(command)
+        reply = b"".join(self.reply(command))
+        return [reply[:-3] + mark.encode("ascii") + reply[-3:]]
+
+
+def _connect(reply: Callable[[str], Iterable[bytes]], unwrap: bool = True) -> TclClient:
+    server = ScriptedServer(reply, unwrap)
+    client = TclClient(logger, "127.0.0.1", server.port)
+    client.connect()
+    client.server = server
+    return client
+
+
+def _tcl_eval_reply() -> Callable[[str], Iterable[bytes]]:
+    """Return reply function that evaluates the requests with a real Tcl interpreter."""
+    interp = None
+
+    def reply(command: str) -> Iterable[bytes]:
+        nonlocal interp
+        if not interp:
+            interp = tkinter.Tcl()
+            interp.eval("package provide IxTclHal 1.0")
+            interp.eval("proc enableEvents {args} {}")
+            interp.eval("proc obj {args} {return 0}")
+            interp.eval("proc fail {args} {return 1}")
+        try:
+            yield interp.eval(command).encode("utf-8") + b"0\r\n"
+        except tkinter.TclError as error:
+            yield str(error).encode("utf-8") + b"1\r\n"
+
+    return reply
+
+
+def test_reply_parser_fragments() -> None:
+    """Frames split across reads and frames sharing a read are both recovered."""
+    parser = TclReplyParser()
+    parser.feed(b"line one\r\nline")
+    assert parser.next_frame() is None
+    parser.feed(b" two0\r")
+    assert parser.next_frame() is None
+    parser.feed(b"\nnext1\r\n")
+    assert parser.next_frame() == b"line one\r\nline two0"
+    assert parser.next_frame() == b"next1"
+    assert parser.next_frame() is None
+
+
+def test_socket_call() -> None:
+    """Result, io output and errors are decoded from fragmented replies."""
+
+    def reply(command: str) -> Iterable[bytes]:
+        if command == "slow":
+            yield b"sl"
+            time.sleep(0.05)
+            yield b"ow0\r\n"
+        elif command == "io":
+            yield b"some output\r00\r\n"
+        elif command == "bad":
+            yield b"invalid command name1\r\n"
+        else:
+            yield b"0\r\n"
+
+    client = _connect(reply)
+    assert client.socket_call("slow") == ("slow", None)
+    assert client.socket_call("io") == ("0", "some output")
+    with pytest.raises(TclError):
+        client.call("bad")
+    client.close()
+
+
+def test_socket_call_multi_line_result() -> None:
+    """A result line that ends like a reply frame does not split the reply, and the next request is still sent."""
+    warnings = b"Stream 1: frame size less than 64\r\nStream 2: bad\r"
+
+    def reply(command: str) -> Iterable[bytes]:
+        yield (warnings if command == "warn" else command.encode("utf-8")) + b"0\r\n"
+
+    client = _connect(reply)
+    assert client.call("warn") == warnings.decode("utf-8")
+    assert client.call("next") == "next"
+    assert client.pipeline(["first", "warn"]) == ["first", warnings.decode("utf-8")]
+    # Multi-line result that is not the last reply of the pipeline.
+    assert client.pipeline(["warn", "next"]) == [warnings.decode("utf-8"), "next"]
+    assert client.call("after") == "after"
+    assert client.server.requests[-7:] == ["warn", "next", "first", "warn", "warn", "next", "after"]
+    assert not client.parser.buffer
+    # Data that is not the reply of any request is a protocol error, not the reply of the next request.
+    client.parser.feed(b"stray0\r\n")
+    with pytest.raises(TgnError):
+        client.call("lost")
+    assert client.call("next") == "next"
+    client.close()
+
+    parser = TclReplyParser()
+    parser.feed(b"less than 64\r\nmore")
+    assert parser.next_frame(last=True) is None
+    parser.feed(b"0\r\n")
+    assert parser.next_frame(last=True) == b"less than 64\r\nmore0"
+
+    # Marked frames end at the mark, also when the mark is split between reads.
+    parser.feed(b"less than 64\r\nmore0\r\nab")
+    assert parser.next_frame(mark=b"abcd") is None
+    parser.feed(b"cd1\r\nnext")
+    assert parser.next_frame(mark=b"abcd") == b"less than 64\r\nmore0\r\n1"
+    parser.feed(b"abcd0\r\n")
+    assert parser.next_frame(mark=b"abcd") == b"next0"
+
+
+def test_marked_command() -> None:
+    """Marked commands keep their results, errors and global scope when evaluated by Tcl."""
+    # The wrapper script is evaluated by the interpreter, not unwrapped by the server.
+    client = _connect(_tcl_eval_reply(), unwrap=False)
+    commands = ['set x "less than 64\\r\\nmore"', "error {bad 1}", "set y [string length $x]", "return -code error bad"]
+    lines = [mark_command(command, client.mark) for command in commands]
+    assert not any("\r" in line or "\n" in line for line in lines)
+    results = client.pipeline(commands)
+    assert results[0] == "less than 64\r\nmore" and results[2] == "18"
+    assert isinstance(results[1], TclError) and results[1].result == "bad 1"
+    assert isinstance(results[3], TclError) and results[3].result == "bad"
+    assert client.call("set y") == "18"
+    client.close()
+
+
+def test_socket_call_timeout(monkeypatch: pytest.MonkeyPatch) -> None:
+    """A reply that arrives after the deadline is not returned to the next call."""
+
+    def reply(command: str) -> Iterable[bytes]:
+        if command == "late":
+            time.sleep(0.3)
+            yield b"late0\r\n"
+        else:
+            yield command.encode("utf-8") + b"0\r\n"
+
+    client = _connect(reply)
+    monkeypatch.setattr(ixexplorer.api.tclproto, "socket_timeout", 0.1)
+    with pytest.raises(TgnError):
+        client.call("late")
+    monkeypatch.setattr(ixexplorer.api.tclproto, "socket_timeout", 16)
+    assert client.call("next") == "next"
+    client.close()
+
+
+def test_pipeline() -> None:
+    """Pipelined replies are demultiplexed in order and errors are returned in place."""
+
+    def reply(command: str) -> Iterable[bytes]:
+        if command.startswith("bad"):
+            yield command.encode("utf-8") + b"1\r\n"
+        else:
+            yield command.encode("utf-8") + b"0\r\n"
+
+    client = _connect(reply)
+    commands = [f"cmd {i} " + "x" * 64 for i in range(5000)]
+    commands[10] = "bad 10"
+    results = client.pipeline(commands)
+    assert len(results) == len(commands)
+    assert isinstance(results[10], TclError)
+    assert results[11] == commands[11]
+    assert results[-1] == commands[-1]
+    assert client.call("after") == "after"
+    client.close()
+
+
+@pytest.mark.parametrize("word", ["a", "", "a b", "{a b} c", "a{", "}a{", "\\", "a\\ b", '"q"', "$x [y]", "1\\a", "%", "a\nb"])
+def test_tcl_quote(word: str) -> None:
+    """Quoted words and lists survive a round trip through a Tcl interpreter."""
+    interp = tkinter.Tcl()
+    assert interp.eval(f"set x {tcl_quote(word)}") == word
+    assert split_tcl_list(interp.eval(f"list {tcl_list(word, 'b', word)}")) == [word, "b", word]
+
+
+@pytest.mark.parametrize(
+    "tcl_str",
+    ["a b c", " {a {b c}} d ", '"a \\" b" w\\ v', "a\\nb {\\{}", "{} {}", "a{b c}d", '"\\x41\\u00e9"', "", "{a", '"a', "{a}b"],
+)
+def test_split_tcl_list(tcl_str: str) -> None:
+    """Lists split like Tcl splits them, malformed lists raise ValueError like Tcl raises error."""
+    interp = tkinter.Tcl()
+    interp.call("set", "l", tcl_str)
+    if interp.eval("catch {llength $l}") != "0":
+        with pytest.raises(ValueError):
+            split_tcl_list(tcl_str)
+        return
+    elements = [interp.eval(f"lindex $l {i}") for i in range(int(interp.eval("llength $l")))]
+    assert split_tcl_list(tcl_str) == elements
+    assert list(iter_tcl_list("x " + tcl_str, start=2)) == elements
+
+
+def test_split_tcl_dict() -> None:
+    """Dicts split into {key: value}, odd number of elements raises ValueError."""
+    assert split_tcl_dict("a 1 b {2 3}") == {"a": "1", "b": "2 3"}
+    with pytest.raises(ValueError):
+        split_tcl_dict("a 1 b")
+
+
+def test_parse_resource_groups() -> None:
+    """Resource groups are parsed with or without extra braces and empty fields, values without groups return none."""
+    info = (
+        "{{RG0 mode 10000 ppm 0 active ports {1 2} active capture ports {1} resource ports {1 2 3}} "
+        "{RG1 mode 1000 ppm {} active ports {} active capture ports {} resource ports {4}}}"
+    )
+    resource_groups = parse_resource_groups(info)
+    assert resource_groups[0] == {
+        "RG": "0",
+        "mode": "10000",
+        "ppm": "0",
+        "active ports": "1 2",
+        "active capture ports": "1",
+        "resource ports": "1 2 3",
+    }
+    assert [resource_groups[1][field] for field in ("RG", "ppm", "active ports", "resource ports")] == ["1", "", "", "4"]
+    info = "RG0 mode 40000 ppm active ports {1} active capture ports {1} resource ports {1}"
+    assert parse_resource_groups(info)[0]["ppm"] == ""
+    assert parse_resource_groups("") == []
+    assert parse_resource_groups("NA") == []
+    assert parse_resource_groups("{{NA}}") == []
+    assert parse_port_list("{{1 1 1} {1 1 2}}") == ["1 1 1", "1 1 2"]
+    assert parse_port_list("{1 2 1}") == ["1 2 1"]
+
+
+def test_batch() -> None:
+    """Batched commands are sent in one round trip and errors are raised for the failing command."""
+    client = _connect(_tcl_eval_reply())
+    api = IxTclHalApi(client)
+    requests = len(client.server.requests)
+    with api.batch():
+        api.call_rc("obj config -name {a b}")
+        api.defer("set x 100%%")
+        api.defer("error ignored", ignore_errors=True)
+        api.call_rc("obj set 1 1 1")
+        assert len(client.server.requests) == requests
+    assert len(client.server.requests) == requests + 1
+    assert api.call("set x") == "100%"
+
+    with pytest.raises(IxTclHalError) as error:
+        with api.batch():
+            api.call_rc("obj get 1 1 1")
+            api.call_rc("fail get 1 1 2")
+            api.defer("set y 1")
+    assert error.value.command == "fail get 1 1 2"
+    assert error.value.origin.startswith(__file__)
+    assert api.call("set y") == "1"
+
+    with api.batch():
+        api.defer("set z 2")
+        assert api.call("set z") == "2"
+    client.close()
+
+
+def test_batch_pipeline() -> None:
+    """Pipelined commands run after the commands queued before them, like IxePort.ix_set_list in a batch."""
+    api = _storage_model_api()
+    with api.batch():
+        api.call_rc("port get 1 1 1")
+        assert api.pipeline(["port config -c 5", "set x 1"]) == ["0", "1"]
+        api.call_rc("port set 1 1 1")
+    api.call_rc("port get 1 1 1")
+    assert api.call("port cget -c") == "5"
+    api._tcl_handler.close()
+
+
+def _storage_model_api() -> IxTclHalApi:
+    """Return api connected to a Tcl model of the storage per command and IxHal object per command and uri.
+
+    The ip IxHal object is the one of the stream loaded by the last stream get.
+    """
+    client = _connect(_tcl_eval_reply())
+    api = IxTclHalApi(client)
+    api.call(
+        "proc model {name verb args} {"
+        " global storage hal;"
+        " set key [expr {$name == {ip} ? $::stream : $args}];"
+        " switch -- $verb {"
+        "  config {foreach {o v} $args {dict set storage($name) $o $v}}"
+        "  cget {if {[dict exists $storage($name) [lindex $args 0]]} {return [dict get $storage($name) [lindex $args 0]]}}"
+        "  get {if {$name == {stream}} {set ::stream $args}; set storage($name) [lindex [array get hal $name,$key] 1]}"
+        "  set {set hal($name,$key) $storage($name)}"
+        " };"
+        " return 0 }"
+    )
+    api.call('foreach c {port stream ip} {proc $c {args} "model $c {*}\\$args"}')
+    return api
+
+
+class _Counters(IxeObject, metaclass=ixe_obj_meta):
+    __tcl_command__ = "counters"
+    __tcl_members__ = [
+        TclMember("a", type=int, doc="Counter a."),
+        TclMember("b"),
+        TclMember("missing", type=int, flags=FLAG_IGERR),
+        TclMember("c", type=int, flags=FLAG_RDONLY),
+    ]
+
+
+def test_get_attributes() -> None:
+    """All members are read in one round trip, a failing FLAG_IGERR member reads -1 and the others still decode."""
+    api = _storage_model_api()
+    api.call(
+        "proc counters {args} {"
+        " if {$args == {cget -missing}} {error {unknown option -missing}};"
+        " model counters {*}$args }"
+    )
+    api.call("counters config -a 1 -b x -c 3")
+    counters = _Counters(parent=IxeSession(logger, api), uri="1 1 1")
+    api.call_rc("counters set 1 1 1")
+    counters.ix_get()
+
+    with api.instrument() as report:
+        attributes = counters.get_attributes(0xFF, "a", "b", "missing")
+    assert attributes == {"a": 1, "b": "x", "missing": -1}
+    assert report.total.round_trips == 1
+    # Read only members reload the object first, all members are still read by one call.
+    with api.instrument() as report:
+        attributes = counters.get_attributes()
+    assert attributes == {"a": 1, "b": "x", "missing": -1, "c": 3}
+    assert report.total.round_trips == 2
+    assert list(report.by_verb) == ["get", "cget"]
+    assert counters.missing == -1
+    api._tcl_handler.close()
+
+
+def test_member_doc() -> None:
+    """Member docs are the docs of their attributes, for help and IDEs."""
+    assert _Counters.a.__doc__ == "Counter a."
+    assert _Counters.b.__doc__ is None
+    assert "Counter a." in pydoc.render_doc(_Counters)
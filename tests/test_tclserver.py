@@ -0,0 +1,148 @@
+"""
+Tests for the local TclServer stand-in, and package flows that run against it without chassis.
+"""
+import json
+import logging
+import time
+from pathlib import Path
+
+import pytest
+from trafficgenerator import TgnError
+
+from ixexplorer.api.tclproto import TclClient
+from ixexplorer.api.tclserver import TclServerSim
+from ixexplorer.ixe_app import IxeApp, init_ixe, replay_ixe
+from ixexplorer.ixe_hw import IxeChassis, IxeInventorySnapshot
+from ixexplorer.ixe_statistics_view import IxePortsStats
+from tests import SIM_CHASSIS
+
+logger = logging.getLogger("tgn.ixexplorer")
+
+
+def test_discover(sim_ixia: IxeApp) -> None:
+    """Chassis, cards and ports are discovered from the simulated chassis."""
+    chassis = sim_ixia.chassis_chain[SIM_CHASSIS]
+    sim_ixia.discover()
+    assert chassis.ixServerVersion
+    assert list(chassis.cards) == [1, 2]
+    assert [len(card.ports) for card in chassis.cards.values()] == [2, 2]
+
+
+def test_inventory_snapshot(sim_ixia: IxeApp, server: TclServerSim, tmp_path: Path) -> None:
+    """Inventory is built from the snapshot while the cards match it, and discovered again when a card is removed."""
+    snapshot = str(tmp_path.joinpath("inventory.json"))
+    chassis = sim_ixia.chassis_chain[SIM_CHASSIS]
+    sim_ixia.discover(snapshot=snapshot)
+    with open(snapshot) as snapshot_file:
+        inventories = json.load(snapshot_file)["inventories"]
+    assert [card[:3] for card in inventories[f"{SIM_CHASSIS}/{chassis.ixServerVersion}"]] == [["1", "0", "2"], ["2", "0", "2"]]
+
+    # Same card types in the same slots - the inventory is built from the snapshot.
+    inventories[f"{SIM_CHASSIS}/{chassis.ixServerVersion}"][0][2] = "3"
+    with open(snapshot, "w") as snapshot_file:
+        json.dump({"version": IxeInventorySnapshot.VERSION, "inventories": inventories}, snapshot_file)
+    sim_ixia.discover(snapshot=snapshot)
+    assert [len(card.ports) for card in chassis.cards.values()] == [3, 2]
+
+    # Card removed - the chassis is discovered again and the snapshot is updated.
+    server.model.remove(("1", "2"))
+    sim_ixia.discover(snapshot=snapshot)
+    assert [len(card.ports) for card in chassis.cards.values()] == [2]
+    assert len(IxeInventorySnapshot(snapshot).get(SIM_CHASSIS, chassis.ixServerVersion)) == 1
+
+
+def test_latency(server: TclServerSim) -> None:
+    """Serial calls wait one latency each, pipelined calls overlap their latencies."""
+    client = TclClient(logger, "127.0.0.1", server.port)
+    client.connect()
+    server.latency = 0.05
+
+    start = time.time()
+    for _ in range(4):
+        client.call("chassis add 1.1.1.1")
+    serial = time.time() - start
+    start = time.time()
+    assert client.pipeline(["chassis add 1.1.1.1"] * 4) == ["0"] * 4
+    pipelined = time.time() - start
+
+    assert serial >= 4 * 0.05
+    # Pipelined calls take about one latency, compared to the serial calls so a loaded host does not fail the test.
+    assert pipelined < serial / 2
+    client.close()
+
+
+def test_instrument(sim_ixia: IxeApp) -> None:
+    """Calls, round trips, bytes and latencies are counted by verb, command and operation, nested blocks included."""
+    port = sim_ixia.session.add_ports(f"{SIM_CHASSIS}/1/1")[f"{SIM_CHASSIS}/1/1"]
+    with sim_ixia.api.instrument() as report:
+        assert port.owner == ""
+        sim_ixia.api.pipeline(["port cget -owner"] * 3)
+        with sim_ixia.api.instrument() as inner:
+            port.reserve()
+
+    assert report.total.count == 6
+    assert report.total.round_trips == 4
+    assert report.by_verb["get"].count == 1
+    assert report.by_verb["cget"].count == 4
+    assert report.by_command["ixPortTakeOwnership"].count == 1
+    assert report.by_operation["IxePort.owner"].count == 2
+    assert report.by_operation["IxePort.reserve"].count == 1
+    assert report.total.bytes_sent > 0 and report.total.bytes_received > 0
+    assert sum(report.total.histogram) == report.total.count
+    assert inner.total.count == 1
+
+
+def test_record_replay(server: TclServerSim, tmp_path: Path) -> None:
+    """Session replayed from its recording returns the recorded results, unrecorded commands fail."""
+
+    def session(ixia: IxeApp) -> dict:
+        ixia.connect("sim")
+        ixia.add(SIM_CHASSIS)
+        port = ixia.session.add_ports(f"{SIM_CHASSIS}/1/1")[f"{SIM_CHASSIS}/1/1"]
+        port.reserve()
+        port.add_stream("s1").framesize = 128
+        stats = IxePortsStats().read_stats("framesSent")
+        stats["framesize"] = port.streams[1].framesize
+        ixia.disconnect()
+        return stats
+
+    recording = str(tmp_path.joinpath("session.tcl.gz"))
+    ixia = init_ixe("127.0.0.1", server.port)
+    with ixia.api.record(recording) as recorder:
+        recorded = session(ixia)
+    assert recorder.exchanges > 0
+
+    replayed = session(replay_ixe(recording))
+    assert replayed == recorded
+    assert replayed["framesize"] == 128
+
+    ixia = replay_ixe(recording)
+    ixia.connect("sim")
+    with pytest.raises(TgnError):
+        ixia.add("1.1.1.1")
+
+
+def test_multi_chassis(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Chassis are added and discovered in parallel, one connection per worker, with their chassis IDs in order."""
+    with TclServerSim(port=0, cards=4, ports=2, slots=6) as server:
+        ixia = init_ixe("127.0.0.1", server.port)
+        ixia.connect("sim")
+        chassis = [f"192.168.1.{host}" for host in range(1, 5)]
+        ixia.add(*chassis, concurrency=2)
+        assert [ixia.chassis_chain[ip].id for ip in chassis] == [1, 2, 3, 4]
+        assert ixia.api.pool is None
+
+        connections = set()
+        discover = IxeChassis.discover
+
+        def discover_on_connection(self: IxeChassis, *args) -> None:
+            connections.add(self.api._tcl_handler)
+            discover(self, *args)
+
+        monkeypatch.setattr(IxeChassis, "discover", discover_on_connection)
+        ixia.discover(concurrency=2)
+        assert len(connections) == 2 and ixia.api._tcl_handler not in connections
+        for ip in chassis:
+            assert [len(card.ports) for card in ixia.chassis_chain[ip].cards.values()] == [2, 2, 2, 2]
+        assert ixia.session.add_ports(f"{chassis[3]}/2/2")[f"{chassis[3]}/2/2"].uri == "4 2 2"
+        ixia.disconnect()